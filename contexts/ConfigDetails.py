@@ -56,6 +56,10 @@ class ConfigDetails(object):
         self.retainSeriesDate = True
 
         self.retainStudySeriesDescriptions = False
+
+        self.singlePassAnonymisation = True  # replacement UIDs derived from keyed hash of original UIDs (files are read once)
+        self.anonymisationUidMapDir = None  # folder where encrypted UID map of each upload is saved, None = not saved
+        self.anonymisationWorkers = 0  # 0 = number of CPU cores, 1 = serial anonymisation
         
         # DICOM RTStruct mapping
         self.autoRTStructMatch = True
@@ -65,6 +69,28 @@ class ConfigDetails(object):
         self.downloadDicomStudyFolderName = "oid"  # [oid, label]
         self.downloadDicomPatientFolderName = "ssid"  # [pid, ssid]
 
+        # DICOM scanning
+        self.dicomHeaderOnlyScan = True
+        self.dicomScanDeferSize = 512 * 1024  # bytes, bigger elements are read on demand
+        self.dicomScanWorkers = 0  # 0 = number of CPU cores, 1 = serial scanning
+        self.dicomScanIndex = False  # reuse scan results of unchanged files (opt-in, index holds encrypted patient identity)
+        self.dicomScanIndexFileName = "dicomscan.db"  # relative to the folder of the config file
+        self.dicomScanIndexMaxAge = 30  # days, older index records are purged (0 = never)
+        self.dicomScanContentCheck = True  # skip files without DICOM preamble or recognisable first element
+        self.dicomScanUseDicomDir = True  # build tree from DICOMDIR records, referenced files are scanned when selected
+        self.dicomScanSkipNames = ["DICOMDIR", "DIRFILE"]
+        self.dicomScanSkipExtensions = [".txt", ".gsession", ".gstk", ".genv", ".rdf"]  # Geisterr 3D, Rover files
+        self.dicomDuplicatePolicy = "first"  # [first, newest, report] files with already scanned SOPInstanceUID (report = first, confirmed by user)
+        self.dicomDuplicateContentCheck = False  # duplicates are confirmed by comparing content hash of files
+
+        # DICOM volume loading
+        self.dicomVolumeWorkers = 0  # 0 = number of CPU cores, 1 = serial decoding
+        self.dicomVolumeDir = None  # folder for memory mapped volumes, None = system temp folder
+        self.dicomVolumeCacheSize = 1024  # MB of decoded volumes kept mapped by the volume cache (volumes in use are not evicted)
+        self.dicomVolumeCacheSpill = False  # files of evicted volumes are kept and mapped again on the next request
+        self.dicomVolumeCacheSpillSize = 4096  # MB of kept files of evicted volumes
+        self.dicomDoseStatistics = False  # log DVH statistics of ROIs before treatment plan upload (opt-in)
+
         # DICOM AE
         self.rpbAE = "RPBC"
         self.rpbAETsuffix = "no"  # [no, host, fqdn] host = hostname, fqdn = FullyQualifiedDomainName
@@ -27,11 +27,14 @@ class DSRDocument():
         if "CompletionFlag" in dcmFile:
             self._completionFlag = dcmFile.CompletionFlag
         # Verification Flag (0040, a493)
-        if "VefificationFlag" in dcmFile:
+        if "VerificationFlag" in dcmFile:
             self._verificationFlag = dcmFile.VerificationFlag
 
         self._docTree = self._generateDocTree(dcmFile)
 
+        # Rendered text (document does not change once it is parsed)
+        self._text = None
+
 ########  ########   #######  ########  ######## ########  ######## #### ########  ######
 ##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
 ##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
@@ -61,30 +64,42 @@ class DSRDocument():
 ##     ## ########    ##    ##     ##  #######  ########   ######
 
     def renderText(self):
+        """Render text of the report (rendered once, then cached)
         """
-        """
-        result = ""
+        if self._text is None:
+            result = ""
 
-        if self._docTree is not None:
-            result += self._docTree.renderText()
+            if self._docTree is not None:
+                result = self._docTree.renderText()
 
-        return result
+            self._text = result
+
+        return self._text
 
     def _generateDocTree(self, dcmFile):
+        """Build document tree from content sequence items
+        Items are processed from a queue instead of recursion, only content
+        item attributes are visited (other elements of the dataset are skipped)
         """
-        """      
         rootNode = DSRDocumentNode()
 
-
+        pending = []
         if "ContentSequence" in dcmFile:
-            contents = dcmFile.ContentSequence
+            pending.append((dcmFile.ContentSequence, rootNode))
+
+        while pending:
+            contents, parent = pending.pop()
             for item in contents:
-                node = self._generateContentSequenceNode(item, rootNode)
+                node = self._generateContentSequenceNode(item, parent)
+
+                # Nested content items
+                if "ContentSequence" in item:
+                    pending.append((item.ContentSequence, node))
 
         return rootNode
 
     def _generateContentSequenceNode(self, dataset, parent):
-        """
+        """Create document node from content item (nested items are not processed)
         """
         node = DSRDocumentNode(parent)
 
@@ -129,10 +144,4 @@ class DSRDocument():
         if "PersonName" in dataset:
             node.personName = dataset.PersonName
 
-        # Recursive
-        if "ContentSequence" in dataset:
-            contents = dataset.ContentSequence
-            for item in contents:
-                subNode = self._generateContentSequenceNode(item, node)           
-            
         return node
\ No newline at end of file
@@ -163,7 +163,26 @@ class DSRDocumentNode(Node):
 ##     ## ########    ##    ##     ##  #######  ########   ######
 
     def renderText(self):
+        """Render text of this node and all its descendants
         """
+        return "".join(self.renderParts())
+
+    def renderParts(self):
+        """Generator of text parts of this node and its descendants (in document order)
+        Tree is traversed without recursion so that deep reports cannot exceed the recursion limit
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+
+            text = node.renderNodeText()
+            if text != "":
+                yield text
+
+            stack.extend(reversed(node.children))
+
+    def renderNodeText(self):
+        """Render text of this node only
         """
         result = ""
 
@@ -191,10 +210,6 @@ class DSRDocumentNode(Node):
         #elif self._valueType == "SCOORD"
         #elif self._valueType == "TCOORD"
 
-        if len(self._children) > 0:
-            for node in self._children:
-                result += node.renderText()
-
         return result
 
     def typeInfo(self):
@@ -0,0 +1,78 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Values of BurnedInAnnotation attribute stating that pixel data contain annotations
+BURNED_IN_VALUES = frozenset(["YES", "TRUE"])
+
+# Modalities which usually have annotations burned in pixel data (when the attribute is missing)
+BURNED_IN_MODALITIES = frozenset(["US"])
+
+# Secondary capture SOP classes (screenshots, scanned documents)
+SECONDARY_CAPTURE_SOP_CLASSES = frozenset([
+    "1.2.840.10008.5.1.4.1.1.7",  # Secondary Capture Image Storage
+    "1.2.840.10008.5.1.4.1.1.7.1",  # Multi-frame Single Bit Secondary Capture Image Storage
+    "1.2.840.10008.5.1.4.1.1.7.2",  # Multi-frame Grayscale Byte Secondary Capture Image Storage
+    "1.2.840.10008.5.1.4.1.1.7.3",  # Multi-frame Grayscale Word Secondary Capture Image Storage
+    "1.2.840.10008.5.1.4.1.1.7.4"  # Multi-frame True Color Secondary Capture Image Storage
+])
+
+# Values of ImageType (third value and later) of secondary images captured from screen
+SCREEN_CAPTURE_IMAGE_TYPES = frozenset(["SCREEN SAVE", "SCREENSHOT", "CAPTURE"])
+
+
+class DicomAnnotationDetector(object):
+    """Burned in annotation detector
+    Decides from scan descriptors whether pixel data of a series can contain
+    burned in annotations (possibly patient identity). BurnedInAnnotation
+    attribute is used when present, otherwise ultrasound and secondary capture
+    images (modality, SOP class or screen save image type) are reported
+    as suspected. Detection stops at the first file with annotations.
+    """
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def detect(self, descriptors):
+        """Detect burned in annotations in descriptors belonging to one series
+
+        return: reason message of the first file with (suspected) annotations, None when there is none
+        """
+        for descriptor in descriptors:
+            reason = self.reason(descriptor)
+            if reason is not None:
+                return reason
+
+        return None
+
+    def reason(self, descriptor):
+        """Reason why pixel data of one described file can contain burned in annotations (None = no annotations)
+        """
+        value = descriptor.get("BurnedInAnnotation")
+        if value is not None:
+            if str(value).strip().upper() in BURNED_IN_VALUES:
+                return "BurnedInAnnotation is " + str(value) + " in " + descriptor.get("Filename", "") + "."
+            return None
+
+        # Attribute is missing, heuristics
+        modality = descriptor.get("Modality")
+        if modality in BURNED_IN_MODALITIES:
+            return "Suspected " + modality + " image without BurnedInAnnotation: " + descriptor.get("Filename", "") + "."
+
+        if descriptor.get("SOPClassUID") in SECONDARY_CAPTURE_SOP_CLASSES:
+            return "Suspected secondary capture image: " + descriptor.get("Filename", "") + "."
+
+        imageType = [str(v).strip().upper() for v in (descriptor.get("ImageType") or ())]
+        if "SECONDARY" in imageType[1:2] and SCREEN_CAPTURE_IMAGE_TYPES.intersection(imageType[2:]):
+            return "Suspected screen capture (" + "\\".join(imageType) + "): " + descriptor.get("Filename", "") + "."
+
+        return None
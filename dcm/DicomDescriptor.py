@@ -0,0 +1,200 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Descriptor keys (all values are plain python types)
+DESCRIPTOR_KEYS = (
+    "Filename",
+    "PatientID",
+    "PatientName",
+    "PatientBirthDate",
+    "PatientSex",
+    "PatientsAge",
+    "StudyInstanceUID",
+    "StudyDescription",
+    "SeriesInstanceUID",
+    "SOPInstanceUID",
+    "InstanceNumber",
+    "Modality",
+    "FrameOfReferenceUID",
+    "ReferencedSOPInstanceUID_RTSTRUCT",
+    "ReferencedSOPInstanceUID_RTPLAN",
+    "ContourImageSequence",
+    "RTPlanLabel",
+    "BeamNumbers",
+    "RadiationType",
+    "DoseSummationType",
+    "TreatmentPlanningReferencePoint",
+    "Rows",
+    "Columns",
+    "PixelSpacing",
+    "ImagePositionPatient",
+    "ImageOrientationPatient",
+    "SOPClassUID",
+    "ImageType",
+    "BurnedInAnnotation"
+)
+DESCRIPTOR_KEY_SET = frozenset(DESCRIPTOR_KEYS)
+
+# Keys with multiple numeric values (stored as tuples)
+VECTOR_KEYS = frozenset([
+    "PixelSpacing",
+    "ImagePositionPatient",
+    "ImageOrientationPatient"
+])
+
+# Keys with values repeating across many files (only one copy of such string is kept in memory)
+INTERNED_KEYS = frozenset([
+    "PatientID",
+    "PatientName",
+    "PatientBirthDate",
+    "PatientSex",
+    "PatientsAge",
+    "StudyInstanceUID",
+    "StudyDescription",
+    "SeriesInstanceUID",
+    "Modality",
+    "FrameOfReferenceUID",
+    "ReferencedSOPInstanceUID_RTSTRUCT",
+    "ReferencedSOPInstanceUID_RTPLAN",
+    "RTPlanLabel",
+    "RadiationType",
+    "DoseSummationType",
+    "TreatmentPlanningReferencePoint",
+    "SOPClassUID",
+    "BurnedInAnnotation"
+])
+
+
+class DicomDescriptor(object):
+    """Compact descriptor of one DICOM file
+    Descriptor behaves like a dictionary restricted to DESCRIPTOR_KEYS, but
+    values are stored in slots and repeated strings (UIDs, patient attributes)
+    are interned, so that descriptors of large archives stay small in memory.
+
+    values: dictionary with initial values
+    """
+
+    __slots__ = DESCRIPTOR_KEYS
+
+    def __init__(self, values=None):
+        """Default constructor
+        """
+        if values is not None:
+            for key, value in values.iteritems():
+                self[key] = value
+
+    def __getitem__(self, key):
+        """Value of descriptor key
+        """
+        if key not in DESCRIPTOR_KEY_SET:
+            raise KeyError(key)
+
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        """Set value of descriptor key
+        """
+        if key not in DESCRIPTOR_KEY_SET:
+            raise KeyError(key)
+
+        if key in INTERNED_KEYS and isinstance(value, str):
+            value = intern(str(value))
+        elif key == "ContourImageSequence":
+            value = tuple(intern(str(v)) if isinstance(v, str) else v for v in value)
+        elif key == "ImageType":
+            # Multi valued string (single value is kept as one item tuple as well)
+            if isinstance(value, basestring):
+                value = [value]
+            value = tuple(intern(str(v)) if isinstance(v, str) else v for v in value)
+        elif key in VECTOR_KEYS and isinstance(value, list):
+            value = tuple(value)
+
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        """Key has a value in descriptor
+        """
+        return key in DESCRIPTOR_KEY_SET and hasattr(self, key)
+
+    def __iter__(self):
+        """Iterate keys with value
+        """
+        return iter(self.keys())
+
+    def __len__(self):
+        """Number of keys with value
+        """
+        return len(self.keys())
+
+    def __eq__(self, other):
+        """Descriptors are equal when they have the same values
+        """
+        if not isinstance(other, DicomDescriptor):
+            return False
+        return self.items() == other.items()
+
+    def __ne__(self, other):
+        """Descriptors are not equal when values differ
+        """
+        return not self.__eq__(other)
+
+    # Descriptors are mutable
+    __hash__ = None
+
+    def __repr__(self):
+        """Show descriptor like a dictionary
+        """
+        return repr(dict(self.items()))
+
+    def __getstate__(self):
+        """Descriptor is pickled as a dictionary of values
+        """
+        return dict(self.items())
+
+    def __setstate__(self, state):
+        """Restore descriptor from pickled values (strings are interned again)
+        """
+        for key, value in state.iteritems():
+            self[key] = value
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def get(self, key, default=None):
+        """Value of descriptor key or default value
+        """
+        if key not in DESCRIPTOR_KEY_SET:
+            return default
+        return getattr(self, key, default)
+
+    def keys(self):
+        """List of keys with value
+        """
+        return [key for key in DESCRIPTOR_KEYS if hasattr(self, key)]
+
+    def items(self):
+        """List of (key, value) pairs
+        """
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def copy(self):
+        """Shallow copy of descriptor
+        """
+        result = DicomDescriptor()
+        for key, value in self.items():
+            setattr(result, key, value)
+
+        return result
@@ -0,0 +1,123 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+from collections import OrderedDict
+
+# Descriptor keys which are indexed for fast lookup
+INDEXED_KEYS = [
+    "PatientID",
+    "StudyInstanceUID",
+    "SeriesInstanceUID",
+    "SOPInstanceUID",
+    "Modality",
+    "FrameOfReferenceUID"
+]
+
+
+class DicomDescriptorStore(object):
+    """Store of DICOM file descriptors
+    Descriptors are kept in insertion order and hash indexes are maintained
+    for frequently queried keys, so that lookups by these keys do not need
+    to scan all descriptors. Descriptor objects are kept in ordered maps by
+    their identity, so removal does not scan the store either. Descriptors
+    should not be modified after they have been added to the store.
+
+    indexedKeys: descriptor keys with hash index
+    """
+
+    def __init__(self, indexedKeys=INDEXED_KEYS):
+        """Default constructor
+        """
+        # Descriptors in insertion order (key = id of descriptor object)
+        self._descriptors = OrderedDict()
+
+        # Hash indexes (key = descriptor key, value = dictionary of value -> ordered map of descriptors)
+        self._indexes = {}
+        for key in indexedKeys:
+            self._indexes[key] = {}
+
+    def __len__(self):
+        """Number of descriptors in store
+        """
+        return len(self._descriptors)
+
+    def __iter__(self):
+        """Iterate descriptors in insertion order
+        """
+        return self._descriptors.itervalues()
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def append(self, descriptor):
+        """Add descriptor to the store and its indexes
+        """
+        self._descriptors[id(descriptor)] = descriptor
+
+        for key, index in self._indexes.iteritems():
+            if key in descriptor:
+                index.setdefault(descriptor[key], OrderedDict())[id(descriptor)] = descriptor
+
+    def remove(self, descriptor):
+        """Remove descriptor object (not an equal one) from the store and its indexes
+        """
+        if self._descriptors.get(id(descriptor)) is not descriptor:
+            raise ValueError("Descriptor is not in the store")
+
+        del self._descriptors[id(descriptor)]
+
+        for key, index in self._indexes.iteritems():
+            if key in descriptor:
+                entries = index[descriptor[key]]
+                del entries[id(descriptor)]
+                if len(entries) == 0:
+                    del index[descriptor[key]]
+
+    def removeWhere(self, key, value):
+        """Remove all descriptors where the key has specified value
+
+        return: list of removed descriptors (in insertion order)
+        """
+        removed = self.belongingTo(key, value)
+        for descriptor in removed:
+            self.remove(descriptor)
+
+        return removed
+
+    def unique(self, key):
+        """List of distinct values of descriptor key
+        """
+        if key in self._indexes:
+            return self._indexes[key].keys()
+
+        resList = []
+        for entry in self._descriptors.itervalues():
+            if key in entry:
+                resList.append(entry[key])
+
+        return list(set(resList))
+
+    def belongingTo(self, key, value):
+        """List of descriptors where the key has specified value (in insertion order)
+        """
+        if key in self._indexes:
+            return self._indexes[key].get(value, OrderedDict()).values()
+
+        resList = []
+        for entry in self._descriptors.itervalues():
+            if key in entry:
+                if entry[key] == value:
+                    resList.append(entry)
+
+        return resList
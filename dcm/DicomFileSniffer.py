@@ -0,0 +1,71 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import os
+import struct
+
+# Length of DICOM file preamble followed by DICM prefix
+PREAMBLE_LENGTH = 128
+DICOM_PREFIX = "DICM"
+
+# Groups which can start DICOM data set without preamble (file meta information, identifying group)
+FIRST_GROUPS = (0x0002, 0x0008)
+
+# Explicit value representations
+VALUE_REPRESENTATIONS = frozenset([
+    "AE", "AS", "AT", "CS", "DA", "DS", "DT", "FL", "FD", "IS", "LO", "LT", "OB", "OD", "OF",
+    "OW", "PN", "SH", "SL", "SQ", "SS", "ST", "TM", "UI", "UL", "UN", "US", "UT"
+])
+
+
+class DicomFileSniffer(object):
+    """Cheap content check of DICOM files
+    Decides whether a file looks like DICOM file from its first 132 bytes
+    without parsing it. Standard DICOM files start with 128 byte preamble
+    followed by DICM prefix. Files without preamble (e.g. older implicit VR
+    little endian exports) are recognised by the tag of their first element.
+    """
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def isDicom(self, path):
+        """Check whether the file content looks like DICOM
+        """
+        try:
+            with open(path, "rb") as f:
+                header = f.read(PREAMBLE_LENGTH + len(DICOM_PREFIX))
+            size = os.path.getsize(path)
+        except (IOError, OSError):
+            return False
+
+        # Preamble followed by DICM prefix
+        if header[PREAMBLE_LENGTH:PREAMBLE_LENGTH + len(DICOM_PREFIX)] == DICOM_PREFIX:
+            return True
+
+        # Data set without preamble starts directly with the first element
+        if len(header) < 8:
+            return False
+
+        group, element = struct.unpack("<HH", header[0:4])
+        if group not in FIRST_GROUPS:
+            return False
+
+        # Explicit VR little endian
+        if header[4:6] in VALUE_REPRESENTATIONS:
+            return True
+
+        # Implicit VR little endian (value length has to fit into file)
+        length = struct.unpack("<L", header[4:8])[0]
+        return length <= size - 8
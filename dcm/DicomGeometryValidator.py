@@ -0,0 +1,142 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Numpy
+import numpy as np
+
+# Descriptor keys holding the image geometry and number of values they have
+GEOMETRY_KEYS = (
+    ("Rows", 1),
+    ("Columns", 1),
+    ("PixelSpacing", 2),
+    ("ImagePositionPatient", 3),
+    ("ImageOrientationPatient", 6)
+)
+
+# Relative tolerance of slice distances, pixel spacing and orientation
+GEOMETRY_TOLERANCE = 0.01
+
+# Absolute tolerance (mm) of slice distances (positions are often rounded in DICOM files)
+SLICE_DISTANCE_TOLERANCE = 0.01
+
+
+class DicomGeometryValidator(object):
+    """Slice geometry validator
+    Checks that scan descriptors of one image series make up a consistent
+    volume: all slices have the same dimensions, pixel spacing and orientation,
+    no slice position is repeated, slice distances are even and no slices are
+    missing. Geometry of all slices is gathered into arrays and checked at once,
+    DICOM files are not read again.
+    """
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def validate(self, descriptors):
+        """Validate geometry of descriptors belonging to one series
+
+        return: list of issue messages (empty when the series is consistent or has no image geometry)
+        """
+        geometry = [self._geometry(d) for d in descriptors]
+        slices = [g for g in geometry if g is not None]
+
+        issues = []
+
+        # Series without images (RTSTRUCT, RTPLAN, ...)
+        if len(slices) == 0:
+            return issues
+
+        incomplete = len(geometry) - len(slices)
+        if incomplete > 0:
+            issues.append("Geometry attributes are missing in " + str(incomplete) + " of " + str(len(geometry)) + " files.")
+
+        # Single image
+        if len(slices) < 2:
+            return issues
+
+        values = np.array(slices, dtype=np.float64)
+        dimensions = values[:, 0:2]
+        spacing = values[:, 2:4]
+        positions = values[:, 4:7]
+        orientations = values[:, 7:13]
+
+        # Mixed geometry
+        if np.any(dimensions != dimensions[0]):
+            issues.append("Dimensions of slices do not match: " + self._distinct(dimensions, "%dx%d") + ".")
+        if not np.allclose(spacing, spacing[0], rtol=GEOMETRY_TOLERANCE, atol=0.0):
+            issues.append("Pixel spacing of slices does not match: " + self._distinct(spacing, "%gx%g") + " mm.")
+        if not np.allclose(orientations, orientations[0], rtol=0.0, atol=GEOMETRY_TOLERANCE):
+            issues.append("Image orientation of slices does not match.")
+            return issues
+
+        # Slice positions along the slice normal
+        normal = np.cross(orientations[0, 0:3], orientations[0, 3:6])
+        distances = np.diff(np.sort(np.dot(positions, normal)))
+
+        duplicates = distances <= SLICE_DISTANCE_TOLERANCE
+        if np.any(duplicates):
+            issues.append(str(int(np.count_nonzero(duplicates))) + " slices have the same position as another slice.")
+
+        steps = distances[~duplicates]
+        if len(steps) == 0:
+            return issues
+
+        # The most common slice distance is the expected one
+        step = np.median(steps)
+        tolerance = max(GEOMETRY_TOLERANCE * step, SLICE_DISTANCE_TOLERANCE)
+        multiples = np.round(steps / step)
+        uneven = np.abs(steps - step) > tolerance
+        gaps = uneven & (multiples >= 2) & (np.abs(steps - multiples * step) <= tolerance)
+
+        if np.any(gaps):
+            missing = int(np.sum(multiples[gaps] - 1))
+            issues.append(str(missing) + " slices are missing (expected slice distance " + ("%g" % step) + " mm).")
+        if np.any(uneven & ~gaps):
+            issues.append("Slice distances are not even: " + ("%g" % steps.min()) + " - " + ("%g" % steps.max()) + " mm.")
+
+        return issues
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _geometry(self, descriptor):
+        """Flat list of geometry values of descriptor (None when any of them is missing)
+        """
+        result = []
+        for key, count in GEOMETRY_KEYS:
+            value = descriptor.get(key)
+            if value is None:
+                return None
+
+            if count == 1:
+                value = [value]
+            elif not hasattr(value, "__len__") or len(value) != count:
+                return None
+
+            try:
+                result.extend(float(v) for v in value)
+            except (TypeError, ValueError):
+                return None
+
+        return result
+
+    def _distinct(self, values, pattern):
+        """Distinct rows of values formatted for message
+        """
+        rows = sorted(set(tuple(row) for row in values.tolist()))
+        return ", ".join(pattern % row for row in rows)
@@ -0,0 +1,140 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Reference types (edges of the graph) and descriptor keys they are taken from
+CONTOUR_IMAGE = "ContourImage"
+STRUCTURE_SET = "ReferencedStructureSet"
+RT_PLAN = "ReferencedRTPlan"
+
+REFERENCE_KEYS = [
+    (CONTOUR_IMAGE, "ContourImageSequence"),
+    (STRUCTURE_SET, "ReferencedSOPInstanceUID_RTSTRUCT"),
+    (RT_PLAN, "ReferencedSOPInstanceUID_RTPLAN")
+]
+
+
+class DicomReferenceGraph(object):
+    """Graph of references between DICOM SOP instances
+    SOP instances are nodes (identified by SOPInstanceUID and typed by
+    modality), references collected during scanning are typed edges:
+    RTSTRUCT contour images, referenced structure sets and referenced RT
+    plans. Consistency checks of treatment plan data are set queries on
+    the graph, referenced instances which are not present in the data are
+    reported as missing references.
+    """
+
+    def __init__(self):
+        """Default constructor
+        """
+        # Nodes (key = SOPInstanceUID, value = modality)
+        self._modalityOf = {}
+        # Nodes of modality (key = modality, value = set of SOPInstanceUIDs)
+        self._instances = {}
+
+        # Edges (key = (SOPInstanceUID, reference type), value = set of referenced SOPInstanceUIDs)
+        self._references = {}
+        # Reversed edges (key = (referenced SOPInstanceUID, reference type), value = set of SOPInstanceUIDs)
+        self._referencedBy = {}
+
+    def __len__(self):
+        """Number of SOP instances in graph
+        """
+        return len(self._modalityOf)
+
+    def __contains__(self, sopInstanceUid):
+        """SOP instance is a node of graph
+        """
+        return sopInstanceUid in self._modalityOf
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def addDescriptor(self, descriptor):
+        """Add SOP instance described by DICOM file descriptor together with its references
+        """
+        if "SOPInstanceUID" not in descriptor:
+            return
+
+        sopInstanceUid = descriptor["SOPInstanceUID"]
+        self.addInstance(sopInstanceUid, descriptor.get("Modality", ""))
+
+        for referenceType, key in REFERENCE_KEYS:
+            if key in descriptor:
+                value = descriptor[key]
+                if isinstance(value, basestring):
+                    value = [value]
+                for referencedUid in value:
+                    self.addReference(sopInstanceUid, referencedUid, referenceType)
+
+    def addInstance(self, sopInstanceUid, modality):
+        """Add SOP instance node (the same instance in more files is one node)
+        """
+        if sopInstanceUid not in self._modalityOf:
+            self._modalityOf[sopInstanceUid] = modality
+            self._instances.setdefault(modality, set()).add(sopInstanceUid)
+
+    def addReference(self, sopInstanceUid, referencedUid, referenceType):
+        """Add typed reference edge (referenced instance does not have to be present)
+        """
+        self._references.setdefault((sopInstanceUid, referenceType), set()).add(referencedUid)
+        self._referencedBy.setdefault((referencedUid, referenceType), set()).add(sopInstanceUid)
+
+    def modality(self, sopInstanceUid):
+        """Modality of SOP instance (None when the instance is not present)
+        """
+        return self._modalityOf.get(sopInstanceUid)
+
+    def instances(self, modality):
+        """Set of SOP instances of modality
+        """
+        return set(self._instances.get(modality, ()))
+
+    def references(self, sopInstanceUid, referenceType):
+        """Set of SOP instances referenced by SOP instance
+        """
+        return set(self._references.get((sopInstanceUid, referenceType), ()))
+
+    def referencing(self, referencedUid, referenceType):
+        """Set of SOP instances referencing SOP instance
+        """
+        return set(self._referencedBy.get((referencedUid, referenceType), ()))
+
+    def referencesOf(self, modality, referenceType):
+        """Set of SOP instances referenced by all instances of modality
+        """
+        result = set()
+        for sopInstanceUid in self._instances.get(modality, ()):
+            result.update(self._references.get((sopInstanceUid, referenceType), ()))
+
+        return result
+
+    def missingReferences(self, modality=None, referenceType=None):
+        """Referenced SOP instances which are not present
+
+        modality: only references of instances with this modality
+        referenceType: only references of this type
+        return: sorted list of (SOPInstanceUID, modality, reference type, missing SOPInstanceUID)
+        """
+        result = []
+        for (sopInstanceUid, edgeType), referencedUids in self._references.iteritems():
+            if referenceType is not None and edgeType != referenceType:
+                continue
+            sourceModality = self._modalityOf.get(sopInstanceUid)
+            if modality is not None and sourceModality != modality:
+                continue
+            for referencedUid in referencedUids:
+                if referencedUid not in self._modalityOf:
+                    result.append((sopInstanceUid, sourceModality, edgeType, referencedUid))
+
+        result.sort()
+        return result
@@ -28,6 +28,9 @@ class DicomRtStructure(Node):
         self._roiObservationLabel = ""
         self._rtRoiInterpretedType = ""
 
+        # Contour model of RTSTRUCT the ROI belongs to (set when contours are loaded)
+        self._structureSet = None
+
 
 ########  ########   #######  ########  ######## ########  ######## #### ########  ######
 ##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
@@ -98,6 +101,47 @@ class DicomRtStructure(Node):
         """
         self._rtRoiInterpretedType = value
 
+    @property
+    def structureSet(self):
+        """Contour model of RTSTRUCT Getter
+        """
+        return self._structureSet
+
+    @structureSet.setter
+    def structureSet(self, value):
+        """Contour model of RTSTRUCT Setter
+        """
+        self._structureSet = value
+
+    @property
+    def contours(self):
+        """Contours of ROI as list of (M, 3) arrays (empty when contours are not loaded)
+        """
+        if self._structureSet is not None and self._roiNumber in self._structureSet:
+            return self._structureSet.contours(self._roiNumber)
+        return []
+
+    @property
+    def pointCount(self):
+        """Number of contour points of ROI (None when contours are not loaded)
+        """
+        if self._structureSet is not None and self._roiNumber in self._structureSet:
+            return self._structureSet.pointCount(self._roiNumber)
+
+    @property
+    def boundingBox(self):
+        """Bounding box of ROI contours as (minimum, maximum) xyz arrays
+        """
+        if self._structureSet is not None and self._roiNumber in self._structureSet:
+            return self._structureSet.boundingBox(self._roiNumber)
+
+    @property
+    def sliceCoverage(self):
+        """Slice coverage of ROI contours as (first z, last z, number of slices)
+        """
+        if self._structureSet is not None and self._roiNumber in self._structureSet:
+            return self._structureSet.sliceCoverage(self._roiNumber)
+
 ##     ## ######## ######## ##     ##  #######  ########   ######
 ###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
 #### #### ##          ##    ##     ## ##     ## ##     ## ##
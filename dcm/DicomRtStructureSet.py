@@ -0,0 +1,240 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Logging
+import logging
+import logging.config
+
+# Numpy
+import numpy as np
+
+# Contour Data (3006,0050) is decoded from raw value without creating pydicom values
+CONTOUR_DATA_TAG = 0x30060050
+
+# Contour z positions closer than this (mm) belong to the same slice
+SLICE_POSITION_DECIMALS = 3
+
+
+class DicomRtStructureSet(object):
+    """Contour model of DICOM RTSTRUCT
+    ContourData of all contours of one ROI are decoded at once into one
+    contiguous (N, 3) float array; contours are views into this array
+    given by contour offsets. Per ROI point counts, bounding boxes and
+    slice coverage are derived from these arrays. Malformed contours
+    (value count not divisible by 3 or not matching NumberOfContourPoints,
+    values which are not numbers) are skipped and logged.
+
+    dataset: RTSTRUCT DICOM dataset (read with contours)
+    """
+
+    def __init__(self, dataset):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+        # ROI names (key = ROINumber)
+        self._names = {}
+        if "StructureSetROISequence" in dataset:
+            for item in dataset.StructureSetROISequence:
+                self._names[int(item.ROINumber)] = str(item.ROIName)
+
+        # Contour points and contour start offsets (key = ROINumber)
+        self._points = {}
+        self._offsets = {}
+        if "ROIContourSequence" in dataset:
+            for item in dataset.ROIContourSequence:
+                roiNumber = int(item.ReferencedROINumber)
+                contours = item.ContourSequence if "ContourSequence" in item else []
+                self._points[roiNumber], self._offsets[roiNumber] = self._decodeContours(roiNumber, contours)
+
+        # ROIs without contours
+        for roiNumber in self._names:
+            if roiNumber not in self._points:
+                self._points[roiNumber], self._offsets[roiNumber] = self._decodeContours(roiNumber, [])
+
+    def __len__(self):
+        """Number of ROIs
+        """
+        return len(self._points)
+
+    def __contains__(self, roiNumber):
+        """ROI is part of structure set
+        """
+        return roiNumber in self._points
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def roiNumbers(self):
+        """Sorted ROI numbers
+        """
+        return sorted(set(self._names.keys()) | set(self._points.keys()))
+
+    @property
+    def totalPointCount(self):
+        """Number of contour points of all ROIs
+        """
+        return sum(len(p) for p in self._points.itervalues())
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def roiName(self, roiNumber):
+        """ROI name
+        """
+        return self._names.get(roiNumber, "")
+
+    def points(self, roiNumber):
+        """All contour points of ROI as (N, 3) array
+        """
+        return self._points[roiNumber]
+
+    def contours(self, roiNumber):
+        """Contours of ROI as list of (M, 3) arrays (views into points)
+        """
+        points = self._points[roiNumber]
+        offsets = self._offsets[roiNumber]
+        return [points[offsets[i]:offsets[i + 1]] for i in xrange(len(offsets) - 1)]
+
+    def contourCount(self, roiNumber):
+        """Number of contours of ROI
+        """
+        return len(self._offsets[roiNumber]) - 1
+
+    def pointCount(self, roiNumber):
+        """Number of contour points of ROI
+        """
+        return len(self._points[roiNumber])
+
+    def boundingBox(self, roiNumber):
+        """Bounding box of ROI as (minimum, maximum) xyz arrays (None when ROI has no contours)
+        """
+        points = self._points[roiNumber]
+        if len(points) == 0:
+            return None
+
+        return points.min(axis=0), points.max(axis=0)
+
+    def slicePositions(self, roiNumber):
+        """Sorted z positions of slices covered by ROI contours
+        """
+        points = self._points[roiNumber]
+        offsets = self._offsets[roiNumber]
+        if len(points) == 0:
+            return np.empty(0)
+
+        # Planar contours, z of the first point stands for the contour
+        return np.unique(np.round(points[offsets[:-1], 2], SLICE_POSITION_DECIMALS))
+
+    def sliceCoverage(self, roiNumber):
+        """Slice coverage of ROI as (first z, last z, number of slices), None when ROI has no contours
+        """
+        positions = self.slicePositions(roiNumber)
+        if len(positions) == 0:
+            return None
+
+        return positions[0], positions[-1], len(positions)
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _decodeContours(self, roiNumber, contours):
+        """Decode ContourData of contours into one points array and contour offsets
+        """
+        values = []
+        counts = []
+        for index, contour in enumerate(contours):
+            if CONTOUR_DATA_TAG not in contour:
+                continue
+
+            value = contour.get_item(CONTOUR_DATA_TAG).value
+            if isinstance(value, str):
+                # Raw DS string (backslash separated values)
+                value = value.strip(" \0")
+                if value == "":
+                    continue
+                count = value.count("\\") + 1
+            else:
+                # Value has already been converted by pydicom
+                if not hasattr(value, "__iter__"):
+                    value = [value]
+                value = "\\".join(str(v) for v in value)
+                count = len(value.split("\\"))
+
+            if not self._isValidContour(roiNumber, index, contour, count):
+                continue
+
+            values.append(value)
+            counts.append(count)
+
+        if not values:
+            return np.empty((0, 3)), np.zeros(1, dtype=np.int64)
+
+        # One conversion for all contours of ROI
+        try:
+            points = np.array("\\".join(values).split("\\"), dtype=np.float64).reshape(-1, 3)
+        except ValueError:
+            # Contours with values which are not numbers are skipped
+            decoded = []
+            counts = []
+            for value in values:
+                try:
+                    decoded.append(np.array(value.split("\\"), dtype=np.float64).reshape(-1, 3))
+                    counts.append(decoded[-1].size)
+                except ValueError:
+                    self._logger.warning("Skipped contour of ROI " + str(roiNumber) + " with invalid ContourData values.")
+
+            if not decoded:
+                return np.empty((0, 3)), np.zeros(1, dtype=np.int64)
+            points = np.concatenate(decoded)
+
+        offsets = np.concatenate(([0], np.cumsum(counts) // 3)).astype(np.int64)
+
+        return points, offsets
+
+    def _isValidContour(self, roiNumber, index, contour, count):
+        """Check number of ContourData values (x, y, z triplets matching NumberOfContourPoints when present)
+        """
+        if count % 3 != 0:
+            self._logger.warning(
+                "Skipped contour " + str(index) + " of ROI " + str(roiNumber) +
+                ": number of ContourData values (" + str(count) + ") is not divisible by 3."
+            )
+            return False
+
+        if "NumberOfContourPoints" in contour:
+            try:
+                expected = int(contour.NumberOfContourPoints)
+            except (TypeError, ValueError):
+                expected = None
+            if expected is not None and expected * 3 != count:
+                self._logger.warning(
+                    "Skipped contour " + str(index) + " of ROI " + str(roiNumber) + ": NumberOfContourPoints (" +
+                    str(expected) + ") does not match ContourData (" + str(count / 3) + " points)."
+                )
+                return False
+
+        return True
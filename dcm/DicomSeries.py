@@ -6,41 +6,39 @@
  ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
 #### ##     ## ##         #######  ##     ##    ##     ######
 
-# Standard
-import gc
-
 # DICOM
 import dicom
-from dicom.sequence import Sequence
 
 # Domain
 from domain.Node import Node
 
-from dcm.DSRDocument import DSRDocument
 from dcm.DicomRtStructure import DicomRtStructure
+from dcm.DicomRtStructureSet import DicomRtStructureSet
+from dcm.DicomSeriesHeader import DicomSeriesHeader
 
 
 class DicomSeries(Node):
     """DicomSeries
     This class represents a serie of dicom files that belong together.
     If these are multiple files, they represent the slices of a volume
-    (like for CT or MRI). The actual volume can be obtained using loadData().
+    (like for CT or MRI). The actual volume can be obtained from
+    DicomVolumeService (DicomVolumeCacheService for shared volumes).
     Information about the data can be obtained using the info attribute.
     """
 
     # To create a DicomSeries object, start by making an instance and
-    # append files using the "_append" method. When all files are
-    # added, call "_sort" to sort the files, and then "_finish" to evaluate
-    # the data, perform some checks, and set the shape and sampling
-    # attributes of the instance.
+    # append files using the "appendFile" method. When all files are
+    # added, call "_finish" with the header record of the first file
+    # (collected during scanning). Only the header is kept, full datasets
+    # are loaded on demand.
 
     def __init__(self, suid, showProgress=False, parent=None):
         """Default constructor
         """
         super (DicomSeries, self).__init__(suid, parent)
 
-        # Init dataset list and the callback
-        self._datasets = Sequence()
+        # Init header cache and the callback
+        self._header = None
         self._showProgress = showProgress
 
         # Init properties
@@ -59,6 +57,9 @@ class DicomSeries(Node):
         self._dsrDocuments = []
         self._approvedReportText = ""
         self._isApproved = False
+        self._geometryIssues = []
+        self._burnedInAnnotation = None
+        self._structureSet = None
 
 ########  ########   #######  ########  ######## ########  ######## #### ########  ######
 ##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
@@ -89,6 +90,12 @@ class DicomSeries(Node):
         """
         return self._shape
 
+    @shape.setter
+    def shape(self, value):
+        """Shape of the data Setter (set when the volume is loaded)
+        """
+        self._shape = value
+
     @property
     def sampling(self):
         """ The sampling (voxel distances) of the data (dz, dy, dx).
@@ -96,6 +103,12 @@ class DicomSeries(Node):
         """
         return self._sampling
 
+    @sampling.setter
+    def sampling(self, value):
+        """Sampling of the data Setter (set when the volume is loaded)
+        """
+        self._sampling = value
+
     @property
     def info(self):
         """ A DataSet instance containing the information as present in the
@@ -112,51 +125,52 @@ class DicomSeries(Node):
         # One of these can have interesting data to display
         # (RTPlanLabel, RTPlanName, RTPlanDescription)
         # TODO: PrescriptionDescription - can be intereting to display somewhere
+        header = self._header
         if self.modality == "RTPLAN":
-            if self._datasets:
-                if "RTPlanLabel" in self._datasets[0] and self._datasets[0].RTPlanLabel != "":
-                    result = self._datasets[0].RTPlanLabel
-                elif "RTPlanName" in self._datasets[0] and self._datasets[0].RTPlanName != "":
-                    result = self._datasets[0].RTPlanName
-                elif "RTPlanDescription" in self._datasets[0] and self._datasets[0].RTPlanDescription != "":
-                    result = self._datasets[0].RTPlanDescription
+            if header is not None:
+                if header.get("RTPlanLabel", "") != "":
+                    result = header.RTPlanLabel
+                elif header.get("RTPlanName", "") != "":
+                    result = header.RTPlanName
+                elif header.get("RTPlanDescription", "") != "":
+                    result = header.RTPlanDescription
         
         # One of these can have insteresting data to display
         # (DoseComment)
         # TODO: DoseUnits   "GY", "RELATIVE"
         #       DoseType    "PHYSICAL", "EFFECTIVE, ERROR"
         elif self.modality == "RTDOSE":
-            if self._datasets:
-                if "DoseComment" in self._datasets[0] and self._datasets[0].DoseComment != "":
-                    result = self._datasets[0].DoseComment
+            if header is not None:
+                if header.get("DoseComment", "") != "":
+                    result = header.DoseComment
 
         # One of these can have interesting data to display
         # (StructureSetLabel, StructureSetName, StructureSetDescription)
         elif self.modality == "RTSTRUCT":
-            if self._datasets:
-                if "StructureSetLabel" in self._datasets[0] and self._datasets[0].StructureSetLabel != "":
-                    result = self._datasets[0].StructureSetLabel
+            if header is not None:
+                if header.get("StructureSetLabel", "") != "":
+                    result = header.StructureSetLabel
                 
                 # It can be usefull to display both lable and name
-                if "StructureSetName" in self._datasets[0] and self._datasets[0].StructureSetName != "":
+                if header.get("StructureSetName", "") != "":
                     if result != "":
                         result += " "
-                    result += self._datasets[0].StructureSetName
-                elif "StructureSetDescription" in self._datasets[0] and self._datasets[0].StructureSetDescription != "":
+                    result += header.StructureSetName
+                elif header.get("StructureSetDescription", "") != "":
                     if result != "":
                         result += " "
-                    result += self._datasets[0].StructureSetDescription
+                    result += header.StructureSetDescription
 
         # One of these can have interesting data to display
         # (RTImageName, RTImageLabel, RTImageDescription)
         elif self.modality == "RTIMAGE":
-            if self._datasets:
-                if "RTImageName" in self._datasets and self.datasets[0].RTImageName != "":
-                    result = self.datasets[0].RTImageName
-                elif "RTImageLabel" in self._datasets and self.datasets[0].RTImageLabel != "":
-                    result = self.datasets[0].RTImageLabel               
-                elif "RTImageDescription" in self._datasets and self.datasets[0].RTImageDescription != "":
-                    result = self.datasets[0].RTImageDescription
+            if header is not None:
+                if header.get("RTImageName", "") != "":
+                    result = header.RTImageName
+                elif header.get("RTImageLabel", "") != "":
+                    result = header.RTImageLabel
+                elif header.get("RTImageDescription", "") != "":
+                    result = header.RTImageDescription
 
         # Append series description
         if self.info is not None:
@@ -164,11 +178,11 @@ class DicomSeries(Node):
                 if result != "":
                     result += " "
                 result += self.info.SeriesDescription
-        elif self._datasets:
-            if "SeriesDescription" in self._datasets[0]:
+        elif header is not None:
+            if "SeriesDescription" in header:
                 if result != "":
                     result += " "
-                result += self._datasets[0].SeriesDescription
+                result += header.SeriesDescription
 
         if self._description != "" and self._description is not None:
             return self._description
@@ -189,9 +203,9 @@ class DicomSeries(Node):
             if "Modality" in self.info:
                 return self.info.Modality
         
-        if self._datasets:
-            if "Modality" in self._datasets[0]:
-                return self._datasets[0].Modality
+        if self._header is not None:
+            if "Modality" in self._header:
+                return self._header.Modality
 
         if self._modality != "" and self._modality is not None:
             return self._modality
@@ -227,21 +241,22 @@ class DicomSeries(Node):
         """DICOM series date Getter (supports DICOM-RT modalities)
         """
         if self._date is None or self._date == "":
-            if self._datasets:
+            header = self._header
+            if header is not None:
                 if self.modality == "RTSTRUCT":
-                    if "StructureSetDate" in self._datasets[0]:
-                        self._date = self._datasets[0].StructureSetDate
+                    if "StructureSetDate" in header:
+                        self._date = header.StructureSetDate
                 elif self.modality == "RTPLAN":
-                    if "RTPlanDate" in self._datasets[0]:
-                        self.date = self._datasets[0].RTPlanDate
+                    if "RTPlanDate" in header:
+                        self.date = header.RTPlanDate
                 elif self.modality == "RTDOSE":
-                    if "InstanceCreationDate" in self._datasets[0]:
-                        self.date = self._datasets[0].InstanceCreationDate
+                    if "InstanceCreationDate" in header:
+                        self.date = header.InstanceCreationDate
                 elif self.modality == "RTIMAGE":
-                    if "InstanceCreationDate" in self._datasets[0]:
-                        self.date = self._datasets[0].InstanceCreationDate
-                elif "SeriesDate" in self._datasets[0]:
-                    self._date = self._datasets[0].SeriesDate
+                    if "InstanceCreationDate" in header:
+                        self.date = header.InstanceCreationDate
+                elif "SeriesDate" in header:
+                    self._date = header.SeriesDate
 
         return self._date
 
@@ -265,17 +280,16 @@ class DicomSeries(Node):
 
     @property
     def sopInstanceUid(self):
-        """DICOM SOP instance UID of series when there is just one instance
+        """DICOM SOP instance UID of the first series instance (header)
         """
-        if len(self._datasets) == 1:
-            if "SOPInstanceUID" in self._datasets[0]:
-                return self._datasets[0].SOPInstanceUID
+        if self._header is not None:
+            return self._header.get("SOPInstanceUID")
 
     @property
-    def datasets(self):
-        """DICOM serie data files Getter
+    def header(self):
+        """Cached header of the first DICOM series file (None when not finished)
         """
-        return self._datasets
+        return self._header
 
     @property
     def files(self):
@@ -297,16 +311,10 @@ class DicomSeries(Node):
 
         # For RTSTRUCT I want to know how many ROIs are present
         if self.modality == "RTSTRUCT":
-            if self._datasets:
+            if self._header is not None:
 
                 # Display also count of roi structures
-                roiCount = 0
-                for element in self._datasets[0]:
-                    if element.VR == "SQ":
-                        if element.name == "Structure Set ROI Sequence":
-                            for subElem in element:
-                                roiCount += 1
-                result = roiCount
+                result = len(self._header.rois)
 
         # For RTPLAN
         #if self.modality == "RTPLAN":
@@ -321,17 +329,55 @@ class DicomSeries(Node):
         return result
 
     @property
-    def dsrDocuments(self):
-        """DSR Document Getter
+    def structureSet(self):
+        """Contour model of RTSTRUCT series (contours are decoded on first access)
+        """
+        if self.modality == "RTSTRUCT" and self._structureSet is None and len(self._files) > 0:
+            self._structureSet = DicomRtStructureSet(dicom.read_file(self._files[0], force=True))
+
+            # ROI nodes share the contour model
+            self.prepareRois()
+            for roi in self._children:
+                roi.structureSet = self._structureSet
+
+        return self._structureSet
+
+    @property
+    def geometryIssues(self):
+        """Slice geometry issues (missing slices, uneven spacing, mixed geometry) Getter
         """
-        if self.modality == "SR":
-            if len(self._dsrDocuments) == 0:
-                for f in self._files:               
-                    dcmFile = dicom.read_file(f, force=True)
-                    self._dsrDocuments.append(DSRDocument(dcmFile))
+        return self._geometryIssues
 
+    @geometryIssues.setter
+    def geometryIssues(self, value):
+        """Slice geometry issues Setter
+        """
+        self._geometryIssues = value
+
+    @property
+    def burnedInAnnotation(self):
+        """Reason why pixel data can contain burned in annotations (None = no annotations) Getter
+        """
+        return self._burnedInAnnotation
+
+    @burnedInAnnotation.setter
+    def burnedInAnnotation(self, value):
+        """Burned in annotation reason Setter
+        """
+        self._burnedInAnnotation = value
+
+    @property
+    def dsrDocuments(self):
+        """DSR Document Getter (documents are parsed by DSRDocumentService)
+        """
         return self._dsrDocuments
 
+    @dsrDocuments.setter
+    def dsrDocuments(self, value):
+        """DSR Document Setter
+        """
+        self._dsrDocuments = value
+
     @property
     def approvedReportText(self):
         if (self._isApproved):
@@ -369,65 +415,16 @@ class DicomSeries(Node):
         """
         return self.date
 
-    def get_pixel_array(self):
-        """ get_pixel_array()
-
-        Get (load) the data that this DicomSeries represents, and return
-        it as a numpy array. If this serie contains multiple images, the
-        resulting array is 3D, otherwise it's 2D.
-
-        If RescaleSlope and RescaleIntercept are present in the dicom info,
-        the data is rescaled using these parameters. The data type is chosen
-        depending on the range of the (rescaled) data
-        """
-
-        # Can we do this?
-        if not have_numpy:
-            msg = "The Numpy package is required to use get_pixel_array.\n"
-            raise ImportError(msg)
-
-        # It's easy if no file or if just a single file
-        if len(self._datasets) == 0:
-            raise ValueError('Serie does not contain any files.')
-        elif len(self._datasets) == 1:
-            ds = self._datasets[0]
-            slice = _getPixelDataFromDataset(ds)
-            return slice
-
-        # Check info
-        if self.info is None:
-            raise RuntimeError("Cannot return volume if series not finished.")
-
-        # Set callback to update progress
-        showProgress = self._showProgress
-
-        # Init data (using what the dicom packaged produces as a reference)
-        ds = self._datasets[0]
-        slice = _getPixelDataFromDataset(ds)
-        # vol = Aarray(self.shape, self.sampling, fill=0, dtype=slice.dtype)
-        vol = np.zeros(self.shape, dtype=slice.dtype)
-        vol[0] = slice
-
-        # Fill volume
-        showProgress('Loading data:')
-        ll = self.shape[0]
-        for z in range(1, ll):
-            ds = self._datasets[z]
-            vol[z] = _getPixelDataFromDataset(ds)
-            showProgress(float(z) / ll)
-
-        # Finish
-        showProgress(None)
-
-        # Done
-        gc.collect()
-        return vol
-
     def appendFile(self, filename):
         """Add file (instance) to the series
         """
         self._files.append(filename)
 
+    def replaceFile(self, filename, replacement):
+        """Replace file (instance) of the series with another copy of the same instance
+        """
+        self._files[self._files.index(filename)] = replacement
+
     def documentsAreApproved(self):
         """Check if all documents are approved
         """
@@ -442,27 +439,21 @@ class DicomSeries(Node):
         """
         if self.modality == "RTSTRUCT":
             if len(self._children) == 0:
-                if len(self._datasets) == 1:
-
-                    for element in self._datasets[0]:
-                        if element.VR == "SQ":
-                            if element.name == "Structure Set ROI Sequence":
-                                for subElem in element:
-                                    self._children.append(
-                                        DicomRtStructure(
-                                            subElem.ROINumber,
-                                            subElem.ROIName
-                                        )
-                                    )
+                if self._header is not None:
+
+                    for roiNumber, roiName in self._header.rois:
+                        self._children.append(
+                            DicomRtStructure(
+                                roiNumber,
+                                roiName
+                            )
+                        )
                     if len(self._children) > 0:
-                        for element in self._datasets[0]:
-                            if element.VR == "SQ":
-                                if element.name == "RT ROI Observations Sequence":
-                                    for subElem in element:
-                                        for roi in self._children:
-                                            if subElem.ReferencedROINumber == roi.roiNumber:
-                                                roi.roiObservationLabel = subElem.ROIObservationLabel
-                                                roi.rtRoiInterpretedType = subElem.RTROIInterpretedType
+                        for refRoiNumber, label, interpretedType in self._header.observations:
+                            for roi in self._children:
+                                if refRoiNumber == roi.roiNumber:
+                                    roi.roiObservationLabel = label
+                                    roi.rtRoiInterpretedType = interpretedType
 
 ########  ########  #### ##     ##    ###    ######## ######## 
 ##     ## ##     ##  ##  ##     ##   ## ##      ##    ##       
@@ -472,19 +463,7 @@ class DicomSeries(Node):
 ##        ##    ##   ##    ## ##   ##     ##    ##    ##       
 ##        ##     ## ####    ###    ##     ##    ##    ######## 
 
-    def _append(self, dcm):
-        """
-        Append a dicomfile (as a dicom.dataset.FileDataset) to the series.
-        """
-        self._datasets.append(dcm)
-
-    def _sort(self):
-        """ sort()
-        Sort the datasets by instance number.
-        """
-        self._datasets.sort(key=lambda k: k.InstanceNumber)
-
-    def _finish(self):
+    def _finish(self, headerRecord):
         """
         Evaluate the series of dicom files. Together they should make up
         a volumetric dataset. This means the files should meet certain
@@ -496,14 +475,15 @@ class DicomSeries(Node):
           * that there are no missing files
           * that the dimensions of all images match
           * that the pixel spacing of all images match
-        """
-        if len(self._files) > 0:
-            dcmFile = dicom.read_file(self._files[0], force=True)
 
-            if "StudyInstanceUID" in dcmFile:
-                self._studyInstanceUid = dcmFile.StudyInstanceUID
+        headerRecord: header record of the first series file (see seriesHeaderRecord)
+        """
+        if len(self._files) > 0 and headerRecord is not None:
+            # Header is filled from the values collected when the first file was scanned (file is not read again)
+            self._header = DicomSeriesHeader(headerRecord)
 
-            self._datasets.append(dcmFile)
+            if "StudyInstanceUID" in self._header:
+                self._studyInstanceUid = self._header.StudyInstanceUID
 
             # Extract information about ROIs if possible
             self.prepareRois()
@@ -585,4 +565,4 @@ class DicomSeries(Node):
         """Object representation
         """
         adr = hex(id(self)).upper()
-        return "<DicomSeries with %i images at %s>" % (len(self._datasets), adr)
+        return "<DicomSeries with %i images at %s>" % (len(self._files), adr)
@@ -0,0 +1,131 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Header attributes which are needed to describe DICOM series in the tree
+HEADER_KEYWORDS = (
+    "StudyInstanceUID",
+    "SOPInstanceUID",
+    "Modality",
+    "SeriesDescription",
+    "SeriesDate",
+    "InstanceCreationDate",
+    "RTPlanLabel",
+    "RTPlanName",
+    "RTPlanDescription",
+    "RTPlanDate",
+    "DoseComment",
+    "StructureSetLabel",
+    "StructureSetName",
+    "StructureSetDescription",
+    "StructureSetDate",
+    "RTImageName",
+    "RTImageLabel",
+    "RTImageDescription"
+)
+
+
+######## ##     ## ##    ##  ######  ######## ####  #######  ##    ##  ######
+##       ##     ## ###   ## ##    ##    ##     ##  ##     ## ###   ## ##    ##
+##       ##     ## ####  ## ##          ##     ##  ##     ## ####  ## ##
+######   ##     ## ## ## ## ##          ##     ##  ##     ## ## ## ##  ######
+##       ##     ## ##  #### ##          ##     ##  ##     ## ##  ####       ##
+##       ##     ## ##   ### ##    ##    ##     ##  ##     ## ##   ### ##    ##
+##        #######  ##    ##  ######     ##    ####  #######  ##    ##  ######
+
+
+def seriesHeaderRecord(dataset):
+    """Collect plain values of DICOM dataset which are needed for the series header
+
+    The record is collected while DICOM files are scanned (it is pickled
+    together with the scan record), so that the series header does not
+    have to be read from the file again.
+
+    return: dictionary with header values, RTSTRUCT ROIs as (ROINumber, ROIName)
+    and ROI observations as (ReferencedROINumber, ROIObservationLabel, RTROIInterpretedType)
+    """
+    record = {
+        "values": {},
+        "rois": [],
+        "observations": []
+    }
+
+    for keyword in HEADER_KEYWORDS:
+        if keyword in dataset:
+            record["values"][keyword] = _plainValue(dataset.data_element(keyword).value)
+
+    if "StructureSetROISequence" in dataset:
+        for item in dataset.StructureSetROISequence:
+            record["rois"].append((int(item.ROINumber), _plainValue(item.ROIName)))
+
+    if "RTROIObservationsSequence" in dataset:
+        for item in dataset.RTROIObservationsSequence:
+            record["observations"].append((
+                int(item.ReferencedROINumber),
+                _plainValue(item.get("ROIObservationLabel", "")),
+                _plainValue(item.get("RTROIInterpretedType", ""))
+            ))
+
+    return record
+
+
+def _plainValue(value):
+    """Convert DICOM value to builtin string (value must not keep the dataset alive)
+    """
+    if isinstance(value, unicode):
+        return unicode(value)
+    else:
+        return str(value)
+
+
+class DicomSeriesHeader(object):
+    """Header cache of DICOM series
+    Holds only the attributes of the first series file which are needed to
+    display the series (description, modality, date, ROIs), so that the
+    dataset itself (and its pixel data) does not have to be kept in memory.
+
+    record: header record of the first series file (see seriesHeaderRecord)
+    """
+
+    __slots__ = ("_values", "rois", "observations")
+
+    def __init__(self, record):
+        """Default constructor
+        """
+        self._values = dict(record.get("values", {}))
+
+        # RTSTRUCT ROIs as (ROINumber, ROIName)
+        self.rois = list(record.get("rois", []))
+
+        # RTSTRUCT ROI observations as (ReferencedROINumber, ROIObservationLabel, RTROIInterpretedType)
+        self.observations = list(record.get("observations", []))
+
+    def __contains__(self, keyword):
+        """Attribute is present in header
+        """
+        return keyword in self._values
+
+    def __getattr__(self, keyword):
+        """Attribute value accessible as in DICOM dataset
+        """
+        try:
+            return self._values[keyword]
+        except KeyError:
+            raise AttributeError(keyword)
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def get(self, keyword, default=None):
+        """Attribute value or default when it is not present
+        """
+        return self._values.get(keyword, default)
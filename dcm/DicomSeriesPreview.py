@@ -0,0 +1,96 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Domain
+from domain.Node import Node
+
+
+class DicomSeriesPreview(Node):
+    """DICOM series shown in hierarchy tree while DICOM data are still scanned
+
+    Values are copied from the scanned series, the preview is replaced
+    with the series itself when scanning is finished
+    """
+
+    def __init__(self, suid, modality, description, date, objects, size, parent=None):
+        """Default constructor
+        """
+        super (DicomSeriesPreview, self).__init__(suid, parent)
+
+        # Init members
+        self._suid = suid
+        self._modality = modality
+        self._description = description
+        self._date = date
+        self._objects = objects
+        self._size = size
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def name(self):
+        """Display the same info as DICOM series
+        """
+        if self._modality == "RTSTRUCT":
+            return "[" + self._modality + "] " + self._description + " <ROI=" + str(self._objects) + ">" + " (" + str(self._size) + ")"
+        else:
+            return "[" + self._modality + "] " + self._description + " (" + str(self._size) + ")"
+
+    @property
+    def suid(self):
+        """SeriesInstanceUID Getter
+        """
+        return self._suid
+
+    @property
+    def modality(self):
+        """DICOM modality Getter
+        """
+        return self._modality
+
+    @property
+    def size(self):
+        """Number of DICOM files scanned so far Getter
+        """
+        return self._size
+
+    @size.setter
+    def size(self, value):
+        """Number of DICOM files scanned so far Setter
+        """
+        self._size = value
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def typeInfo(self):
+        """Display information about DICOM series as hierarchy node type
+        """
+        return "SERIE"
+
+    def typeDate(self):
+        """Display information about DICOM series date
+        """
+        return self._date
+
+    def __repr__(self):
+        """Object representation of DICOM series preview
+        """
+        adr = hex(id(self)).upper()
+        return "<DicomSeriesPreview %s>" % adr
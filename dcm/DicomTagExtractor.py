@@ -0,0 +1,110 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# DICOM
+from dicom.dataelem import RawDataElement
+from dicom.datadict import dictionaryVR
+
+# Undefined length of DICOM element
+UNDEFINED_LENGTH = 0xFFFFFFFF
+
+
+class DicomTagExtractor(object):
+    """Single pass DICOM tag extractor
+    Extractor is built once from a declarative list of targets and collects
+    values of all targets during one traversal of DICOM dataset (including
+    nested sequences). Elements are matched by numeric tag and elements which
+    are neither targets nor sequences are skipped without converting their
+    raw values (e.g. contour data of RTSTRUCT).
+
+    targets: list of tuples (key, tag, parentSequenceTag, collectAll)
+        key: key of extracted value in the result dictionary
+        tag: numeric tag of DICOM element
+        parentSequenceTag: element has to be an item element of this sequence (None = anywhere)
+        collectAll: collect values of all matching elements to list (otherwise the last found value is used)
+    """
+
+    def __init__(self, targets):
+        """Default constructor
+        """
+        # Target definitions indexed by tag (key = tag, value = list of (key, parentSequenceTag, collectAll))
+        self._targets = {}
+        # Keys which collect lists of values
+        self._listKeys = []
+
+        for key, tag, parentSequenceTag, collectAll in targets:
+            self._targets.setdefault(tag, []).append((key, parentSequenceTag, collectAll))
+            if collectAll:
+                self._listKeys.append(key)
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def extract(self, dataset):
+        """Collect values of all targets from DICOM dataset
+
+        return: dictionary (key = target key, value = last found value or list of found values)
+        targets which were not found are missing (list targets are empty lists)
+        """
+        result = {}
+        for key in self._listKeys:
+            result[key] = []
+
+        self._walk(dataset, None, result)
+
+        return result
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _walk(self, dataset, parentSequenceTag, result):
+        """Traverse dataset and its sequences in tag order
+        """
+        for tag in sorted(dataset.keys()):
+            targets = self._targets.get(tag)
+
+            if targets is None and self._rawVR(dict.__getitem__(dataset, tag)) != "SQ":
+                continue
+
+            # Conversion of raw element happens only for targets and sequences
+            element = dataset[tag]
+
+            if element.VR == "SQ":
+                for item in element.value:
+                    self._walk(item, tag, result)
+            else:
+                for key, parent, collectAll in targets:
+                    if parent is None or parent == parentSequenceTag:
+                        if collectAll:
+                            result[key].append(element.value)
+                        else:
+                            result[key] = element.value
+
+    def _rawVR(self, element):
+        """Determine VR of (possibly not yet converted) data element
+        """
+        if isinstance(element, RawDataElement) and element.VR is None:
+            # Implicit VR transfer syntax
+            try:
+                return dictionaryVR(element.tag)
+            except KeyError:
+                if element.length == UNDEFINED_LENGTH:
+                    return "SQ"
+                return "UN"
+
+        return element.VR
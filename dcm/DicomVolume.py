@@ -0,0 +1,130 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import os
+
+# Logging
+import logging
+import logging.config
+
+
+class DicomVolume(object):
+    """DICOM volume
+    Pixel data of DICOM series assembled in slice order. The array is usually
+    a numpy.memmap backed by a temporary file, so that large series do not
+    have to be held in RAM. Call close() when the volume is not needed anymore.
+
+    array: pixel data with shape (nz, ny, nx)
+    sampling: voxel distances (dz, dy, dx) in mm
+    files: DICOM files in slice order
+    path: file backing the array (None when the array is in memory)
+    """
+
+    def __init__(self, array, sampling, files, path=None):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+        self._array = array
+        self._sampling = sampling
+        self._files = files
+        self._path = path
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def array(self):
+        """Pixel data (nz, ny, nx)
+        """
+        return self._array
+
+    @property
+    def shape(self):
+        """The shape of the data (nz, ny, nx)
+        """
+        if self._array is not None:
+            return self._array.shape
+
+    @property
+    def sampling(self):
+        """The sampling (voxel distances) of the data (dz, dy, dx)
+        """
+        return self._sampling
+
+    @property
+    def files(self):
+        """DICOM files in slice order
+        """
+        return self._files
+
+    @property
+    def path(self):
+        """File backing the pixel data (None when the data is in memory)
+        """
+        return self._path
+
+    @property
+    def nbytes(self):
+        """Size of pixel data in bytes
+        """
+        if self._array is not None:
+            return self._array.nbytes
+        return 0
+
+    @property
+    def isClosed(self):
+        """Pixel data has been released
+        """
+        return self._array is None
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def close(self):
+        """Release pixel data and remove the backing file
+        """
+        # Mapping has to be released before the file can be removed (Windows)
+        path = self.unmap()
+
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                self._logger.warning("Cannot remove volume file: " + path)
+
+    def unmap(self):
+        """Release pixel data and keep the backing file (the caller takes over the file)
+
+        return: path of backing file (None when the data was in memory)
+        """
+        self._array = None
+
+        path = self._path
+        self._path = None
+
+        return path
+
+    def __repr__(self):
+        """Object representation
+        """
+        adr = hex(id(self)).upper()
+        return "<DicomVolume %s of %i files at %s>" % (str(self.shape), len(self._files), adr)
@@ -0,0 +1,111 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+from dicom.datadict import DicomDictionary, RepeatersDictionary
+
+# Rule actions
+RULE_OPTION = 0  # attribute action of deident option is performed
+RULE_REMOVE = 1  # element is removed
+RULE_REPLACE = 2  # element value is replaced with default value according to VR
+
+class DeidentRules(object):
+    """Deidentification rules compiled into dictionary keyed by numeric tag
+
+    Attribute names of the basic profile (remove and replace lists) are
+    resolved to tags with the DICOM dictionary, attributes of options
+    are keyed by their group and element. Option rules override remove rules
+    which override replace rules, so one lookup decides about an element.
+    Names of repeating group attributes (50xx, 60xx) are compiled into
+    masked tables.
+    """
+
+    def __init__(self, removeNames, replaceNames, options):
+        """Default constructor
+        """
+        self._rules = {}
+        self._repeaterRules = {}  # key = tag mask, value = dictionary of masked tag -> rule
+
+        self._compile(removeNames, replaceNames, options)
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def Rules(self):
+        """Rules Getter (key = tag, value = tuple of action and option attribute)
+        """
+        return self._rules
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def __len__(self):
+        """Number of compiled rules
+        """
+        return len(self._rules) + sum(len(table) for table in self._repeaterRules.itervalues())
+
+    def Get(self, tag):
+        """Rule for tag as tuple (action, option attribute), None when there is no rule
+        """
+        rule = self._rules.get(tag)
+        if rule is None and self._repeaterRules:
+            for mask, table in self._repeaterRules.iteritems():
+                rule = table.get(tag & mask)
+                if rule is not None:
+                    break
+
+        return rule
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _compile(self, removeNames, replaceNames, options):
+        """Compile rules (later rules override earlier ones)
+        """
+        tagsByName = {}
+        for tag, entry in DicomDictionary.iteritems():
+            tagsByName.setdefault(entry[2], []).append(tag)
+
+        repeatersByName = {}
+        for mask, entry in RepeatersDictionary.iteritems():
+            repeatersByName.setdefault(entry[2], []).append(mask)
+
+        for names, action in ((replaceNames, RULE_REPLACE), (removeNames, RULE_REMOVE)):
+            for name in names:
+                for tag in tagsByName.get(name, []):
+                    self._rules[tag] = (action, None)
+                for mask in repeatersByName.get(name, []):
+                    self._addRepeaterRule(mask, (action, None))
+
+        for option in options:
+            for attribute in option.Attributes:
+                tag = (int(attribute.Group, 16) << 16) | int(attribute.Element, 16)
+                self._rules[tag] = (RULE_OPTION, attribute)
+
+    def _addRepeaterRule(self, mask, rule):
+        """Add rule for repeater mask string (e.g. 60xx3000)
+        """
+        tagMask = int("".join("0" if c in "xX" else "F" for c in mask), 16)
+        value = int("".join("0" if c in "xX" else c for c in mask), 16)
+
+        self._repeaterRules.setdefault(tagMask, {})[value] = rule
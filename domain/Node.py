@@ -103,6 +103,13 @@ class Node(object):
             child.parent = self
         self._children.append(child)
 
+    def insertChild(self, row, child):
+        """Insert child node at row
+        """
+        if child.parent is None:
+            child.parent = self
+        self._children.insert(row, child)
+
     def removeChild(self, child):
         """Remove child node
         """
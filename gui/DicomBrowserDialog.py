@@ -12,6 +12,11 @@ from PyQt4 import QtGui, QtCore
 # Dialog UI 
 from gui.DicomBrowserDialogUI import DicomBrowserDialogUI
 
+# Domain
+from domain.Node import Node
+from dcm.DicomStudy import DicomStudy
+from dcm.DicomSeriesPreview import DicomSeriesPreview
+
 # ViewModels
 from viewModels.DicomDataItemModel import DicomDataItemModel
 
@@ -39,6 +44,10 @@ class DicomBrowserDialog(QtGui.QDialog, DicomBrowserDialogUI):
         self._rootNode = None
         self._dicomDataModel = None
 
+        # Studies and series shown while scanning (key = UID)
+        self._scannedStudies = {}
+        self._scannedSeries = {}
+
         # Handlers
         self.btnOk.clicked.connect(self.btnOkClicked)
 
@@ -93,6 +102,79 @@ class DicomBrowserDialog(QtGui.QDialog, DicomBrowserDialogUI):
 ##     ## ##     ## ##   ### ##     ## ##       ##       ##    ##  ##    ##
 ##     ## ##     ## ##    ## ########  ######## ######## ##     ##  ######
 
+    def setScanning(self, scanning):
+        """DICOM data are still scanned, the tree is populated progressively
+        Selection is possible, but it can be confirmed when the scanning is finished (or stopped)
+        """
+        self.btnStop.setVisible(scanning)
+        self.btnStop.setEnabled(scanning)
+        self.btnOk.setEnabled(not scanning)
+
+    def startScanning(self):
+        """Show empty tree which is populated with series discovered while scanning
+        """
+        self._scannedStudies = {}
+        self._scannedSeries = {}
+
+        self.setModel(Node("DICOM data root node"))
+        self.setScanning(True)
+
+    def addScannedSeries(self, data):
+        """New DICOM series was discovered (data are values of series and its study)
+        """
+        study = self._scannedStudies.get(data["studyInstanceUid"])
+        if study is None:
+            study = DicomStudy(data["studyInstanceUid"])
+            study.name = data["studyName"]
+            study.description = data["studyDescription"]
+            study.date = data["studyDate"]
+            self._scannedStudies[study.suid] = study
+            self._dicomDataModel.insertNode(self._rootNode, study)
+
+        serie = DicomSeriesPreview(
+            data["seriesInstanceUid"],
+            data["modality"],
+            data["description"],
+            data["date"],
+            data["objects"],
+            data["size"]
+        )
+        # Study could be selected before all its series were discovered
+        serie.isChecked = study.isChecked
+        self._scannedSeries[serie.suid] = serie
+        self._dicomDataModel.insertNode(study, serie)
+
+        self.treeDicomData.expandAll()
+
+    def updateScannedFiles(self, sizes):
+        """Number of scanned files of series changed (key = SeriesInstanceUID, value = number of files)
+        """
+        for suid, size in sizes.iteritems():
+            serie = self._scannedSeries.get(suid)
+            if serie is not None:
+                serie.size = size
+                self._dicomDataModel.nodeChanged(serie)
+
+    def finishScanning(self, dicomData):
+        """Scanning finished, shown tree is replaced with scanned DICOM data (selection is kept)
+        """
+        for study in dicomData.children:
+            scannedStudy = self._scannedStudies.get(study.suid)
+            if scannedStudy is not None and scannedStudy.isChecked:
+                study.isChecked = True
+
+        for study in dicomData.children:
+            for serie in study.children:
+                scannedSerie = self._scannedSeries.get(serie.suid)
+                if scannedSerie is not None:
+                    serie.isChecked = scannedSerie.isChecked
+
+        self._scannedStudies = {}
+        self._scannedSeries = {}
+
+        self.setModel(dicomData)
+        self.setScanning(False)
+
     def treeDataChanged(self):
         """Selection in tree view changed
         """
@@ -74,5 +74,19 @@ class DicomBrowserDialogUI(object):
     def setupButtons(self):
         """Setup dialog buttons
         """
+        buttonsLayout = QtGui.QHBoxLayout()
+        buttonsLayout.setContentsMargins(0, 0, 0, 0)
+
+        # Stop reading of DICOM data (available while the folder is scanned)
+        self.btnStop = QtGui.QPushButton("Stop reading")
+        self.btnStop.setVisible(False)
+
         self.btnOk = QtGui.QPushButton("Ok")
-        return self.btnOk
+
+        buttonsLayout.addWidget(self.btnStop)
+        buttonsLayout.addWidget(self.btnOk)
+
+        buttons = QtGui.QWidget()
+        buttons.setLayout(buttonsLayout)
+
+        return buttons
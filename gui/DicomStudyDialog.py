@@ -28,9 +28,15 @@ from contexts.ConfigDetails import ConfigDetails
 # DICOM de-identification
 from dicomdeident.DeidentConfig import DeidentConfig
 
+# Services
+from services.DSRDocumentService import DSRDocumentService
+
 # Utils
 from utils import first
 
+# Workers
+from workers.WorkerThread import WorkerThread
+
 ########  ####    ###    ##        #######   ######
 ##     ##  ##    ## ##   ##       ##     ## ##    ##
 ##     ##  ##   ##   ##  ##       ##     ## ##
@@ -64,6 +70,9 @@ class DicomStudyDialog(QtGui.QDialog, DicomStudyDialogUI):
 
         self._selectedSerie = None
 
+        # Report texts of SR series are rendered in working threads
+        self._threadPool = []
+
         self._reportMaxLength = 3999
         self._reportLength = 0
         self.lblFreeLength.setText(str(self._reportLength) + "/" + str(self._reportMaxLength))
@@ -185,6 +194,14 @@ class DicomStudyDialog(QtGui.QDialog, DicomStudyDialogUI):
         self.tvSeries.setModel(self.seriesProxyModel)
         self.tvSeries.resizeColumnsToContents()
 
+        # Inform about inconsistent slice geometry
+        issueSeries = [s for s in self._studySeries if s.geometryIssues]
+        if issueSeries:
+            self.lblGeometryIssues.setText(
+                str(len(issueSeries)) + " series have inconsistent slice geometry (see the Geometry column)."
+            )
+            self.lblGeometryIssues.setVisible(True)
+
         # Selection changed
         self.cmbStudyType.currentIndexChanged['QString'].connect(self.cmbStudyTypeChanged)
         self.tvSeries.selectionModel().currentChanged.connect(self.tblSeriesItemChanged)
@@ -264,6 +281,15 @@ class DicomStudyDialog(QtGui.QDialog, DicomStudyDialogUI):
 
         return genderPass and dobPass
 
+    def renderReportText(self, serie, thread=None):
+        """Render report text of SR series (in working thread)
+        """
+        # Rendered texts are cached by the service (they are not rendered again when shown)
+        DSRDocumentService().texts(serie.files)
+
+        if thread:
+            thread.emit(QtCore.SIGNAL("finished(QVariant)"), serie)
+
 ##     ##    ###    ##    ## ########  ##       ######## ########   ######
 ##     ##   ## ##   ###   ## ##     ## ##       ##       ##     ## ##    ##
 ##     ##  ##   ##  ####  ## ##     ## ##       ##       ##     ## ##
@@ -284,6 +310,13 @@ class DicomStudyDialog(QtGui.QDialog, DicomStudyDialogUI):
                 serie for serie in self._studySeries if str(serie.suid) == index.data().toPyObject()
             )
 
+            # Slice geometry issues of selected series
+            if self._selectedSerie.geometryIssues:
+                self.lblGeometryIssues.setText("\n".join(self._selectedSerie.geometryIssues))
+                self.lblGeometryIssues.setVisible(True)
+            else:
+                self.lblGeometryIssues.setVisible(False)
+
             if self._selectedSerie.modality == "SR":
                 self.tabWidget.setTabEnabled(1, True)
                 self.teReport.setEnabled(True)
@@ -295,13 +328,35 @@ class DicomStudyDialog(QtGui.QDialog, DicomStudyDialogUI):
                     self.teReport.setStyleSheet(self.greenStyle)
                 else:
                     self.teReport.setStyleSheet(self.redStyle)
-                    for doc in self._selectedSerie.dsrDocuments:
-                        self.teReport.insertPlainText(doc.renderText())
+
+                    # Report can be edited and approved when its text is rendered
+                    self.teReport.setEnabled(False)
+                    self.btnApprove.setEnabled(False)
+
+                    self._threadPool.append(WorkerThread(self.renderReportText, self._selectedSerie))
+                    self.connect(
+                        self._threadPool[len(self._threadPool) - 1],
+                        QtCore.SIGNAL("finished(QVariant)"),
+                        self.renderReportTextFinished
+                    )
+                    self._threadPool[len(self._threadPool) - 1].start()
             else:
                 self.tabWidget.setTabEnabled(1, False)
                 self.teReport.setEnabled(False)
                 self.btnApprove.setEnabled(False)
 
+    def renderReportTextFinished(self, serie):
+        """Show rendered report text of SR series
+        """
+        serie = serie.toPyObject()
+
+        # Selection could change while the text was rendered
+        if serie is self._selectedSerie and not serie.isApproved:
+            self.teReport.clear()
+            self.teReport.insertPlainText("".join(DSRDocumentService().texts(serie.files)))
+            self.teReport.setEnabled(True)
+            self.btnApprove.setEnabled(True)
+
     def cmbStudyTypeChanged(self, value):
         """On selected study type changed
         """
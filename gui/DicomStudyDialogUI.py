@@ -230,8 +230,14 @@ class DicomStudyDialogUI(object):
         layoutSeriesToolbar.addWidget(self.txtSeriesFilter, 1, 1)
         layoutSeriesToolbar.addWidget(self.btnCopySeriesDesc, 1, 2)
 
+        # Slice geometry issues of selected series
+        self.lblGeometryIssues = QtGui.QLabel()
+        self.lblGeometryIssues.setWordWrap(True)
+        self.lblGeometryIssues.setVisible(False)
+
         layoutSeries.addLayout(layoutSeriesToolbar)
         layoutSeries.addWidget(self.tvSeries)
+        layoutSeries.addWidget(self.lblGeometryIssues)
 
         # Final GUI element
         return tabSeries
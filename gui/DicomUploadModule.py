@@ -733,6 +733,9 @@ class DicomUploadModule(QWidget, DicomUploadModuleUI):
     def performDicomDataPreparation(self):
         """Extract the structure from dicom data
         """
+        # DICOM browser is shown as soon as the first series is discovered
+        self.dicomBrowserDialog = None
+
         # Create thread, and pass the DICOM folder as parameter
         self._threadPool.append(WorkerThread(self.svcDicom.prepareDicomData, self.directory))
 
@@ -752,6 +755,16 @@ class DicomUploadModule(QWidget, DicomUploadModuleUI):
             QtCore.SIGNAL("taskUpdated"),
             self.handleTaskUpdated
         )
+        self.connect(
+            self._threadPool[len(self._threadPool) - 1],
+            QtCore.SIGNAL("seriesDiscovered"),
+            self.DicomSeriesDiscovered
+        )
+        self.connect(
+            self._threadPool[len(self._threadPool) - 1],
+            QtCore.SIGNAL("seriesFilesAdded"),
+            self.DicomSeriesFilesAdded
+        )
         self.connect(
             self._threadPool[len(self._threadPool) - 1],
             QtCore.SIGNAL("finished(QString)"),
@@ -1454,25 +1467,61 @@ class DicomUploadModule(QWidget, DicomUploadModuleUI):
         """
         self.textBrowserProgress.append(string)
 
+    def DicomSeriesDiscovered(self, data):
+        """New DICOM series was discovered while scanning, show it in DICOM browser
+        """
+        if self.dicomBrowserDialog is None:
+            self.showDicomBrowser(True)
+
+        self.dicomBrowserDialog.addScannedSeries(data)
+
+    def DicomSeriesFilesAdded(self, sizes):
+        """DICOM files were added to already displayed series (update number of files)
+        """
+        if self.dicomBrowserDialog is not None:
+            self.dicomBrowserDialog.updateScannedFiles(sizes)
+
+    def DicomStopReadingClicked(self):
+        """Stop scanning of DICOM data, the browser keeps already discovered series
+        """
+        self.dicomBrowserDialog.btnStop.setEnabled(False)
+        self.svcDicom.cancelDicomDataPreparation()
+
     def DicomPrepareFinished(self, result):
         """Preparation finished show DICOM browser
         """
         # DICOM parsing sucessful
         if result == "True":
-            # Collect DICOM data hierarchy
-            rootNode = self.svcDicom.dataRoot
-
-            # Provide the possibility to subselect what DICOM data to include
-            self.dicomBrowserDialog = DicomBrowserDialog(self)
-            self.dicomBrowserDialog.setModel(rootNode)
-
-            if self.dicomBrowserDialog.exec_():
-                self.performDicomAnalysis()
+            if self.dicomBrowserDialog is None:
+                self.showDicomBrowser(False)
             else:
-                self.DicomUploadFinishedMessage()
+                self.dicomBrowserDialog.finishScanning(self.svcDicom.dataRoot)
         # DICOM parsing was not sucessful
         else:
-            self.DicomUploadFinishedMessage()
+            if self.dicomBrowserDialog is not None:
+                self.dicomBrowserDialog.reject()
+            else:
+                self.DicomUploadFinishedMessage()
+
+    def showDicomBrowser(self, scanning):
+        """Provide the possibility to subselect what DICOM data to include
+        """
+        self.dicomBrowserDialog = DicomBrowserDialog(self)
+
+        # While scanning the tree is populated from discovered series, DICOM data hierarchy is available when finished
+        if scanning:
+            self.dicomBrowserDialog.startScanning()
+        else:
+            self.dicomBrowserDialog.setModel(self.svcDicom.dataRoot)
+            self.dicomBrowserDialog.setScanning(False)
+
+        self.dicomBrowserDialog.btnStop.clicked.connect(self.DicomStopReadingClicked)
+        self.dicomBrowserDialog.accepted.connect(self.performDicomAnalysis)
+        self.dicomBrowserDialog.rejected.connect(self.DicomUploadFinishedMessage)
+
+        # Modal, but not blocking, so that the tree can be populated
+        self.dicomBrowserDialog.setModal(True)
+        self.dicomBrowserDialog.show()
 
     def DicomAnalyseFinished(self, dicomStudyType):
         """Initial analysis of provided dicom data finished
@@ -1505,12 +1554,56 @@ class DicomUploadModule(QWidget, DicomUploadModuleUI):
             self.DicomUploadFinishedMessage()
             return False
 
+        # Copies of SOP instances were skipped (report policy lets user decide)
+        duplicates = self.svcDicom.dicomData.duplicateService.reportedDuplicates
+        if duplicates:
+            question = gui.messages.QUE_DUPLICATES + "\n\nSkipped files:"
+            for skipped, kept in duplicates[:10]:
+                question += "\n%s (used: %s)" % (skipped, kept)
+            if len(duplicates) > 10:
+                question += "\n..."
+
+            reply = QtGui.QMessageBox.question(
+                self,
+                "Question",
+                question,
+                QtGui.QMessageBox.Yes,
+                QtGui.QMessageBox.No
+            )
+            if reply != QtGui.QMessageBox.Yes:
+                self.DicomUploadFinishedMessage()
+                return False
+
+        # Files sharing SOP instance UID with different content were skipped
+        conflicts = self.svcDicom.dicomData.duplicateService.conflicts
+        if conflicts:
+            question = gui.messages.QUE_DUPLICATE_CONFLICTS + "\n\nSkipped files:"
+            for skipped, kept in conflicts[:10]:
+                question += "\n%s (used: %s)" % (skipped, kept)
+            if len(conflicts) > 10:
+                question += "\n..."
+
+            reply = QtGui.QMessageBox.question(
+                self,
+                "Question",
+                question,
+                QtGui.QMessageBox.Yes,
+                QtGui.QMessageBox.No
+            )
+            if reply != QtGui.QMessageBox.Yes:
+                self.DicomUploadFinishedMessage()
+                return False
+
         # Careful there is a burned in data
         if self.svcDicom.dicomData.hasBurnedInAnnotations():
+            question = gui.messages.QUE_BURNED_IN_ANNOTATIONS + "\n\nAffected series:"
+            for serie in self.svcDicom.dicomData.burnedInAnnotationSeries():
+                question += "\n%s %s: %s" % (serie.modality, serie.description, serie.burnedInAnnotation)
+
             reply = QtGui.QMessageBox.question(
                 self,
                 "Question",
-                gui.messages.QUE_BURNED_IN_ANNOTATIONS,
+                question,
                 QtGui.QMessageBox.Yes,
                 QtGui.QMessageBox.No
             )
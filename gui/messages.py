@@ -1,7 +1,10 @@
 LOG_DICOM_SCAN = "Scanning DICOM data folder..."
+LOG_DICOM_SCAN_CANCELLED = "Scanning of DICOM data folder was stopped, only already scanned data are available..."
 LOG_DICOM_DATA = "DICOM data dictionary created..."
 
 ERR_MULTIPLE_RTSTRUCT = "More then one structure set (RTSTRUCT) detected in treatment plan. Only one structure set has to be selected. It will be used for purpose of ROIs names harmonisation."
 
+QUE_DUPLICATES = "Some DICOM files are copies of the same SOP instance. Only the first scanned file of each instance will be used. Do you want to continue?"
+QUE_DUPLICATE_CONFLICTS = "Some DICOM files have the same SOP instance UID as other files, but different content. Only the first scanned file of each such instance will be used. Do you want to continue?"
 QUE_BURNED_IN_ANNOTATIONS = "Information burned in pixel data have been detected (theoreticaly this info can contain patient identity). Do you want to continue?"
 QUE_EXIT = "Do you really want to exit the RadPlanBio client?"
@@ -10,6 +10,7 @@
 import sys
 import os
 import platform
+import multiprocessing
 
 # Logging
 import logging
@@ -18,6 +19,8 @@ import logging.config
 # Services
 from services.DiagnosticService import DiagnosticService
 from services.ApplicationEntityService import ApplicationEntityService
+from services.DicomVolumeCacheService import DicomVolumeCacheService
+from services.DicomScanIndexService import DicomScanIndexService
 
 # PyQt
 from PyQt4 import QtGui, QtCore, QtNetwork
@@ -250,6 +253,11 @@ def startup():
                     ui.upgradePopup()
                     
             currentExitCode = app.exec_()
+
+            # Remove decoded DICOM volumes (temporary files)
+            DicomVolumeCacheService().logStatistics()
+            DicomVolumeCacheService().clear()
+
             return currentExitCode
         else:
             ApplicationEntityService().quit()
@@ -351,6 +359,12 @@ def configure():
             ConfigDetails().retainSeriesTime = appConfig.getboolean(section, "retainseriestime")
         if appConfig.hasOption(section, "retainstudyseriesdescriptions"):
             ConfigDetails().retainStudySeriesDescriptions = appConfig.getboolean(section, "retainstudyseriesdescriptions")
+        if appConfig.hasOption(section, "singlepassanonymisation"):
+            ConfigDetails().singlePassAnonymisation = appConfig.getboolean(section, "singlepassanonymisation")
+        if appConfig.hasOption(section, "uidmapdir"):
+            ConfigDetails().anonymisationUidMapDir = appConfig.get(section)["uidmapdir"]
+        if appConfig.hasOption(section, "anonymisationworkers"):
+            ConfigDetails().anonymisationWorkers = int(appConfig.get(section)["anonymisationworkers"])
         if appConfig.hasOption(section, "autortstructmatch"):
             ConfigDetails().autoRTStructMatch = appConfig.getboolean(section, "autortstructmatch")
         if appConfig.hasOption(section, "autortstructref"):
@@ -359,6 +373,49 @@ def configure():
             ConfigDetails().downloadDicomPatientFolderName = appConfig.get(section)["downloaddicompatientfoldername"]
         if appConfig.hasOption(section, "downloaddicomstudyfoldername"):
             ConfigDetails().downloadDicomStudyFolderName = appConfig.get(section)["downloaddicomstudyfoldername"]
+        if appConfig.hasOption(section, "headeronlyscan"):
+            ConfigDetails().dicomHeaderOnlyScan = appConfig.getboolean(section, "headeronlyscan")
+        if appConfig.hasOption(section, "scandefersize"):
+            ConfigDetails().dicomScanDeferSize = int(appConfig.get(section)["scandefersize"])
+        if appConfig.hasOption(section, "scanworkers"):
+            ConfigDetails().dicomScanWorkers = int(appConfig.get(section)["scanworkers"])
+        if appConfig.hasOption(section, "scanindex"):
+            ConfigDetails().dicomScanIndex = appConfig.getboolean(section, "scanindex")
+        if appConfig.hasOption(section, "scanindexfile"):
+            ConfigDetails().dicomScanIndexFileName = appConfig.get(section)["scanindexfile"]
+        if appConfig.hasOption(section, "scanindexmaxage"):
+            ConfigDetails().dicomScanIndexMaxAge = int(appConfig.get(section)["scanindexmaxage"])
+        if appConfig.hasOption(section, "scancontentcheck"):
+            ConfigDetails().dicomScanContentCheck = appConfig.getboolean(section, "scancontentcheck")
+        if appConfig.hasOption(section, "scandicomdir"):
+            ConfigDetails().dicomScanUseDicomDir = appConfig.getboolean(section, "scandicomdir")
+        if appConfig.hasOption(section, "scanskipnames"):
+            ConfigDetails().dicomScanSkipNames = [x.strip() for x in appConfig.get(section)["scanskipnames"].split(",") if x.strip() != ""]
+        if appConfig.hasOption(section, "scanskipextensions"):
+            ConfigDetails().dicomScanSkipExtensions = [x.strip().lower() for x in appConfig.get(section)["scanskipextensions"].split(",") if x.strip() != ""]
+        if appConfig.hasOption(section, "duplicatepolicy"):
+            ConfigDetails().dicomDuplicatePolicy = appConfig.get(section)["duplicatepolicy"]
+        if appConfig.hasOption(section, "duplicatecontentcheck"):
+            ConfigDetails().dicomDuplicateContentCheck = appConfig.getboolean(section, "duplicatecontentcheck")
+        if appConfig.hasOption(section, "volumeworkers"):
+            ConfigDetails().dicomVolumeWorkers = int(appConfig.get(section)["volumeworkers"])
+        if appConfig.hasOption(section, "volumedir"):
+            ConfigDetails().dicomVolumeDir = appConfig.get(section)["volumedir"]
+        if appConfig.hasOption(section, "volumecachesize"):
+            ConfigDetails().dicomVolumeCacheSize = int(appConfig.get(section)["volumecachesize"])
+        if appConfig.hasOption(section, "volumecachespill"):
+            ConfigDetails().dicomVolumeCacheSpill = appConfig.getboolean(section, "volumecachespill")
+        if appConfig.hasOption(section, "volumecachespillsize"):
+            ConfigDetails().dicomVolumeCacheSpillSize = int(appConfig.get(section)["volumecachespillsize"])
+        if appConfig.hasOption(section, "dosestatistics"):
+            ConfigDetails().dicomDoseStatistics = appConfig.getboolean(section, "dosestatistics")
+
+    # Relative scan index file is kept next to the config file (not in the working directory)
+    configDir = os.path.dirname(os.path.abspath(ConfigDetails().configFileName))
+    ConfigDetails().dicomScanIndexFileName = os.path.join(configDir, os.path.expanduser(ConfigDetails().dicomScanIndexFileName))
+    # Records of disabled scan index are not kept
+    if not ConfigDetails().dicomScanIndex:
+        DicomScanIndexService(ConfigDetails().dicomScanIndexFileName, None).purge()
 
     section = "AE"
     if appConfig.hasSection(section):
@@ -441,4 +498,6 @@ def configure():
     # app.installTranslator(translator)
 
 if __name__ == '__main__':
+    # DICOM scanning runs in worker processes (required for frozen executables)
+    multiprocessing.freeze_support()
     main()
@@ -8,22 +8,31 @@
 
 # Standard
 import os
+import struct
+import traceback
 from string import whitespace
 
+# Logging
+import logging
+import logging.config
+
 # Crypto
 import uuid
 import hashlib
+import hmac
 import random
+from Crypto import Random
 
 # PyQt
 from PyQt4 import QtCore
 
 # DICOM
 import dicom
+import dicom.filebase
+import dicom.filereader
+import dicom.filewriter
 
-# List
-from blist import blist
-
+from dicom.charset import default_encoding
 from dicom.dataset import Dataset
 from dicom.multival import MultiValue
 from dicom.sequence import Sequence
@@ -40,6 +49,61 @@ from contexts.ConfigDetails import ConfigDetails
 # Generic library for DICOM de-identification
 from dicomdeident.DeidentConfig import DeidentConfig
 from dicomdeident.DeidentModelLoader import DeidentModelLoader
+from dicomdeident.DeidentRules import DeidentRules, RULE_OPTION, RULE_REMOVE
+
+# Worker processes
+from utils.WorkerPool import imapTasks, processCount
+
+# Below this number of files it is cheaper to anonymise serially than to start worker processes
+PARALLEL_ANONYMISE_MIN_FILES = 20
+
+# Size of blocks in which pixel data are copied from source to anonymised file
+PIXEL_COPY_BLOCK_SIZE = 1024 * 1024
+
+# Pixel data element (elements with greater tags follow pixel data in file)
+PIXEL_DATA_TAG = 0x7FE00010
+
+# Explicit VRs encoded with 2 reserved bytes and 4 byte length
+PIXEL_LONG_VRS = ("OB", "OW", "OF", "SQ", "UN", "UT")
+
+# Anonymisation service of worker process (set once by pool initializer)
+_WORKER_SERVICE = None
+
+######## ##     ## ##    ##  ######  ######## ####  #######  ##    ##  ######
+##       ##     ## ###   ## ##    ##    ##     ##  ##     ## ###   ## ##    ##
+##       ##     ## ####  ## ##          ##     ##  ##     ## ####  ## ##
+######   ##     ## ## ## ## ##          ##     ##  ##     ## ## ## ##  ######
+##       ##     ## ##  #### ##          ##     ##  ##     ## ##  ####       ##
+##       ##     ## ##   ### ##    ##    ##     ##  ##     ## ##   ### ##    ##
+##        #######  ##    ##  ######     ##    ####  #######  ##    ##  ######
+
+
+def anonymiseFile(filename):
+    """Anonymise one DICOM file with anonymisation service of worker process
+
+    return: dictionary with source filename, error message (None when successful)
+    and UIDs translated in single pass mode (to be merged into the UID map of parent process)
+    """
+    # Only UIDs translated for this file are reported back (the rest is known in parent process)
+    if _WORKER_SERVICE._singlePass:
+      _WORKER_SERVICE._uidMap = {}
+
+    result = _WORKER_SERVICE._anonymiseFileSafely(filename)
+
+    if _WORKER_SERVICE._singlePass:
+      result["uids"] = _WORKER_SERVICE._uidMap
+
+    return result
+
+
+def _initAnonymisationWorker(service):
+    """Pool initializer: keep prepared anonymisation service in worker process
+    """
+    global _WORKER_SERVICE
+    _WORKER_SERVICE = service
+
+    # Encryption of identity data needs the random generator re-initialised after fork
+    Random.atfork()
 
  ######  ######## ########  ##     ## ####  ######  ########
 ##    ## ##       ##     ## ##     ##  ##  ##    ## ##
@@ -62,6 +126,10 @@ class AnonymisationService(object):
     def __init__(self, destination, patient, dicomDataRoot, mappingRoiDic):
         """Default constructor
         """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
         self._svcCrypto = CryptoService()
 
         # Configuration of deidentification
@@ -80,12 +148,24 @@ class AnonymisationService(object):
         self._lastGeneratedUid = None
         
         self._errorMessage = ""
+        self._errors = []
         self._sourceSize = 0
+
+        # Number of worker processes (0 = number of CPU cores, 1 = serial anonymisation)
+        self._workers = ConfigDetails().anonymisationWorkers
+
+        # Resolved before anonymisation (worker processes do not get the DICOM data tree)
+        self._originalStructUid = None
+        self._studyDescription = None
+        self._seriesDescriptions = {}
            
-        # List of original DICOM UID for elements with name in li_NameUID
-        self.li_UID = blist([])
-        # List of anonymised DICOM UID for element with name in li_NameUID
-        self.li_UID_anonym = blist([])
+        # Map of original DICOM UID (elements with name in li_NameUID) to anonymised UID
+        self._uidMap = {}
+
+        # Single pass mode: replacement UIDs are derived on demand from keyed hash of original UIDs,
+        # the key is random and exists only for this anonymisation (replacements cannot be reproduced later)
+        self._singlePass = ConfigDetails().singlePassAnonymisation
+        self._uidKey = os.urandom(32)
 
         self.__patient = patient
         
@@ -390,6 +470,9 @@ class AnonymisationService(object):
         if ConfigDetails().retainSeriesTime:
           self.li_NameReplace.remove("Series Time")
 
+        # Profile lists and options compiled into one rule per tag
+        self._rules = DeidentRules(self.li_NameRemove, self.li_NameReplace, self._options)
+
 ########  ########   #######  ########  ######## ########  ######## #### ########  ######
 ##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
 ##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
@@ -430,12 +513,30 @@ class AnonymisationService(object):
         """
         self._patientID = value
 
+    @property
+    def uidMap(self):
+        """Map of original UIDs to anonymised UIDs (plain dictionary, can be pickled)
+        """
+        return self._uidMap
+
     @property
     def errorMessage(self):
         """Error message Getter
         """
         return self._errorMessage
 
+    @property
+    def errors(self):
+        """Files which could not be anonymised as (filename, error message) pairs
+        """
+        return self._errors
+
+    @property
+    def workerCount(self):
+        """Number of worker processes used for anonymisation
+        """
+        return processCount(self._workers)
+
 ##     ## ######## ######## ##     ##  #######  ########   ######
 ###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
 #### #### ##          ##    ##     ## ##     ## ##     ## ##
@@ -457,65 +558,51 @@ class AnonymisationService(object):
         self._sourceSize = len(filenames)
 
         # Get original SOP instance UID of selected RTSTRUCT for referencing in RTPLANs
-        originalStructUid = self._getOriginalStructSopUid()
+        self._originalStructUid = self._getOriginalStructSopUid()
+
+        # New study and series descriptions
+        self._studyDescription = self._getNewStudyDescription()
+        self._seriesDescriptions = {}
+        for serie in self.__series:
+          self._seriesDescriptions[serie.suid] = str(serie.newDescription)
 
         # As a study UID I will use randomly geneterated UID
         self.StudyInstanceUID = str(self._generateDicomUid())
         self.PatientsName = self._deidentConfig.ReplacePatientNameWith
 
-        # Prepare all UIDs with randomly generated replacements 
-        self._prepareUIDs(filenames, thread)
+        # Prepare all UIDs with randomly generated replacements (single pass mode derives them on demand)
+        if not self._singlePass:
+          self._prepareUIDs(filenames, thread)
 
         anonymised = 0
-        
+        self._errors = []
+
         # Now anonymise/pseudonymise whole selected original DICOM hierarchy
-        for filename in filenames:
-          dcmFile = dicom.read_file(filename, force=True)
-                  
-          # Keep list of IDAT (PatientID, PatientsName)
-          idat = []         
-          if self._isValidValue(dcmFile.PatientID):
-            idat.append(dcmFile.PatientID)
-          if self._isValidValue(dcmFile.PatientsName):
-            idat.append(dcmFile.PatientsName)
-
-          # De-identify
-          # print "Replacing study and series descriptions"
-          self._rewriteDicomDescriptions(dcmFile)
-          # print "Encrypting and storing DICOM identity data"
-          self._storeIdentity(dcmFile)
-          # print "Anonymisisation of dcmFile"
-          self._anonymizeDicomUID(dcmFile)
-          # print "Remove private tags"
-          self._removePrivateTags(dcmFile)
-          # print "Anonymisation of metadata"
-          self._anonymizeDicomUID(dcmFile.file_meta)
-          # print "Anonymisation of data"
-          self._anonymizeDicomData(dcmFile, idat)
-          # print "Map ROI contours"
-          self._formalizeDicomROIs(dcmFile)
-          # print "Correct RTPlans to point to exactly one RTSTRUCT"
-          self._fixPlanToStructReference(dcmFile, originalStructUid)
-
-          # Assign pseudonymised PatientID, PatientsName and StudyInstanceUID
-          dcmFile.PatientID = self.PatientID
-          dcmFile.PatientsName = self.PatientsName
-          dcmFile.StudyInstanceUID = self.StudyInstanceUID
-
-          # Save newly anonymised file (filename: modality_randomUID.dcm)
-          dicomExtension = ".dcm"
-          separator = "_"
-          if self._isValidValue(dcmFile.Modality):
-            anonymisedFileName = dcmFile.Modality + separator + str(self._generateDicomUid()) + dicomExtension
-          else:
-            anonymisedFileName = str(self._generateDicomUid()) + dicomExtension            
-          dcmFile.save_as(self._destination + os.sep + anonymisedFileName)
+        for result in self._anonymiseFiles(filenames):
+          # UIDs translated in worker processes
+          self._uidMap.update(result["uids"])
+
+          if result["error"] is not None:
+            self._logger.error(result["error"])
+            self._errors.append((result["filename"], result["error"]))
 
           # Progress
           if thread:
               anonymised += 1
               thread.emit(QtCore.SIGNAL("taskUpdated"), [anonymised, self._sourceSize])
 
+        if self._errors:
+          self._errorMessage = str(len(self._errors)) + " of " + str(self._sourceSize) + " DICOM files could not be anonymised: "
+          self._errorMessage += ", ".join(os.path.basename(f) for f, e in self._errors[:10])
+          if len(self._errors) > 10:
+            self._errorMessage += ", ..."
+
+    def saveUidMap(self, filename):
+        """Persist UID map (pickled and encrypted, because it links anonymised data to original)
+        """
+        with open(filename, "wb") as f:
+          f.write(self._svcCrypto.encrypt(pickle.dumps(self._uidMap, pickle.HIGHEST_PROTOCOL)))
+
 ########  ########  #### ##     ##    ###    ######## ########
 ##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
 ##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
@@ -524,6 +611,206 @@ class AnonymisationService(object):
 ##        ##    ##   ##    ## ##   ##     ##    ##    ##
 ##        ##     ## ####    ###    ##     ##    ##    ########
 
+    def __getstate__(self):
+      """State sent to worker processes (without DICOM data tree and logger)
+      """
+      state = self.__dict__.copy()
+      for key in ["_logger", "_dicomDataRoot", "_AnonymisationService__series", "_AnonymisationService__study", "_AnonymisationService__patient"]:
+        state.pop(key, None)
+
+      return state
+
+    def __setstate__(self, state):
+      """Restore state in worker process
+      """
+      self.__dict__.update(state)
+      self._logger = logging.getLogger(__name__)
+
+    def _anonymiseFiles(self, filenames):
+      """Anonymise files (in worker processes when there are enough of them)
+
+      return: generator of per file results in the order of files
+      """
+      # Prepared service (UID map or key, descriptions, rules) is passed to each worker only once
+      # Files anonymised before a failure would be written twice, so only failure to start is recovered
+      return imapTasks(
+        anonymiseFile, filenames, self._workers, PARALLEL_ANONYMISE_MIN_FILES, self._logger, "anonymisation", 8,
+        _initAnonymisationWorker, (self,), self._anonymiseFileSafely, False
+      )
+
+    def _anonymiseFileSafely(self, filename):
+      """Anonymise one file, errors are reported in result instead of raised
+      """
+      result = {
+        "filename": filename,
+        "error": None,
+        "uids": {}
+      }
+
+      try:
+        self._anonymiseFile(filename)
+      except Exception:
+        result["error"] = "Cannot anonymise DICOM file: " + filename + "\n" + traceback.format_exc()
+
+      return result
+
+    def _anonymiseFile(self, filename):
+      """Anonymise one DICOM file and save it into destination folder
+      """
+      # Pixel data are not decoded, they are copied from source file after the de-identified header
+      dcmFile, pixelRange = self._readDicomHeader(filename)
+
+      # Keep list of IDAT (PatientID, PatientsName)
+      idat = []
+      if self._isValidValue(dcmFile.PatientID):
+        idat.append(dcmFile.PatientID)
+      if self._isValidValue(dcmFile.PatientsName):
+        idat.append(dcmFile.PatientsName)
+
+      # De-identify
+      # print "Replacing study and series descriptions"
+      self._rewriteDicomDescriptions(dcmFile)
+      # print "Encrypting and storing DICOM identity data"
+      self._storeIdentity(dcmFile)
+      # print "Anonymisisation of dcmFile"
+      self._anonymizeDicomUID(dcmFile)
+      # print "Remove private tags"
+      self._removePrivateTags(dcmFile)
+      # print "Anonymisation of metadata"
+      self._anonymizeDicomUID(dcmFile.file_meta)
+      # print "Anonymisation of data"
+      self._anonymizeDicomData(dcmFile, idat)
+      # print "Map ROI contours"
+      self._formalizeDicomROIs(dcmFile)
+      # print "Correct RTPlans to point to exactly one RTSTRUCT"
+      self._fixPlanToStructReference(dcmFile, self._originalStructUid)
+
+      # Assign pseudonymised PatientID, PatientsName and StudyInstanceUID
+      dcmFile.PatientID = self.PatientID
+      dcmFile.PatientsName = self.PatientsName
+      dcmFile.StudyInstanceUID = self.StudyInstanceUID
+
+      # Save newly anonymised file (filename: modality_randomUID.dcm)
+      dicomExtension = ".dcm"
+      separator = "_"
+      if self._isValidValue(dcmFile.Modality):
+        anonymisedFileName = dcmFile.Modality + separator + str(self._generateDicomUid()) + dicomExtension
+      else:
+        anonymisedFileName = str(self._generateDicomUid()) + dicomExtension
+      anonymisedFileName = self._destination + os.sep + anonymisedFileName
+
+      if pixelRange is None:
+        dcmFile.save_as(anonymisedFileName)
+      else:
+        # De-identified elements following pixel data (e.g. kept private elements) are written after copied pixel data
+        trailing = self._splitTrailingElements(dcmFile)
+        dcmFile.save_as(anonymisedFileName)
+        self._copyPixelData(filename, pixelRange, anonymisedFileName)
+        if trailing:
+          self._appendTrailingElements(dcmFile, trailing, anonymisedFileName)
+
+    def _readDicomHeader(self, filename):
+      """Read DICOM file without pixel data (elements following pixel data are included)
+
+      return: dataset and (offset, length) of pixel data element in source file (None = no pixel data to copy)
+      """
+      with open(filename, "rb") as f:
+        dcmFile = dicom.read_file(f, force=True, stop_before_pixels=True)
+
+        # Deflated data set is read from decompressed buffer, so file offsets do not apply
+        if dcmFile.file_meta.get("TransferSyntaxUID") == dicom.UID.DeflatedExplicitVRLittleEndian:
+          return dicom.read_file(filename, force=True), None
+
+        # Reading stopped at the beginning of pixel data element (or at the end of file)
+        offset = f.tell()
+        length = self._pixelDataLength(f, dcmFile.is_implicit_VR, dcmFile.is_little_endian)
+        if length is None:
+          return dcmFile, None
+
+        # Data set can continue after pixel data (trailing padding, private elements)
+        f.seek(offset + length)
+        trailing = dicom.filereader.read_dataset(f, dcmFile.is_implicit_VR, dcmFile.is_little_endian)
+        dcmFile.update(trailing)
+
+        return dcmFile, (offset, length)
+
+    def _pixelDataLength(self, f, implicitVR, littleEndian):
+      """Length of pixel data element (including its header) starting at current file position
+      """
+      endian = "<" if littleEndian else ">"
+
+      header = f.read(8)
+      if len(header) < 8:
+        return None
+      group, element = struct.unpack(endian + "HH", header[:4])
+      if (group, element) != (0x7FE0, 0x0010):
+        return None
+
+      if implicitVR:
+        headerLength = 8
+        length = struct.unpack(endian + "L", header[4:])[0]
+      elif header[4:6] in PIXEL_LONG_VRS:
+        headerLength = 12
+        length = struct.unpack(endian + "L", f.read(4))[0]
+      else:
+        headerLength = 8
+        length = struct.unpack(endian + "H", header[6:])[0]
+
+      if length != 0xFFFFFFFF:
+        return headerLength + length
+
+      # Encapsulated pixel data: items up to sequence delimitation item
+      length = headerLength
+      while True:
+        item = f.read(8)
+        if len(item) < 8:
+          raise EOFError("Sequence delimitation item of encapsulated pixel data is missing")
+        group, element, itemLength = struct.unpack(endian + "HHL", item)
+        length += 8
+        if (group, element) == (0xFFFE, 0xE0DD):
+          return length
+        f.seek(itemLength, os.SEEK_CUR)
+        length += itemLength
+
+    def _splitTrailingElements(self, dataset):
+      """Remove elements following pixel data from dataset
+
+      return: dataset of removed elements
+      """
+      trailing = Dataset()
+      for tag in [tag for tag in dataset.keys() if tag > PIXEL_DATA_TAG]:
+        trailing[tag] = dataset[tag]
+        del dataset[tag]
+
+      return trailing
+
+    def _appendTrailingElements(self, dataset, trailing, anonymisedFileName):
+      """Append elements following pixel data to anonymised file
+      """
+      # Not opened in append mode, because lengths of written sequences are patched with seek
+      fp = dicom.filebase.DicomFile(anonymisedFileName, "r+b")
+      try:
+        fp.seek(0, os.SEEK_END)
+        fp.is_implicit_VR = dataset.is_implicit_VR
+        fp.is_little_endian = dataset.is_little_endian
+        dicom.filewriter.write_dataset(fp, trailing, dataset.get("SpecificCharacterSet", default_encoding))
+      finally:
+        fp.close()
+
+    def _copyPixelData(self, filename, pixelRange, anonymisedFileName):
+      """Append pixel data element of source file to anonymised file
+      """
+      offset, length = pixelRange
+      with open(filename, "rb") as source:
+        with open(anonymisedFileName, "ab") as destination:
+          source.seek(offset)
+          while length > 0:
+            block = source.read(min(PIXEL_COPY_BLOCK_SIZE, length))
+            if not block:
+              raise EOFError("Pixel data of DICOM file are truncated: " + filename)
+            destination.write(block)
+            length -= len(block)
+
     def _getFileNames(self):
       """Get filenames of set to anonymise
       """
@@ -548,66 +835,63 @@ class AnonymisationService(object):
     def _prepareUIDs(self, filenames, thread=None):
         """Collect original UIDs and prepare the randomly generated ones
         """
+        originalUids = set()
         processed = 0
         for filename in filenames:
-          dcmFile = dicom.read_file(filename, force=True)
+          dcmFile = dicom.read_file(filename, force=True, stop_before_pixels=True)
            
-          # Collect all original UIDs li_UID  from main dataset as well as meta
-          self._getDicomUID(dcmFile)
-          self._getDicomUID(dcmFile.file_meta)
+          # Collect all original UIDs from main dataset as well as meta
+          self._getDicomUID(dcmFile, originalUids)
+          self._getDicomUID(dcmFile.file_meta, originalUids)
  
           # Progress
           if thread:
               processed += 1
               thread.emit(QtCore.SIGNAL("taskUpdated"), [processed, self._sourceSize])
  
-        # Remove dupplicates from li_UID lists
-        self.li_UID = blist(set(self.li_UID))
-        self.li_UID.sort()
- 
-        # Create li_UID_anonym list filled with randomly generated UID
-        # The list will have the same size as li_UID (mirroring each other)
-        for i in range(len(self.li_UID)):
-            self.li_UID_anonym.append(str(self._generateDicomUid()))
+        # Each original UID gets randomly generated replacement
+        for uid in sorted(originalUids):
+            self._uidMap[uid] = str(self._generateDicomUid())
 
-    def _getDicomUID(self, dataset):
-      """Collect list of all DICOM UIDs for elements with names in li_NameUID
+    def _getDicomUID(self, dataset, uids):
+      """Collect set of all DICOM UIDs for elements with names in li_NameUID
       param dataset: DICOM file or SQ (Sequence of items)
+      param uids: set of collected UIDs
       """
       for element in dataset:
           # When the element is sequence run it recursively
           if element.VR == "SQ":
               for sequence in element.value:
-                  self._getDicomUID(sequence)
+                  self._getDicomUID(sequence, uids)
           # When the element is unique identifier
           elif element.VR == "UI":
               if element.name in self.li_NameUID:
                   if self._isValidValue(element.value):
-                      self.li_UID.append(element.value)
+                      uids.add(self._plainUid(element.value))
+
+    def _getNewStudyDescription(self):
+        """New study description (None = study description is removed)
+        """
+        if type(self.__study.newDescription) is not str and str(self.__study.newDescription.toUtf8()).decode("utf-8") != "":
+          return str(self.__study.newDescription.toUtf8())
+
+        return None
 
     def _rewriteDicomDescriptions(self, dataset):
         """Apply new study and series descriptions
         """
-        if type(self.__study.newDescription) is not str and str(self.__study.newDescription.toUtf8()).decode("utf-8") != "":
+        if self._studyDescription is not None:
           if "StudyDescription" in dataset:
-            dataset.StudyDescription = str(self.__study.newDescription.toUtf8())
+            dataset.StudyDescription = self._studyDescription
         else:
           if "StudyDescription" in dataset:
             del dataset.StudyDescription
 
-        # Try to replace according to series instance UID 
-        if "SeriesInstanceUID" in dataset:
-          found = False
-          for serie in self.__series:
-            if serie.suid == dataset.SeriesInstanceUID:
-              if "SeriesDescription" in dataset:
-                dataset.SeriesDescription = str(serie.newDescription)
-                found = True
-                break
-
-        # If no new series description than delete
-        if found == False:
-          if "SeriesDescription" in dataset:
+        # Try to replace according to series instance UID, if no new series description than delete
+        if "SeriesDescription" in dataset:
+          if "SeriesInstanceUID" in dataset and dataset.SeriesInstanceUID in self._seriesDescriptions:
+            dataset.SeriesDescription = self._seriesDescriptions[dataset.SeriesInstanceUID]
+          else:
             del dataset.SeriesDescription
 
     def _anonymizeDicomUID(self, dataset):
@@ -623,22 +907,31 @@ class AnonymisationService(object):
             elif element.VR == "UI":
                 if element.name in self.li_NameUID:
                     if self._isValidValue(element.value):
-                        element.value = self.li_UID_anonym[self.li_UID.index(element.value)]  
+                        element.value = self._anonymisedUid(element.value)
 
     def _anonymizeDicomData(self, dataset, idat):
         """Apply anonymisation rules for DICOM data
         """
         for element in dataset:
-          # First check whether an option is defined which overrides the basic profile
-          if self._optionApplied(element, idat):
+          rule = self._rules.Get(element.tag)
+
+          # For inner sequences without rule run the anonymise recursive
+          if rule is None:
+            if element.VR == "SQ":
+              for sequence in element.value:
+                self._anonymizeDicomData(sequence, idat)
             continue
 
-          # Otherwise continue with basic profile
+          action, attribute = rule
+
+          # Option overrides the basic profile
+          if action == RULE_OPTION:
+              attribute.Action.PerformDeident(element, self._deidentConfig, idat)
           # Remove element
-          if element.name in self.li_NameRemove:
+          elif action == RULE_REMOVE:
               del dataset[element.tag]
           # Replace element with default value
-          elif element.name in self.li_NameReplace:
+          else:
               # When element is date yyyymmdd
               if element.VR == "DA":
                   element.value = self._deidentConfig.ReplaceDateWith
@@ -654,23 +947,6 @@ class AnonymisationService(object):
               # The rest replace with empty string
               else:
                   element.value = self._deidentConfig.ReplaceDefaultWith
-          # For inner sequences run the anonymise recursive
-          # this should be always the last condition branche
-          elif element.VR == "SQ":
-              for sequence in element.value:
-                  self._anonymizeDicomData(sequence, idat)
-
-    def _optionApplied(self, dataset, idat):
-      """Try to apply defined deidentificate options
-      """
-      wasApplied = False    
-      for option in self._options:
-        if not wasApplied:
-          wasApplied = option.Deidentificate(dataset, self._deidentConfig, idat)
-        else:
-          break
-
-      return wasApplied
 
     def _removePrivateTags(self, dataset):
       """Remove private tags from DICOM dataset if there is not special exception defined
@@ -724,8 +1000,8 @@ class AnonymisationService(object):
             if "ReferencedStructureSetSequence" in dataset:
                 for seqItem in dataset.ReferencedStructureSetSequence:
                     if "ReferencedSOPInstanceUID" in seqItem:
-                        if seqItem.ReferencedSOPInstanceUID != self.li_UID_anonym[self.li_UID.index(originalStructUid)]:
-                            seqItem.ReferencedSOPInstanceUID = self.li_UID_anonym[self.li_UID.index(originalStructUid)]
+                        if seqItem.ReferencedSOPInstanceUID != self._anonymisedUid(originalStructUid):
+                            seqItem.ReferencedSOPInstanceUID = self._anonymisedUid(originalStructUid)
 
     def _storeIdentity(self, dcmFile):
         """
@@ -815,6 +1091,38 @@ class AnonymisationService(object):
 
         # A string describing the method used may also be inserted in or added to De-identification Method (0012,0063), but is not required
 
+    def _anonymisedUid(self, uid):
+      """Replacement of original UID (the same original UID is always replaced with the same UID)
+      """
+      uid = self._plainUid(uid)
+
+      replacement = self._uidMap.get(uid)
+      if replacement is None:
+        if not self._singlePass:
+          raise KeyError("UID was not collected before anonymisation: " + uid)
+
+        # Derived once, so that the map holds all translated UIDs
+        replacement = self._keyedUid(uid)
+        self._uidMap[uid] = replacement
+
+      return replacement
+
+    def _plainUid(self, uid):
+      """UID value as plain string (str() of pydicom UID gives the name of well known UIDs)
+      """
+      return str.__str__(uid) if isinstance(uid, str) else str(uid)
+
+    def _keyedUid(self, uid, prefix="2.25."):
+      """Derive replacement UID from keyed hash (HMAC-SHA256) of original UID
+      """
+      hash_val = hmac.new(self._uidKey, uid, hashlib.sha256)
+
+      # Convert this to an int with the maximum available digits
+      avail_digits = 64 - len(prefix)
+      int_val = int(hash_val.hexdigest(), 16) % (10 ** avail_digits)
+
+      return prefix + str(int_val)
+
     def _isValidValue(self, value):
       """Proof whether the value is valid for further use
       """
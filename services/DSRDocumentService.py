@@ -0,0 +1,218 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import os
+import threading
+import traceback
+
+# Logging
+import logging
+import logging.config
+
+# DICOM
+from dicom.filereader import read_partial
+
+# Singleton
+from utils.SingletonType import SingletonType
+
+# DICOM domain
+from dcm.DSRDocument import DSRDocument
+
+# Context
+from contexts.ConfigDetails import ConfigDetails
+
+# Worker processes
+from utils.WorkerPool import imapTasks, processCount
+
+# Below this number of SR files it is cheaper to render serially than to use worker processes
+PARALLEL_RENDER_MIN_FILES = 50
+
+# Name of the worker pool kept for rendering (started on first use)
+RENDER_POOL = "DSRDocumentService"
+
+# Values larger than this are not read unless the document needs them
+DEFER_SIZE = 64 * 1024
+
+# Content Sequence (elements following it are not part of the document content)
+CONTENT_SEQUENCE_TAG = 0x0040A730
+
+######## ##     ## ##    ##  ######  ######## ####  #######  ##    ##  ######
+##       ##     ## ###   ## ##    ##    ##     ##  ##     ## ###   ## ##    ##
+##       ##     ## ####  ## ##          ##     ##  ##     ## ####  ## ##
+######   ##     ## ## ## ## ##          ##     ##  ##     ## ## ## ##  ######
+##       ##     ## ##  #### ##          ##     ##  ##     ## ##  ####       ##
+##       ##     ## ##   ### ##    ##    ##     ##  ##     ## ##   ### ##    ##
+##        #######  ##    ##  ######     ##    ####  #######  ##    ##  ######
+
+
+def readDocumentFile(path):
+    """Read DICOM SR file up to its content sequence (large values are read on demand)
+    """
+    with open(path, "rb") as f:
+        return read_partial(f, _afterContentSequence, DEFER_SIZE, True)
+
+
+def renderDocumentFile(path):
+    """Render report text of one DICOM SR file
+
+    return: dictionary with path, text and error message (None when rendering succeeded)
+    """
+    try:
+        return _renderResult(path, DSRDocument(readDocumentFile(path)).renderText())
+    except Exception:
+        return _renderError(path)
+
+
+def _afterContentSequence(tag, VR, length):
+    """Stop reading of SR file after content sequence (pixel data, private elements and padding are skipped)
+    """
+    return tag > CONTENT_SEQUENCE_TAG
+
+
+def _renderResult(path, text):
+    """Successful rendering result
+    """
+    return { "path": path, "text": text, "error": None }
+
+
+def _renderError(path):
+    """Rendering result of file which cannot be rendered
+    """
+    return { "path": path, "text": "", "error": "Cannot render DICOM SR document: " + path + "\n" + traceback.format_exc() }
+
+ ######  ######## ########  ##     ## ####  ######  ########
+##    ## ##       ##     ## ##     ##  ##  ##    ## ##
+##       ##       ##     ## ##     ##  ##  ##       ##
+ ######  ######   ########  ##     ##  ##  ##       ######
+      ## ##       ##   ##    ##   ##   ##  ##       ##
+##    ## ##       ##    ##    ## ##    ##  ##    ## ##
+ ######  ######## ##     ##    ###    ####  ######  ########
+
+
+class DSRDocumentService(object):
+    """DICOM SR document provider
+    Documents and their rendered texts are parsed lazily and cached per file
+    (a changed file is parsed again). Rendering of many files takes time, so
+    GUI requests texts from a worker thread. Texts of many files are rendered
+    by a pool of worker processes which is started once and reused.
+    """
+
+    __metaclass__ = SingletonType
+
+    def __init__(self):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+        # Documents can be requested from several worker threads
+        self._lock = threading.RLock()
+
+        # Caches (key = (path, modification time, size))
+        self._documents = {}
+        self._texts = {}
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def workerCount(self):
+        """Number of worker processes used for rendering (the same as for DICOM scanning)
+        """
+        return processCount(ConfigDetails().dicomScanWorkers)
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def document(self, path):
+        """Parsed SR document of file
+        """
+        key = self._fileKey(path)
+
+        with self._lock:
+            if key in self._documents:
+                return self._documents[key]
+
+        document = DSRDocument(readDocumentFile(path))
+
+        with self._lock:
+            self._documents[key] = document
+
+        return document
+
+    def documents(self, files):
+        """Parsed SR documents of files (in the same order)
+        """
+        return [self.document(f) for f in files]
+
+    def texts(self, files):
+        """Rendered report texts of SR files (in the same order)
+        """
+        keys = [self._fileKey(f) for f in files]
+
+        with self._lock:
+            missing = [f for f, key in zip(files, keys) if key not in self._texts]
+
+        results = imapTasks(
+            renderDocumentFile, missing, ConfigDetails().dicomScanWorkers, PARALLEL_RENDER_MIN_FILES,
+            self._logger, "DICOM SR rendering", serialFunction=self._renderCachedDocument, shared=RENDER_POOL
+        )
+        for result in results:
+            if result["error"] is not None:
+                self._logger.error(result["error"])
+                continue
+
+            with self._lock:
+                self._texts[self._fileKey(result["path"])] = result["text"]
+
+        with self._lock:
+            return [self._texts.get(key, "") for key in keys]
+
+    def clear(self):
+        """Remove all cached documents and texts
+        """
+        with self._lock:
+            self._documents = {}
+            self._texts = {}
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _fileKey(self, path):
+        """Cache key of file (changes when the file is modified)
+        """
+        try:
+            stat = os.stat(path)
+            return (path, stat.st_mtime, stat.st_size)
+        except OSError:
+            return (path, None, None)
+
+    def _renderCachedDocument(self, path):
+        """Render report text of SR file in serial mode (documents are parsed anyway, so they are cached as well)
+        """
+        try:
+            return _renderResult(path, self.document(path).renderText())
+        except Exception:
+            return _renderError(path)
@@ -16,9 +16,6 @@ import logging.config
 # PyQt - for running in a separate thread
 from PyQt4 import QtCore
 
-# DICOM
-import dicom
-
 # Domain
 from domain.Node import Node
 
@@ -26,6 +23,17 @@ from domain.Node import Node
 from dcm.DicomPatient import DicomPatient
 from dcm.DicomStudy import DicomStudy
 from dcm.DicomSeries import DicomSeries
+from dcm.DicomDescriptor import DicomDescriptor
+from dcm.DicomDescriptorStore import DicomDescriptorStore
+from dcm.DicomReferenceGraph import DicomReferenceGraph
+from dcm.DicomGeometryValidator import DicomGeometryValidator
+from dcm.DicomAnnotationDetector import DicomAnnotationDetector
+
+# Services
+from services.DicomScanService import DicomScanService, extractDescriptorTags
+from services.DicomScanIndexService import DicomScanIndexService
+from services.DicomMediaDirectoryService import DicomMediaDirectoryService
+from services.DicomDuplicateService import DicomDuplicateService, DUPLICATE_SKIP, DUPLICATE_REPLACE
 
 # DICOM De-identification
 from dicomdeident.DeidentConfig import DeidentConfig
@@ -33,6 +41,9 @@ from dicomdeident.DeidentConfig import DeidentConfig
 # Context
 from contexts.ConfigDetails import ConfigDetails
 
+# Number of scanned files after which the numbers of files of discovered series are sent to GUI
+SCAN_TREE_UPDATE_FILES = 100
+
  ######  ######## ########  ##     ## ####  ######  ########
 ##    ## ##       ##     ## ##     ##  ##  ##    ## ##
 ##       ##       ##     ## ##     ##  ##  ##       ##
@@ -62,8 +73,24 @@ class DicomDirectoryService:
         # List of DICOM files in a source directory
         self._files = []
 
-        # The list of descriptors describing DICOM files (used for search)
-        self.dicomDescriptors = []
+        # The store of descriptors describing DICOM files (used for search)
+        self.dicomDescriptors = DicomDescriptorStore()
+        # References between SOP instances of described DICOM files
+        self.referenceGraph = DicomReferenceGraph()
+        # Slice geometry checks of image series
+        self._geometryValidator = DicomGeometryValidator()
+        # Burned in annotation detection of series
+        self._annotationDetector = DicomAnnotationDetector()
+        # SOP instances found in more files enter the tree only once
+        self._duplicateService = DicomDuplicateService()
+        # Descriptors collected during setup (reused in reload)
+        self._scanDescriptors = self.dicomDescriptors
+        # RTSTRUCT ROIs collected during setup (key = SeriesInstanceUID)
+        self._seriesRois = {}
+        # Series with descriptors built from DICOMDIR records only (files were not scanned yet)
+        self._incompleteSeries = set()
+        # Replacement values for missing patient identity tags used in scanning
+        self._scanDefaults = {}
 
         # Data root holds hierarchy structure of underlying DICOM data
         self._rootNode = None
@@ -81,16 +108,15 @@ class DicomDirectoryService:
 
         self._patient = None
 
-        self._burnedInAnnotations = False
+        # Series with burned in annotations (key = SeriesInstanceUID, value = reason)
+        self._burnedInSeries = {}
+
+        # Scanning was cancelled by user
+        self._cancelled = False
 
         # Configuration of deidentification
         self._deidentConfig = DeidentConfig()
 
-        # Searching results over DICOM tree (have to be members because searching function is recursive)
-        # TODO: refactor this and make it work more transparently
-        self.dataValue = ""
-        self.dataList = []
-
         # Parsing errors
         self._errors = []
 
@@ -137,15 +163,19 @@ class DicomDirectoryService:
         """
         if self._patient is None:
             patientIdList = self.unique("PatientID")
+            patientNameList = self.unique("PatientName")
+            patientSexList = self.unique("PatientSex")
+            patientBirthDateList = self.unique("PatientBirthDate")
+
             if len(patientIdList) == 1:
                 self._patient = DicomPatient()
                 self._patient.id = patientIdList[0]
-                if len(self.unique("PatientName")) == 1:
-                    self._patient.name = self.unique("PatientName")[0]
-                if len(self.unique("PatientSex")) == 1:
-                    self._patient.gender = self.unique("PatientSex")[0]
-                if len(self.unique("PatientBirthDate")) == 1:
-                    self._patient.dob = self.unique("PatientBirthDate")[0]
+                if len(patientNameList) == 1:
+                    self._patient.name = patientNameList[0]
+                if len(patientSexList) == 1:
+                    self._patient.gender = patientSexList[0]
+                if len(patientBirthDateList) == 1:
+                    self._patient.dob = patientBirthDateList[0]
 
                 self._patient.newName = self._deidentConfig.ReplacePatientNameWith
                 if ConfigDetails().retainPatientCharacteristicsOption:
@@ -157,9 +187,9 @@ class DicomDirectoryService:
                 # More patients use the first which is detected
                 self._patient = DicomPatient()
                 self._patient.id = patientIdList[0]
-                self._patient.name = self.unique("PatientName")[0]
-                self._patient.gender = self.unique("PatientSex")[0]
-                self._patient.dob = self.unique("PatientBirthDate")[0]
+                self._patient.name = patientNameList[0]
+                self._patient.gender = patientSexList[0]
+                self._patient.dob = patientBirthDateList[0]
 
                 self._patient.newName = self._deidentConfig.ReplacePatientNameWith
                 if ConfigDetails().retainPatientCharacteristicsOption:
@@ -190,6 +220,12 @@ class DicomDirectoryService:
         """
         return self._rois
 
+    @property
+    def isCancelled(self):
+        """Scanning of DICOM data was cancelled before all files were processed
+        """
+        return self._cancelled
+
 ##     ## ######## ######## ##     ##  #######  ########   ######
 ###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
 #### #### ##          ##    ##     ## ##     ## ##     ## ##
@@ -203,229 +239,140 @@ class DicomDirectoryService:
         DICOM study descriptor dictionary for easier search
         """
         self._errors = []
+        self._cancelled = False
 
         # File reading progress checking
         processed = 0
 
+        # The tree is built in scanning thread and published when scanning is finished,
+        # GUI gets the values of discovered series through signals
+        rootNode = Node("DICOM data root node")
+        resizedSeries = set()
+
         # Gather file DICOM study data and put into DicomStudies
         tempStudies = {}
         # Gather file DICOM series data and put into DicomSeries
         tempSeries = {}
 
+        # Duplicates are detected among files of this setup only
+        self._duplicateService.reset()
+
         # Only process DICOM files
-        for f in self._files:
-            if self._invalidFile(f):
-                continue
-
-            try:
-                descriptor = None
-                dcmFile = dicom.read_file(f, force=True)
-                self._logger.debug("Reading DICOM file: " + f)
-
-                # Construct DICOM file descriptor
-                descriptor = {
-                    "Filename": f
-                }
-
-                # PatientID
-                if "PatientID" in dcmFile:
-                    descriptor["PatientID"] = dcmFile.PatientID
-                else:
-                    self._logger.error("PatientID tag is missing in " + f + "!")
-                    self._errors.append("PatientID tag is missing in " + f + "!")
+        dicomFiles = [f for f in self._files if not self._invalidFile(f)]
+
+        # Default values for missing patient identity tags
+        defaults = {
+            "PatientName": self._deidentConfig.ReplacePatientNameWith,
+            "PatientBirthDate": self._deidentConfig.ReplaceDateWith
+        }
+
+        # Series built from DICOMDIR records are scanned with the same defaults in reload
+        self._scanDefaults = defaults
+
+        # Files referenced from DICOMDIR media directories are not opened to build the tree
+        mediaRecords = {}
+        if ConfigDetails().dicomScanUseDicomDir:
+            for f in self._files:
+                if os.path.basename(f).upper() == "DICOMDIR":
+                    mediaRecords.update(DicomMediaDirectoryService(f).records(dicomFiles, defaults))
+
+        # Records are delivered in the order of files, so the merge is deterministic
+        scannedRecords = self._scanRecords([f for f in dicomFiles if f not in mediaRecords], defaults, len(mediaRecords) == 0)
+
+        for f in dicomFiles:
+            # Files scanned before cancellation stay in the tree
+            if self._cancelled:
+                self._logger.info("DICOM data scanning cancelled after " + str(processed) + " of " + str(len(dicomFiles)) + " files.")
+                break
+
+            if f in mediaRecords:
+                record = mediaRecords[f]
+            else:
+                record = scannedRecords.next()
 
-                # StudyInstanceUID
-                if "StudyInstanceUID" in dcmFile:
-                    studyInstanceUid = dcmFile.StudyInstanceUID
-                    descriptor["StudyInstanceUID"] = dcmFile.StudyInstanceUID
+            for level, msg in record["log"]:
+                self._logger.log(level, msg)
+            self._errors.extend(record["errors"])
 
-                    # Get SUID and prepare study objects
-                    if studyInstanceUid not in tempStudies:
-                        tempStudies[str(studyInstanceUid)] = DicomStudy(studyInstanceUid)
-                else:
-                    self._logger.error("StudyInstanceUID tag is missing in " + f + "!")
-                    self._errors.append("StudyInstanceUID tag is missing in " + f + "!")
+            descriptor = record["descriptor"]
+            if descriptor is not None:
+                # Compact representation of descriptor (repeated UIDs are shared)
+                descriptor = DicomDescriptor(descriptor)
 
-                # Is it a DICOM serie (SeriesInstanceUID)
-                if "SeriesInstanceUID" in dcmFile:
-                    seriesInstanceUID = dcmFile.SeriesInstanceUID
-                    descriptor["SeriesInstanceUID"] = dcmFile.SeriesInstanceUID
+                # Duplicated SOP instance is ignored or replaces the already registered file
+                decision, previous = self._duplicateService.register(descriptor)
+                if decision == DUPLICATE_REPLACE:
+                    self._replaceInstance(previous, descriptor, tempSeries)
+                    descriptor = None
+                elif decision == DUPLICATE_SKIP:
+                    descriptor = None
 
-                    # Get SUID and register the file with an existing or new series object
+            if descriptor is not None:
+                # Get SUID and prepare study objects
+                if "StudyInstanceUID" in descriptor:
+                    studyInstanceUid = descriptor["StudyInstanceUID"]
+                    if studyInstanceUid not in tempStudies:
+                        tempStudies[studyInstanceUid] = DicomStudy(studyInstanceUid)
+                        rootNode.addChild(tempStudies[studyInstanceUid])
+
+                    if "StudyDescription" in descriptor:
+                        tempStudies[studyInstanceUid].name = descriptor["StudyDescription"]
+                        tempStudies[studyInstanceUid].description = descriptor["StudyDescription"]
+                        if record["studyDate"] is not None:
+                            tempStudies[studyInstanceUid].date = record["studyDate"]
+
+                # Get SUID and register the file with an existing or new series object
+                if "SeriesInstanceUID" in descriptor:
+                    seriesInstanceUID = descriptor["SeriesInstanceUID"]
                     if seriesInstanceUID not in tempSeries:
-                        tempSeries[str(seriesInstanceUID)] = DicomSeries(seriesInstanceUID)
+                        tempSeries[seriesInstanceUID] = DicomSeries(seriesInstanceUID)
 
-                    # Lower memory consumption by saving only paths
-                    tempSeries[str(seriesInstanceUID)].appendFile(f)
-                else:
-                    self._logger.error("SeriesInstanceUID tag is missing in " + f + "!")
-                    self._errors.append("SeriesInstanceUID tag is missing in " + f + "!")
+                        # Lower memory consumption by saving only paths
+                        tempSeries[seriesInstanceUID].appendFile(descriptor["Filename"])
+                        self._discoverSeries(tempSeries[seriesInstanceUID], record["header"], tempStudies, thread)
+                    else:
+                        tempSeries[seriesInstanceUID].appendFile(descriptor["Filename"])
+                        resizedSeries.add(seriesInstanceUID)
 
+                    # ROIs are reused when the selection is reloaded
+                    self._seriesRois.setdefault(seriesInstanceUID, []).extend(record["rois"])
 
-                # SOPInstanceUID
-                if "SOPInstanceUID" in dcmFile:
-                    descriptor["SOPInstanceUID"] = dcmFile.SOPInstanceUID
-                else:
-                    self._logger.error("SOPInstanceUID tag is missing in " + f + "!")
-                    self._errors.append("SOPInstanceUID tag is missing in " + f + "!")
+                    # Descriptors from DICOMDIR are completed when the series is reloaded
+                    if f in mediaRecords:
+                        self._incompleteSeries.add(seriesInstanceUID)
 
-                # PatientName in descriptor
-                if "PatientName" in dcmFile:
-                    descriptor["PatientName"] = dcmFile.PatientName
-                else:
-                    self._logger.info("PatientName tag is missing in " + f + ". Replacing with default: " + self._deidentConfig.ReplacePatientNameWith + ".")
-                    descriptor["PatientName"] = self._deidentConfig.ReplacePatientNameWith
-
-                # PatientBirthDate in descriptor
-                if "PatientBirthDate" in dcmFile:
-                    descriptor["PatientBirthDate"] = dcmFile.PatientBirthDate
-                else:
-                    self._logger.info("PatientBirthDate tag is missing in " + f + ". Replacing with default: " + self._deidentConfig.ReplaceDateWith + ".")
-                    descriptor["PatientBirthDate"] = self._deidentConfig.ReplaceDateWith
+                # RTSTRUCT ROIs dictionary
+                if descriptor.get("Modality") == "RTSTRUCT":
+                    for roiNumber, roiName in record["rois"]:
+                        self._rois[roiNumber] = [roiName]
+                    self._logger.info("Number of RTSTRUCT ROIs: " + str(len(self._rois)))
 
-                # PatientSex in descriptor
-                if "PatientSex" in dcmFile:
-                    descriptor["PatientSex"] = dcmFile.PatientSex
-                else:
-                    self._logger.info("PatientSex tag is missing in " + f + ". Replacing with default: O.")
-                    descriptor["PatientSex"] = "O"  # Other, if not present
-
-                # Save StudyDescription in descriptor
-                if "StudyDescription" in dcmFile:
-                    descriptor["StudyDescription"] = dcmFile.StudyDescription
-                    tempStudies[str(studyInstanceUid)].name = dcmFile.StudyDescription
-                    tempStudies[str(studyInstanceUid)].description = dcmFile.StudyDescription
-                    if "StudyDate" in dcmFile:
-                        tempStudies[str(studyInstanceUid)].date = dcmFile.StudyDate
-
-                # Save IntanceNumber in descriptor
-                if "InstanceNumber" in dcmFile:
-                    descriptor["InstanceNumber"] = dcmFile.InstanceNumber
-                else:
-                    descriptor["InstanceNumber"] = 0
-
-                # Save PatientsAge in descriptor
-                if "PatientsAge" in dcmFile:
-                    descriptor["PatientsAge"] = dcmFile.PatientsAge
-                else:
-                    descriptor["PatientsAge"] = "OOOY"
-
-                # Save FrameOfReferenceUID in descriptor
-                self.getValue(dcmFile, "Frame of Reference UID")
-                if self.dataValue != "":
-                    descriptor["FrameOfReferenceUID"] = self.dataValue
-
-                self.dataValue = ""
-                self.dataList = []
-
-                # Save ReferencedSOPInstanceUID_RTPLAN in descriptor
-                self.getValue(dcmFile, "Referenced SOP Instance UID", reference="Referenced Structure Set Sequence")
-                if self.dataValue != "":
-                    descriptor["ReferencedSOPInstanceUID_RTSTRUCT"] = self.dataValue
-
-                self.dataValue = ""
-                self.dataList = []
-
-                # Save ReferencedSOPInstanceUID_RTPLAN in descriptor
-                self.getValue(dcmFile,  "Referenced SOP Instance UID", reference="Referenced RT Plan Sequence")
-                if self.dataValue != "":
-                    descriptor["ReferencedSOPInstanceUID_RTPLAN"] = self.dataValue
-
-                self.dataValue = ""
-                self.dataList = []
-
-                # Save Countour Image Sequence
-                self.getValue(dcmFile,  "Contour Image Sequence")
-                if self.dataList  != []:
-                    descriptor["ContourImageSequence"] = list(set(self.dataList))
-
-                self.dataValue = ""
-                self.dataList = []
-
-                # According to modality save
-                if "Modality" in dcmFile:
-                    descriptor["Modality"] = dcmFile.Modality,
-
-                    # For RTPLAN
-                    if dcmFile.Modality == "RTPLAN":
-
-                        # Save RTPlanLabel in descriptor
-                        if "RTPlanLabel" in dcmFile:
-                            descriptor["RTPlanLabel"] = dcmFile.RTPlanLabel
-
-                        # Save BeamNumbers
-                        if "Beams" in dcmFile:
-                            descriptor["BeamNumbers"] = len(dcmFile.Beams)
-
-                        # Save RadiationType
-                        self.getValue(dcmFile, "Radiation Type")
-                        if self.dataValue != "":
-                            descriptor["RadiationType"] = self.dataValue
-
-                        self.dataValue = ""
-                        self.dataList = []
-
-                    # Save DoseSummationType for RTDOSE
-                    elif dcmFile.Modality == "RTDOSE" and \
-                        "DoseSummationType" in dcmFile:
-                        descriptor["DoseSummationType"] = dcmFile.DoseSummationType
-
-                    # For RTSTRUCT prepare ROIs dictionary
-                    elif dcmFile.Modality == "RTSTRUCT":
-                        # Oncentra MasterPlan case exports RTSTRUCT with this point we should store this info
-                        if "ReferencedFrameOfReferenceSequence" in dcmFile:
-                            for element in dcmFile.ReferencedFrameOfReferenceSequence:
-                                if "FrameOfReferenceRelationshipSequence" in element:
-                                    for secElem in element.FrameOfReferenceRelationshipSequence:
-                                        if "FrameOfReferenceTransformationType" in secElem:
-                                            descriptor["TreatmentPlanningReferencePoint"] = "Yes"
-                                            break
-
-                        for element in dcmFile:
-                            if element.VR == "SQ":
-                                if element.name == "Structure Set ROI Sequence":
-                                    for subElem in element:
-                                        self._rois[subElem.ROINumber] = [subElem.ROIName]
-
-                        self._logger.info("Number of RTSTRUCT ROIs: " + str(len(self._rois)))
-
-            except Exception, err:
-                msg = "Unexpected error during DICOM data parsing:" + f + "!"
-                self._logger.exception(msg)
-                self._errors.append(msg)
-
-            # Add descriptor for DICOM file
-            if descriptor is not None:
+                # Add descriptor for DICOM file
                 self.dicomDescriptors.append(descriptor)
+                self.referenceGraph.addDescriptor(descriptor)
 
             # Progress
             if thread:
                 processed += 1
                 thread.emit(QtCore.SIGNAL("taskUpdated"), [processed, self.size])
 
-        # Make a series list and sort, so that the order is deterministic
-        tempSeries = tempSeries.values()
-        tempSeries.sort(key=lambda x: x.suid)
-
-        # Prepare real series objects and put it into property
-        for i in range(len(tempSeries)):
-            try:
-                tempSeries[i]._finish()
-                self._series.append(tempSeries[i])
-            except Exception:
-                # Finish was not successful but I do not want to
-                # skip the serie (probably report-like file without pixels)
-                self._series.append(tempSeries[i])
-
-        # Assign series to temp studies
-        for series in self._series:
-            tempStudies[series.studyInstanceUid].addChild(series)
-
-        # Prepare real studies objects
-        tempStudies = tempStudies.values()
-        tempStudies.sort(key=lambda x: x.suid)
-        for i in range(len(tempStudies)):
-            self._studies.append(tempStudies[i])
+                # Numbers of files of series are updated in batches (not for each file)
+                if processed % SCAN_TREE_UPDATE_FILES == 0:
+                    self._emitSeriesSizes(resizedSeries, tempSeries, thread)
+
+        scannedRecords.close()
+        self._duplicateService.logSummary()
+
+        if thread:
+            self._emitSeriesSizes(resizedSeries, tempSeries, thread)
+
+        # Sort series and studies, so that the order is deterministic
+        self._series.sort(key=lambda x: x.suid)
+        for study in rootNode.children:
+            study.children.sort(key=lambda x: x.suid)
+        rootNode.children.sort(key=lambda x: x.suid)
+        self._studies = list(rootNode.children)
+        self._rootNode = rootNode
 
         # Report reading errors
         resultError = ""
@@ -445,20 +392,26 @@ class DicomDirectoryService:
     def reload(self, thread=None):
         """Setup the dicomDirectory to make it possible to lookup what DICOM data have been provided
         DICOM study descriptor (on top of selected study) for easier search
+
+        Descriptors collected during setup are reused, DICOM files are not read again
         """
         self._errors = []
 
         # Reset lookup variables
         self._rois = {}  # Dictionary (key = ROINumber, value = ROIName)
-        self.dicomDescriptors = []
+        self.dicomDescriptors = DicomDescriptorStore()
+        self.referenceGraph = DicomReferenceGraph()
 
-        # Searching results over DICOM tree (have to be members because searching function is recursive)
-        self._burnedInAnnotations = False
-        self.dataValue = ""
-        self.dataList = []
+        self._burnedInSeries = {}
 
         # File reading progress checking
         processed = 0
+        size = 0
+        if self._rootNode is not None:
+            for progressStudy in self._rootNode.children:
+                for progressSeries in progressStudy.children:
+                    if progressSeries.isChecked:
+                        size += progressSeries.size
 
         # Build descriptors for elements in selected study
         # and also for selected series (even if there are not in selected study)
@@ -469,246 +422,85 @@ class DicomDirectoryService:
                 for serie in study.children:
                     # Even if series is not in a selected study
                     if serie.isChecked:
-                        for f in serie.files:
-                            try:
-                                dcmFile = dicom.read_file(f, force=True)
-
-                                # Determine whether there is any data with burned in annotations
-                                if not self._burnedInAnnotations:
-                                    if "BurnedInAnnotation" in dcmFile:
-                                        if (str(dcmFile.BurnedInAnnotation)).upper() == "TRUE":
-                                            self._burnedInAnnotations = True
-                                            self._logger.info("Burned in annotation found in: " + f)
-
-                                # Construct DICOM file descriptor
-                                descriptor = {
-                                    "PatientID": dcmFile.PatientID,
-                                    "SeriesInstanceUID": dcmFile.SeriesInstanceUID,
-                                    "SOPInstanceUID": dcmFile.SOPInstanceUID,
-                                    "Modality": dcmFile.Modality,
-                                    "Filename": dcmFile.filename
-                                }
-
-                                # PatientName in descriptor
-                                if "PatientName" in dcmFile:
-                                    descriptor["PatientName"] = dcmFile.PatientName
-                                else:
-                                    descriptor["PatientName"] = self._deidentConfig.ReplacePatientNameWith
-
-                                # PatientBirthDate in descriptor
-                                if "PatientBirthDate" in dcmFile:
-                                    descriptor["PatientBirthDate"] = dcmFile.PatientBirthDate
-                                else:
-                                    descriptor["PatientBirthDate"] = self._deidentConfig.ReplaceDateWith
-
-                                # PatientSex in descriptor
-                                if "PatientSex" in dcmFile:
-                                    descriptor["PatientSex"] = dcmFile.PatientSex
-                                else:
-                                    descriptor["PatientSex"] = "O" # Other, if not present
-
-                                # StudyInctanceUID in descriptor
-                                # Depends on the fact that the file belong to series in selected study
-                                if "StudyInstanceUID" in dcmFile:
-                                    if dcmFile.StudyInstanceUID != self.study.suid:
-                                        dcmFile.StudyInstanceUID = self.study.suid
-                                    descriptor["StudyInstanceUID"] = self.study.suid
-
-                                # StudyDescription in descriptor
-                                # Depends on the fact that the file belong to series in selected study
-                                if "StudyDescription" in dcmFile:
-                                    if dcmFile.StudyDescription != self.study.description:
-                                        dcmFile.StudyDescription = self.study.description
-                                    descriptor["StudyDescription"] = self.study.description
-
-                                # Save InstanceNumber in descriptor
-                                if "InstanceNumber" in dcmFile:
-                                    descriptor["InstanceNumber"] = dcmFile.InstanceNumber
-                                else:
-                                    descriptor["InstanceNumber"] = 0
-
-                                # Save PatientsAge in descriptor
-                                if "PatientsAge" in dcmFile:
-                                    descriptor["PatientsAge"] = dcmFile.PatientsAge
-                                else:
-                                    descriptor["PatientsAge"] = "OOOY"
-
-                                # Save FrameOfReferenceUID in descriptor
-                                self.getValue(dcmFile, "Frame of Reference UID")
-                                if self.dataValue != "":
-                                    descriptor["FrameOfReferenceUID"] = self.dataValue
-
-                                self.dataValue = ""
-                                self.dataList = []
-
-                                # Save ReferencedSOPInstanceUID_RTPLAN in descriptor
-                                self.getValue(dcmFile, "Referenced SOP Instance UID", reference="Referenced Structure Set Sequence")
-                                if self.dataValue != "":
-                                    descriptor["ReferencedSOPInstanceUID_RTSTRUCT"] = self.dataValue
-
-                                self.dataValue = ""
-
-                                self.dataList = []
-
-                                # Save ReferencedSOPInstanceUID_RTPLAN in descriptor
-                                self.getValue(dcmFile, "Referenced SOP Instance UID", reference="Referenced RT Plan Sequence")
-                                if self.dataValue != "":
-                                    descriptor["ReferencedSOPInstanceUID_RTPLAN"] = self.dataValue
-
-                                self.dataValue = ""
-                                self.dataList = []
-
-                                # Save Contour Image Sequence
-                                self.getValue(dcmFile, "Contour Image Sequence")
-                                if self.dataList != []:
-                                    descriptor["ContourImageSequence"] = list(set(self.dataList))
-
-                                self.dataValue = ""
-                                self.dataList = []
-
-                                # According to modality save
-                                if "Modality" in dcmFile:
-
-                                    # For RTPLAN
-                                    if dcmFile.Modality == "RTPLAN":
-
-                                        # Save RTPlanLabel in descriptor
-                                        if "RTPlanLabel" in dcmFile:
-                                            descriptor["RTPlanLabel"] = dcmFile.RTPlanLabel
-
-                                        # Save BeamNumbers
-                                        if "Beams" in dcmFile:
-                                            descriptor["BeamNumbers"] = len(dcmFile.Beams)
-
-                                        # Save RadiationType
-                                        self.getValue(dcmFile, "Radiation Type")
-                                        if self.dataValue != "":
-                                            descriptor["RadiationType"] = self.dataValue
-
-                                        self.dataValue = ""
-                                        self.dataList = []
-
-                                    # Save DoseSummationType for RTDOSE
-                                    elif dcmFile.Modality == "RTDOSE" and \
-                                        "DoseSummationType" in dcmFile:
-                                        descriptor["DoseSummationType"] = dcmFile.DoseSummationType
-
-                                    # For RTSTRUCT prepare ROIs dictionary
-                                    elif dcmFile.Modality == "RTSTRUCT":
-                                        # Oncentra MasterPlan case exports RTSTRUCT with this point we should store this info
-                                        if "ReferencedFrameOfReferenceSequence" in dcmFile:
-                                            for element in dcmFile.ReferencedFrameOfReferenceSequence:
-                                                if "FrameOfReferenceRelationshipSequence" in element:
-                                                    for secElem in element.FrameOfReferenceRelationshipSequence:
-                                                        if "FrameOfReferenceTransformationType" in secElem:
-                                                            descriptor["TreatmentPlanningReferencePoint"] = "Yes"
-                                                            break
-
-                                        for element in dcmFile:
-                                            if element.VR == "SQ":
-                                                if element.name == "Structure Set ROI Sequence":
-                                                    for subElem in element:
-                                                        self._rois[subElem.ROINumber] = [subElem.ROIName]
-
-                            except Exception, err:
-                                self._logger.exception("Unexpected error in dicom file reading.")
+                        # Series built from DICOMDIR records need the values of its files
+                        if serie.suid in self._incompleteSeries:
+                            self._completeSeries(serie)
+
+                        # Slice geometry of image series (from scanned descriptors)
+                        serie.geometryIssues = self._geometryValidator.validate(
+                            self._scanDescriptors.belongingTo("SeriesInstanceUID", serie.suid)
+                        )
+                        for issue in serie.geometryIssues:
+                            self._logger.warning("Series " + serie.suid + " geometry: " + issue)
+
+                        # Burned in annotations (from scanned descriptors, stops at the first affected file)
+                        serie.burnedInAnnotation = self._annotationDetector.detect(
+                            self._scanDescriptors.belongingTo("SeriesInstanceUID", serie.suid)
+                        )
+                        if serie.burnedInAnnotation is not None:
+                            self._burnedInSeries[serie.suid] = serie.burnedInAnnotation
+                            self._logger.info("Series " + serie.suid + " burned in annotation: " + serie.burnedInAnnotation)
+
+                        for scanDescriptor in self._scanDescriptors.belongingTo("SeriesInstanceUID", serie.suid):
+                            descriptor = scanDescriptor.copy()
+
+                            # StudyInstanceUID and StudyDescription in descriptor
+                            # Depends on the fact that the file belong to series in selected study
+                            if "StudyInstanceUID" in descriptor:
+                                descriptor["StudyInstanceUID"] = self.study.suid
+                            if "StudyDescription" in descriptor:
+                                descriptor["StudyDescription"] = self.study.description
 
                             # Add descriptor for DICOM file
                             self.dicomDescriptors.append(descriptor)
+                            self.referenceGraph.addDescriptor(descriptor)
 
                             # Progress
-                            size = 0
-                            for progressStudy in self._rootNode.children:
-                                for progressSeries in progressStudy.children:
-                                    if progressSeries.isChecked:
-                                        size += progressSeries.size
-
                             if thread:
                                 processed += 1
                                 thread.emit(QtCore.SIGNAL("taskUpdated"), [processed, size])
 
+                        # RTSTRUCT ROIs dictionary
+                        for roiNumber, roiName in self._seriesRois.get(serie.suid, []):
+                            self._rois[roiNumber] = [roiName]
+
+    def cancel(self):
+        """Stop scanning of DICOM data (already scanned files are kept)
+        """
+        self._cancelled = True
+
     def unique(self, tagname):
         """Lookup whether specific tag has unique value within DICOM study
         """
-        # Initialise return list
-        resList = []
-
-        # Search within descriptors dictionary
-        for entry in self.dicomDescriptors:
-            if tagname in entry:
-                resList.append(entry[tagname])
-
-        # Return created list
-        return list(set(resList))
+        return self.dicomDescriptors.unique(tagname)
 
     def isFrameOfReferenceUnique(self):
         """For treatment plan the frame of reference has to be the same
         """
         frameOfReferenceUids = []
 
-        for entry in self.dicomDescriptors:
-            if "Modality" in entry:
-                if entry["Modality"] in ["CT", "RTPLAN", "RTDOSE", "RTSTRUCT"]:
-                    if "FrameOfReferenceUID" in entry:
-                        if entry["FrameOfReferenceUID"] not in frameOfReferenceUids:
-                            if entry["Modality"] == "RTSTRUCT":
-                                if "TreatmentPlanningReferencePoint" in entry:
-                                    # TreatmentPanningReferencePoint can have a different frame of refferences (multicase export from Oncentra)
-                                    if entry["TreatmentPlanningReferencePoint"] == "Yes":
-                                        self._logger.info("Skipping frame of reference because it is treatment plan reference point.")
-                                        continue
-                                    frameOfReferenceUids.append(entry["FrameOfReferenceUID"])
-                            frameOfReferenceUids.append(entry["FrameOfReferenceUID"])
-                            self._logger.debug(entry)
+        for modality in ["CT", "RTPLAN", "RTDOSE", "RTSTRUCT"]:
+            for entry in self.dicomDescriptors.belongingTo("Modality", modality):
+                if "FrameOfReferenceUID" in entry:
+                    if entry["FrameOfReferenceUID"] not in frameOfReferenceUids:
+                        if entry["Modality"] == "RTSTRUCT":
+                            if "TreatmentPlanningReferencePoint" in entry:
+                                # TreatmentPanningReferencePoint can have a different frame of refferences (multicase export from Oncentra)
+                                if entry["TreatmentPlanningReferencePoint"] == "Yes":
+                                    self._logger.info("Skipping frame of reference because it is treatment plan reference point.")
+                                    continue
+                                frameOfReferenceUids.append(entry["FrameOfReferenceUID"])
+                        frameOfReferenceUids.append(entry["FrameOfReferenceUID"])
+                        self._logger.debug(entry)
 
         self._logger.info("FrameOfReferences: " + str(len(list(set(frameOfReferenceUids)))))
 
         return len(list(set(frameOfReferenceUids))) == 1
 
     def belongingTo(self, tagname, tagValue):
+        """List of descriptors where the tag has specified value
         """
-        """
-        # Initialise return list
-        resList = []
-
-        # Search within descriptors dictionary
-        for entry in self.dicomDescriptors:
-            if tagname in entry:
-                if entry[tagname] == tagValue:
-                    resList.append(entry)
-
-        # Return created list
-        return resList
-
-    def getValue(self, dcmFile, dataName, reference=None):
-        """Read value of specified DICOM element for the DICOM file
-
-        dcmFile: DICOM file
-        dataName: DICOM tag element name
-        reference: element is referenced by other element (name)
-
-        return: value of found dicom tag
-        """
-        # Search in all elements within DICOM file
-        for data_element in dcmFile:
-
-            if data_element.name == "Contour Image Sequence":
-                for elem in data_element.value:
-                    self.dataList.append(elem.ReferencedSOPInstanceUID)
-
-            # For sequences
-            if data_element.VR == "SQ":
-                if reference is not None and \
-                   data_element.name != reference: continue
-                for dataset in data_element.value:
-                    self.getValue(dataset, dataName, reference)
-
-            # For normal elements
-            else:
-                if data_element.name == dataName:
-                    self.dataValue = data_element.value
-
-        return 0
+        return self.dicomDescriptors.belongingTo(tagname, tagValue)
 
     def determineNumberOfPatientIDs(self):
         """Detect the number of patient IDs
@@ -728,7 +520,6 @@ class DicomDirectoryService:
         result = ""
 
         modalityList = self.unique("Modality")
-        modalityList = list(set(modalityList))
 
         # What DICOM study type it can be depends on present modalities
         if "RTSTRUCT" in modalityList or \
@@ -759,13 +550,32 @@ class DicomDirectoryService:
         """Return list of modalities in DICOM study
         """
         modalityList = self.unique("Modality")
-        modalityList = list(set(modalityList))
         return modalityList
 
     def hasBurnedInAnnotations(self):
         """Burned in annotations
         """
-        return self._burnedInAnnotations
+        return len(self._burnedInSeries) > 0
+
+    @property
+    def duplicateService(self):
+        """Duplicated SOP instances detected during setup (skipped files and their size)
+        """
+        return self._duplicateService
+
+    def burnedInAnnotationSeries(self):
+        """Selected series with burned in annotations
+
+        return: list of DicomSeries (burnedInAnnotation holds the reason)
+        """
+        series = []
+        if self._rootNode is not None:
+            for study in self._rootNode.children:
+                for serie in study.children:
+                    if serie.suid in self._burnedInSeries:
+                        series.append(serie)
+
+        return series
 
 ########  ########  #### ##     ##    ###    ######## ########
 ##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
@@ -785,25 +595,132 @@ class DicomDirectoryService:
 
             self._files.sort()
 
+    def _discoverSeries(self, series, headerRecord, studies, thread=None):
+        """Evaluate newly discovered series and put it into the tree under its study
+
+        headerRecord: series header record from scan record of the first series file
+        """
+        try:
+            series._finish(headerRecord)
+        except Exception:
+            # Finish was not successful but I do not want to
+            # skip the serie (probably report-like file without pixels)
+            pass
+
+        self._series.append(series)
+
+        # Series without study is not part of the tree
+        study = studies.get(series.studyInstanceUid)
+        if study is None:
+            return
+
+        study.addChild(series)
+
+        # Only values are sent, nodes of the tree are not shared with GUI thread
+        if thread:
+            thread.emit(QtCore.SIGNAL("seriesDiscovered"), {
+                "studyInstanceUid": study.suid,
+                "studyName": study.name,
+                "studyDescription": study.description,
+                "studyDate": study.date,
+                "seriesInstanceUid": series.suid,
+                "modality": series.modality,
+                "description": series.description,
+                "date": series.date,
+                "objects": series.objects,
+                "size": series.size
+            })
+
+    def _emitSeriesSizes(self, resizedSeries, series, thread):
+        """Send numbers of files of series which were extended since the last update
+        """
+        if resizedSeries:
+            sizes = {}
+            for suid in resizedSeries:
+                sizes[suid] = series[suid].size
+            resizedSeries.clear()
+
+            thread.emit(QtCore.SIGNAL("seriesFilesAdded"), sizes)
+
+    def _scanRecords(self, files, defaults, prune=True):
+        """Generator of scan records for files (in the same order)
+
+        Records of files which were not changed since the last scan are taken
+        from the scan index, the remaining files are scanned
+
+        prune: files list all files of the directory (index entries of other files are removed)
+        """
+        scanService = DicomScanService()
+
+        scanIndex = None
+        indexedRecords = {}
+        if ConfigDetails().dicomScanIndex:
+            scanIndex = DicomScanIndexService(ConfigDetails().dicomScanIndexFileName, scanService.signature(defaults))
+            indexedRecords = scanIndex.lookup(self._directory, files, prune)
+
+        scannedRecords = scanService.scan([f for f in files if f not in indexedRecords], defaults)
+
+        try:
+            for f in files:
+                if f in indexedRecords:
+                    yield indexedRecords[f]
+                else:
+                    record = scannedRecords.next()
+                    if scanIndex is not None:
+                        scanIndex.store(f, record)
+                    yield record
+        finally:
+            # Also when the generator is closed after the last record was taken (or scanning was cancelled)
+            scannedRecords.close()
+            if scanIndex is not None:
+                scanIndex.close()
+
+    def _completeSeries(self, serie):
+        """Replace descriptors of series built from DICOMDIR records with descriptors of scanned files
+        (header of series is replaced with the header of its scanned first file)
+        """
+        suid = serie.suid
+        mediaDescriptors = self._scanDescriptors.removeWhere("SeriesInstanceUID", suid)
+
+        self._logger.info("Completing DICOMDIR series: " + suid)
+
+        rois = []
+        for record in self._scanRecords([d["Filename"] for d in mediaDescriptors], self._scanDefaults, False):
+            for level, msg in record["log"]:
+                self._logger.log(level, msg)
+            self._errors.extend(record["errors"])
+
+            if record["descriptor"] is not None:
+                self._scanDescriptors.append(DicomDescriptor(record["descriptor"]))
+                rois.extend(record["rois"])
+
+                if record["descriptor"]["Filename"] == serie.files[0]:
+                    serie._finish(record["header"])
+
+        self._seriesRois[suid] = rois
+        self._incompleteSeries.discard(suid)
+
+    def _replaceInstance(self, previous, descriptor, series):
+        """Replace file of already registered SOP instance with its duplicate
+        """
+        # Instance without SeriesInstanceUID is not part of any series
+        serie = series.get(previous.get("SeriesInstanceUID"))
+        if serie is not None:
+            serie.replaceFile(previous["Filename"], descriptor["Filename"])
+
+        self.dicomDescriptors.remove(previous)
+        self.dicomDescriptors.append(descriptor)
+        self.referenceGraph.addDescriptor(descriptor)
+
     def _invalidFile(self, path):
-        """Check whether the file should be ignored
+        """Check whether the file should be ignored according to its name
+
+        Skipped names and extensions are configurable, the content of
+        remaining files is checked before parsing by scan service
         """
-        isInvalid = False
         baseName = os.path.basename(path)
 
-        if baseName == "DICOMDIR":
-            isInvalid = True
-        elif baseName == "DIRFILE":
-            isInvalid = True
-        elif baseName.lower().endswith(".txt"):
-            isInvalid = True
-        elif baseName.lower().endswith(".gsession"):  # Geisterr 3D file
-            isInvalid = True
-        elif baseName.lower().endswith(".gstk"):  # Geisterr 3D file
-            isInvalid = True
-        elif baseName.lower().endswith(".genv"):  # Geisterr 3D file
-            isInvalid = True
-        elif baseName.lower().endswith(".rdf"):  # Rover file
-            isInvalid = True
-
-        return isInvalid
+        if baseName in ConfigDetails().dicomScanSkipNames:
+            return True
+
+        return os.path.splitext(baseName)[1].lower() in ConfigDetails().dicomScanSkipExtensions
@@ -0,0 +1,331 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import traceback
+
+# Logging
+import logging
+import logging.config
+
+# Numpy
+import numpy as np
+
+# DICOM
+import dicom
+
+# Context
+from contexts.ConfigDetails import ConfigDetails
+
+# Worker processes
+from utils.WorkerPool import imapTasks, processCount
+
+# Below this number of ROIs it is cheaper to compute serially than to start worker processes
+PARALLEL_DVH_MIN_ROIS = 4
+
+# Dose bin width of cumulative DVH (Gy)
+DVH_BIN_WIDTH = 0.01
+
+# Contour z positions are rounded to this number of decimals to group contours into slices
+SLICE_POSITION_DECIMALS = 3
+
+# Tolerance of dose grid orientation (only axial grids are supported)
+ORIENTATION_TOLERANCE = 0.001
+
+# Tolerance (mm) of the first grid frame offset equal to z of image position (offsets are z coordinates)
+POSITION_TOLERANCE = 0.001
+
+# Dose grid of worker process (set once by pool initializer)
+_DOSE_GRID = None
+
+######## ##     ## ##    ##  ######  ######## ####  #######  ##    ##  ######
+##       ##     ## ###   ## ##    ##    ##     ##  ##     ## ###   ## ##    ##
+##       ##     ## ####  ## ##          ##     ##  ##     ## ####  ## ##
+######   ##     ## ## ## ## ##          ##     ##  ##     ## ## ## ##  ######
+##       ##     ## ##  #### ##          ##     ##  ##     ## ##  ####       ##
+##       ##     ## ##   ### ##    ##    ##     ##  ##     ## ##   ### ##    ##
+##        #######  ##    ##  ######     ##    ####  #######  ##    ##  ######
+
+
+def readDoseGrid(path):
+    """Read RTDOSE file as dose grid
+
+    return: dictionary with dose (frames, rows, columns) in Gy and x, y, z coordinates of voxel centres
+    """
+    ds = dicom.read_file(path, force=True)
+
+    orientation = [float(v) for v in ds.ImageOrientationPatient]
+    if not np.allclose(orientation, [1.0, 0.0, 0.0, 0.0, 1.0, 0.0], atol=ORIENTATION_TOLERANCE):
+        raise ValueError("Only axial RTDOSE grids are supported: " + path)
+
+    rows, columns = int(ds.Rows), int(ds.Columns)
+    frames = int(ds.get("NumberOfFrames", 1) or 1)
+    position = [float(v) for v in ds.ImagePositionPatient]
+    rowSpacing, columnSpacing = [float(v) for v in ds.PixelSpacing]
+
+    if frames > 1:
+        offsets = np.array([float(v) for v in ds.GridFrameOffsetVector])
+    else:
+        offsets = np.zeros(1)
+
+    dose = ds.pixel_array.reshape((frames, rows, columns)).astype(np.float32)
+    dose *= np.float32(float(ds.get("DoseGridScaling", 1.0)))
+
+    # Offsets are relative to image position (first offset is zero) or they are z coordinates of frames
+    # (first offset equals z of image position), both forms are allowed by DICOM
+    if offsets[0] != 0.0 and abs(offsets[0] - position[2]) < POSITION_TOLERANCE:
+        z = offsets
+    else:
+        z = position[2] + offsets
+
+    # Frames are ordered by z
+    order = np.argsort(z, kind="mergesort")
+
+    return {
+        "dose": dose[order],
+        "x": position[0] + np.arange(columns) * columnSpacing,
+        "y": position[1] + np.arange(rows) * rowSpacing,
+        "z": z[order]
+    }
+
+
+def computeRoiStatistics(task, grid=None):
+    """Dose statistics and cumulative DVH of one ROI
+
+    task: tuple (roiNumber, roiName, contours) where contours is a list of (M, 3) arrays
+    grid: dose grid (None = dose grid of worker process)
+
+    return: dictionary with volume (cc), minimum, maximum, mean dose, D95, D2 (Gy) and DVH (doses, volumes)
+    """
+    roiNumber, roiName, contours = task
+    if grid is None:
+        grid = _DOSE_GRID
+
+    result = {
+        "roiNumber": roiNumber,
+        "roiName": roiName,
+        "volume": 0.0,
+        "minDose": None,
+        "maxDose": None,
+        "meanDose": None,
+        "d95": None,
+        "d2": None,
+        "dvh": (np.empty(0), np.empty(0)),
+        "error": None
+    }
+
+    try:
+        # Contours grouped by slice
+        slices = {}
+        for contour in contours:
+            if len(contour) < 3:
+                continue
+            z = round(float(contour[0, 2]), SLICE_POSITION_DECIMALS)
+            slices.setdefault(z, []).append(contour[:, 0:2])
+
+        if not slices:
+            return result
+
+        positions = np.array(sorted(slices.keys()))
+        if len(positions) > 1:
+            thickness = float(np.median(np.diff(positions)))
+        elif len(grid["z"]) > 1:
+            thickness = float(np.median(np.diff(grid["z"])))
+        else:
+            thickness = 1.0
+
+        doses = []
+        for z in positions:
+            plane = _dosePlane(grid, z)
+            if plane is None:
+                continue
+
+            mask = _rasterize(slices[z], grid["x"], grid["y"])
+            doses.append(plane[mask])
+
+        doses = np.concatenate(doses) if doses else np.empty(0)
+        if len(doses) == 0:
+            return result
+
+        # Voxel volume in cc
+        voxelVolume = abs(grid["x"][1] - grid["x"][0] if len(grid["x"]) > 1 else 1.0) * \
+            abs(grid["y"][1] - grid["y"][0] if len(grid["y"]) > 1 else 1.0) * thickness / 1000.0
+
+        sortedDoses = np.sort(doses)
+        bins = np.arange(0.0, sortedDoses[-1] + DVH_BIN_WIDTH, DVH_BIN_WIDTH)
+        volumes = (len(sortedDoses) - np.searchsorted(sortedDoses, bins, side="left")) * voxelVolume
+
+        result["volume"] = len(doses) * voxelVolume
+        result["minDose"] = float(sortedDoses[0])
+        result["maxDose"] = float(sortedDoses[-1])
+        result["meanDose"] = float(sortedDoses.mean())
+        # Dose received by at least 95 % (2 %) of the volume
+        result["d95"] = float(np.percentile(sortedDoses, 5))
+        result["d2"] = float(np.percentile(sortedDoses, 98))
+        result["dvh"] = (bins, volumes)
+    except Exception:
+        result["error"] = "Cannot compute dose statistics of ROI " + str(roiNumber) + "\n" + traceback.format_exc()
+
+    return result
+
+
+def _initDoseGrid(grid):
+    """Pool initializer: keep dose grid in worker process
+    """
+    global _DOSE_GRID
+    _DOSE_GRID = grid
+
+
+def _dosePlane(grid, z):
+    """Dose plane at z linearly interpolated between dose grid frames (None outside of grid)
+    """
+    positions = grid["z"]
+    if z < positions[0] - 1e-3 or z > positions[-1] + 1e-3:
+        return None
+
+    if len(positions) == 1:
+        return grid["dose"][0]
+
+    upper = min(max(int(np.searchsorted(positions, z)), 1), len(positions) - 1)
+    lower = upper - 1
+    weight = (z - positions[lower]) / (positions[upper] - positions[lower])
+    weight = min(max(weight, 0.0), 1.0)
+
+    return (1.0 - weight) * grid["dose"][lower] + weight * grid["dose"][upper]
+
+
+def _rasterize(polygons, x, y):
+    """Mask of grid points (rows, columns) inside polygons (even-odd rule, holes are excluded)
+
+    x, y: ascending grid coordinates of columns and rows
+    """
+    mask = np.zeros((len(y), len(x)), dtype=bool)
+
+    for polygon in polygons:
+        # Only grid rows within bounding box of polygon are scanned
+        rows = np.nonzero((y >= polygon[:, 1].min()) & (y <= polygon[:, 1].max()))[0]
+        if len(rows) == 0:
+            continue
+
+        # Intersections of all polygon edges with all scan lines at once (rows, edges)
+        x1, y1 = polygon[:, 0], polygon[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        py = y[rows][:, None]
+        crossing = (y1 > py) != (y2 > py)
+        rowIndex, edgeIndex = np.nonzero(crossing)
+        if len(rowIndex) == 0:
+            continue
+
+        edgeX1, edgeY1 = x1[edgeIndex], y1[edgeIndex]
+        intersection = (x2[edgeIndex] - edgeX1) * (y[rows][rowIndex] - edgeY1) / (y2[edgeIndex] - edgeY1) + edgeX1
+
+        # Each intersection toggles inside state of all grid points right of it
+        toggles = np.zeros((len(rows), len(x) + 1), dtype=np.int32)
+        np.add.at(toggles, (rowIndex, np.searchsorted(x, intersection, side="left")), 1)
+        inside = (np.cumsum(toggles[:, :-1], axis=1) & 1).astype(bool)
+
+        mask[rows[0]:rows[-1] + 1] ^= inside
+
+    return mask
+
+ ######  ######## ########  ##     ## ####  ######  ########
+##    ## ##       ##     ## ##     ##  ##  ##    ## ##
+##       ##       ##     ## ##     ##  ##  ##       ##
+ ######  ######   ########  ##     ##  ##  ##       ######
+      ## ##       ##   ##    ##   ##   ##  ##       ##
+##    ## ##       ##    ##    ## ##    ##  ##    ## ##
+ ######  ######## ##     ##    ###    ####  ######  ########
+
+
+class DicomDoseService:
+    """Dose statistics of RTDOSE and RTSTRUCT
+    Computes cumulative dose volume histograms and dose statistics (mean,
+    maximum, D95) per ROI. Contours are rasterized on the dose grid and the
+    dose is interpolated between grid frames at contour positions; ROIs are
+    processed by a pool of worker processes when there are enough of them.
+    """
+
+    def __init__(self):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def workerCount(self):
+        """Number of worker processes (the same as for volume loading)
+        """
+        return processCount(ConfigDetails().dicomVolumeWorkers)
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def roiStatistics(self, doseFile, structureSet, roiNumbers=None):
+        """Dose statistics of ROIs
+
+        doseFile: RTDOSE file path
+        structureSet: DicomRtStructureSet with ROI contours
+        roiNumbers: ROIs to evaluate (None = all ROIs with contours)
+
+        return: list of statistics dictionaries (ordered by ROI number)
+        """
+        if roiNumbers is None:
+            roiNumbers = [n for n in structureSet.roiNumbers if structureSet.pointCount(n) > 0]
+
+        grid = readDoseGrid(doseFile)
+        tasks = [(n, structureSet.roiName(n), structureSet.contours(n)) for n in roiNumbers]
+
+        results = self._compute(tasks, grid)
+        for result in results:
+            if result["error"] is not None:
+                self._logger.error(result["error"])
+
+        return results
+
+    def seriesStatistics(self, doseSeries, structureSeries):
+        """Dose statistics of RTSTRUCT series ROIs for each RTDOSE file of series
+
+        return: list of (doseFile, statistics list) pairs
+        """
+        structureSet = structureSeries.structureSet
+        if structureSet is None:
+            return []
+
+        return [(f, self.roiStatistics(f, structureSet)) for f in doseSeries.files]
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _compute(self, tasks, grid):
+        """Compute ROI statistics (in worker processes when there are enough ROIs)
+        """
+        # Dose grid is passed to each worker only once
+        return list(imapTasks(
+            computeRoiStatistics, tasks, ConfigDetails().dicomVolumeWorkers, PARALLEL_DVH_MIN_ROIS,
+            self._logger, "dose statistics computation", 1, _initDoseGrid, (grid,),
+            lambda task: computeRoiStatistics(task, grid)
+        ))
@@ -0,0 +1,291 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import os
+import struct
+import hashlib
+
+# Logging
+import logging
+import logging.config
+
+# DICOM
+import dicom.filereader
+
+# Context
+from contexts.ConfigDetails import ConfigDetails
+
+# Duplicate policies
+DUPLICATE_KEEP_FIRST = "first"  # first scanned file of SOP instance is kept
+DUPLICATE_KEEP_NEWEST = "newest"  # file with the latest modification time is kept
+DUPLICATE_REPORT = "report"  # first scanned file is kept, duplicates have to be confirmed by user before upload
+DUPLICATE_POLICIES = (DUPLICATE_KEEP_FIRST, DUPLICATE_KEEP_NEWEST, DUPLICATE_REPORT)
+
+# Decisions about registered descriptor
+DUPLICATE_ACCEPT = 0  # new instance
+DUPLICATE_SKIP = 1  # duplicate which has to be ignored
+DUPLICATE_REPLACE = 2  # duplicate which replaces previously registered file
+
+# Size of blocks read when the content hash is calculated
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Values larger than this are skipped while the end of hashed content is searched
+HASH_DEFER_SIZE = 1024
+
+# Data Set Trailing Padding (not part of the hashed content)
+TRAILING_PADDING_TAG = 0xFFFCFFFC
+
+# Explicit VRs encoded with 2 reserved bytes and 4 byte length
+LONG_VRS = ("OB", "OW", "OF", "SQ", "UN", "UT")
+
+ ######  ######## ########  ##     ## ####  ######  ########
+##    ## ##       ##     ## ##     ##  ##  ##    ## ##
+##       ##       ##     ## ##     ##  ##  ##       ##
+ ######  ######   ########  ##     ##  ##  ##       ######
+      ## ##       ##   ##    ##   ##   ##  ##       ##
+##    ## ##       ##    ##    ## ##    ##  ##    ## ##
+ ######  ######## ##     ##    ###    ####  ######  ########
+
+
+class DicomDuplicateService:
+    """Detection of duplicated SOP instances
+    Source folders collected from several exports often contain the same SOP
+    instance more than once. Descriptors are registered in scanning order and
+    keyed by SOPInstanceUID; the configured policy decides which copy is kept.
+    Optionally a duplicate is confirmed by the content hash of both data sets
+    (preamble, file meta information and trailing padding are not compared).
+    Files with the same SOPInstanceUID but different content (or series) are
+    conflicts, only the first file is kept and the conflict is reported.
+    Duplicates never enter the anonymisation and upload, in report policy
+    they are listed for the user before upload.
+    """
+
+    def __init__(self):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+        self._policy = ConfigDetails().dicomDuplicatePolicy
+        if self._policy not in DUPLICATE_POLICIES:
+            self._logger.error("Unknown duplicate policy: " + str(self._policy) + ", using: " + DUPLICATE_KEEP_FIRST)
+            self._policy = DUPLICATE_KEEP_FIRST
+
+        self._contentCheck = ConfigDetails().dicomDuplicateContentCheck
+
+        self.reset()
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def policy(self):
+        """Duplicate policy (first, newest, report)
+        """
+        return self._policy
+
+    @property
+    def duplicates(self):
+        """Detected duplicates as (skipped file, kept file) pairs
+        """
+        return self._duplicates
+
+    @property
+    def skippedBytes(self):
+        """Size of skipped duplicate files in bytes
+        """
+        return self._skippedBytes
+
+    @property
+    def reportedDuplicates(self):
+        """Skipped duplicates the user has to be informed about before upload (report policy)
+        as (skipped file, kept file) pairs
+        """
+        if self._policy == DUPLICATE_REPORT:
+            return self._duplicates
+
+        return []
+
+    @property
+    def conflicts(self):
+        """Files with already registered SOPInstanceUID, but different content or series
+        as (skipped file, kept file) pairs
+        """
+        return self._conflicts
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def reset(self):
+        """Forget all registered SOP instances
+        """
+        self._instances = {}  # key = SOPInstanceUID, value = descriptor of kept file
+        self._hashes = {}  # key = file path, value = content hash
+        self._duplicates = []
+        self._skippedBytes = 0
+        self._conflicts = []
+
+    def register(self, descriptor):
+        """Register descriptor of scanned file
+
+        return: tuple (decision, previous descriptor) where previous descriptor
+        is the registered descriptor of the same SOP instance (None for new instance)
+        """
+        if "SOPInstanceUID" not in descriptor:
+            return DUPLICATE_ACCEPT, None
+
+        sopInstanceUid = descriptor["SOPInstanceUID"]
+        previous = self._instances.get(sopInstanceUid)
+        if previous is None:
+            self._instances[sopInstanceUid] = descriptor
+            return DUPLICATE_ACCEPT, None
+
+        # The same file listed twice is skipped without being reported
+        if os.path.normcase(os.path.abspath(previous["Filename"])) == os.path.normcase(os.path.abspath(descriptor["Filename"])):
+            return DUPLICATE_SKIP, previous
+
+        # Two different objects cannot be uploaded with one SOPInstanceUID, the first one is kept
+        if not self._isDuplicate(previous, descriptor):
+            self._conflicts.append((descriptor["Filename"], previous["Filename"]))
+            self._logger.warning(
+                "SOP instance " + sopInstanceUid + " in " + descriptor["Filename"] +
+                " differs from the same instance in " + previous["Filename"] + ", the file is skipped."
+            )
+            return DUPLICATE_SKIP, previous
+
+        if self._policy == DUPLICATE_REPORT:
+            self._logger.warning("Duplicated SOP instance " + sopInstanceUid + ": " + previous["Filename"] + ", " + descriptor["Filename"])
+
+        if self._policy == DUPLICATE_KEEP_NEWEST and self._modified(descriptor["Filename"]) > self._modified(previous["Filename"]):
+            self._skip(previous["Filename"], descriptor["Filename"])
+            self._instances[sopInstanceUid] = descriptor
+            return DUPLICATE_REPLACE, previous
+
+        self._skip(descriptor["Filename"], previous["Filename"])
+        return DUPLICATE_SKIP, previous
+
+    def logSummary(self):
+        """Log number and size of skipped duplicates
+        """
+        if self._duplicates:
+            self._logger.info(
+                "Skipped " + str(len(self._duplicates)) + " duplicated SOP instance file(s), " +
+                str(self._skippedBytes) + " bytes (policy: " + self._policy + ")."
+            )
+        if self._conflicts:
+            self._logger.warning("Skipped " + str(len(self._conflicts)) + " file(s) which share SOPInstanceUID with different content.")
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _isDuplicate(self, previous, descriptor):
+        """Check whether descriptors describe the same SOP instance
+        """
+        if previous.get("SeriesInstanceUID") != descriptor.get("SeriesInstanceUID"):
+            return False
+
+        if self._contentCheck:
+            try:
+                return self._hash(previous["Filename"]) == self._hash(descriptor["Filename"])
+            except Exception:
+                self._logger.exception("Cannot compare content of " + previous["Filename"] + " and " + descriptor["Filename"])
+                return False
+
+        return True
+
+    def _skip(self, skipped, kept):
+        """Record skipped duplicate file
+        """
+        self._duplicates.append((skipped, kept))
+        try:
+            self._skippedBytes += os.path.getsize(skipped)
+        except OSError:
+            pass
+
+        self._logger.debug("Skipping duplicated SOP instance file: " + skipped + " (kept: " + kept + ")")
+
+    def _hash(self, path):
+        """Content hash of data set (cached)
+        Copies from different exports differ in preamble, file meta information
+        or padding, so only the data set elements before trailing padding are hashed
+        """
+        if path not in self._hashes:
+            digest = hashlib.sha1()
+            with open(path, "rb") as f:
+                start = self._datasetOffset(f)
+
+                # Reading stops at the beginning of trailing padding (or at the end of file)
+                f.seek(0)
+                dicom.filereader.read_partial(f, self._atTrailingPadding, defer_size=HASH_DEFER_SIZE, force=True)
+                length = f.tell() - start
+
+                f.seek(start)
+                while length > 0:
+                    block = f.read(min(HASH_BLOCK_SIZE, length))
+                    if not block:
+                        break
+                    digest.update(block)
+                    length -= len(block)
+            self._hashes[path] = digest.hexdigest()
+
+        return self._hashes[path]
+
+    def _datasetOffset(self, f):
+        """Offset of the first data set element (after preamble and file meta information)
+        """
+        f.seek(0)
+        preamble = f.read(132)
+        if len(preamble) < 132 or preamble[128:] != "DICM":
+            return 0
+
+        # File meta information is always explicit VR little endian
+        offset = 132
+        while True:
+            f.seek(offset)
+            header = f.read(8)
+            if len(header) < 8:
+                return offset
+
+            group = struct.unpack("<H", header[:2])[0]
+            if group != 0x0002:
+                return offset
+
+            if header[4:6] in LONG_VRS:
+                offset += 12 + struct.unpack("<L", f.read(4))[0]
+            else:
+                offset += 8 + struct.unpack("<H", header[6:])[0]
+
+    def _atTrailingPadding(self, tag, VR, length):
+        """Stop reading of data set at trailing padding
+        """
+        return tag == TRAILING_PADDING_TAG
+
+    def _modified(self, path):
+        """Modification time of file (0 when it cannot be determined)
+        """
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
@@ -0,0 +1,272 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import os
+
+# Logging
+import logging
+import logging.config
+
+# DICOM
+import dicom
+from dicom.filereader import read_preamble, read_dataset
+
+# DICOM domain
+from dcm.DicomSeriesHeader import HEADER_KEYWORDS
+
+# Directory record types of the patient, study and series levels (all other records reference files)
+PATIENT_RECORD = "PATIENT"
+STUDY_RECORD = "STUDY"
+SERIES_RECORD = "SERIES"
+
+ ######  ######## ########  ##     ## ####  ######  ########
+##    ## ##       ##     ## ##     ##  ##  ##    ## ##
+##       ##       ##     ## ##     ##  ##  ##       ##
+ ######  ######   ########  ##     ##  ##  ##       ######
+      ## ##       ##   ##    ##   ##   ##  ##       ##
+##    ## ##       ##    ##    ## ##    ##  ##    ## ##
+ ######  ######## ##     ##    ###    ####  ######  ########
+
+
+class DicomMediaDirectoryService:
+    """DICOM media directory (DICOMDIR) reader
+    CD/DVD and PACS media exports describe their content in DICOMDIR directory
+    records (patient, study, series and instance level). Scan records for the
+    referenced files are built from these records, so that the DICOM tree can
+    be constructed without opening the files. Descriptors built this way only
+    hold the values carried by DICOMDIR and have to be completed by scanning
+    the files when the remaining values are needed.
+
+    path: DICOMDIR file
+    """
+
+    def __init__(self, path):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+        self._path = path
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def records(self, files, defaults):
+        """Build scan records of files referenced from DICOMDIR
+
+        files: list of file paths in the source directory (referenced files are matched against it)
+        defaults: replacement values for missing PatientName and PatientBirthDate
+        return: dictionary (key = file path, value = scan record)
+        """
+        try:
+            return self._records(files, defaults)
+        except Exception:
+            self._logger.exception("DICOMDIR cannot be read, referenced files will be scanned: " + self._path)
+            return {}
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _records(self, files, defaults):
+        """Build scan records of files referenced from DICOMDIR (see records)
+        """
+        result = {}
+        entries = self._readEntries()
+
+        # Media file IDs are usually upper case, match them case insensitive
+        knownFiles = {}
+        for f in files:
+            knownFiles[os.path.normcase(os.path.abspath(f)).lower()] = f
+
+        baseDirectory = os.path.dirname(os.path.abspath(self._path))
+        missing = 0
+
+        for patient, study, series, instance in entries:
+            fileId = instance.get("ReferencedFileID", None)
+            if fileId is None or fileId == "":
+                continue
+            if isinstance(fileId, basestring):
+                fileId = [fileId]
+
+            path = os.path.join(baseDirectory, *[str(component).strip() for component in fileId])
+            f = knownFiles.get(os.path.normcase(path).lower(), None)
+            if f is None:
+                missing += 1
+                continue
+
+            record = self._record(f, patient, study, series, instance, defaults)
+            if record is not None:
+                result[f] = record
+
+        if missing > 0:
+            self._logger.warning(str(missing) + " files referenced from DICOMDIR do not exist: " + self._path)
+
+        self._logger.info("DICOMDIR provides " + str(len(result)) + " of " + str(len(files)) + " files: " + self._path)
+
+        return result
+
+    def _readEntries(self):
+        """Read DICOMDIR and list its file referencing records
+
+        return: list of (patient, study, series, instance) directory record tuples
+        """
+        with open(self._path, "rb") as fp:
+            # DicomDir class of pydicom cannot link sibling records, so only the data set is read
+            read_preamble(fp, False)
+            # File meta information (group 0002) is always explicit VR little endian
+            fileMeta = read_dataset(fp, False, True, stop_when=lambda tag, VR, length: tag.group != 2)
+            isImplicitVR = fileMeta.get("TransferSyntaxUID", None) == dicom.UID.ImplicitVRLittleEndian
+            dataset = read_dataset(fp, isImplicitVR, True)
+
+            directoryRecords = list(dataset.DirectoryRecordSequence)
+
+        byOffset = {}
+        for directoryRecord in directoryRecords:
+            byOffset[directoryRecord.seq_item_tell] = directoryRecord
+
+        rootOffset = dataset.get("OffsetOfTheFirstDirectoryRecordOfTheRootDirectoryEntity", 0)
+        if rootOffset in byOffset:
+            entries = []
+            self._collectEntries(rootOffset, byOffset, (None, None, None), entries)
+            return entries
+        else:
+            # Offsets are not usable, rely on the order of records (parent records precede their children)
+            return self._orderedEntries(directoryRecords)
+
+    def _collectEntries(self, offset, byOffset, parents, entries):
+        """Walk the directory entity starting at offset and its lower level entities
+        """
+        visited = set()
+        while offset and offset in byOffset and offset not in visited:
+            visited.add(offset)
+            directoryRecord = byOffset[offset]
+
+            entityParents = self._parents(directoryRecord, parents)
+            if entityParents is None:
+                entries.append(parents + (directoryRecord,))
+            else:
+                lowerOffset = directoryRecord.get("OffsetOfReferencedLowerLevelDirectoryEntity", 0)
+                self._collectEntries(lowerOffset, byOffset, entityParents, entries)
+
+            offset = directoryRecord.get("OffsetOfTheNextDirectoryRecord", 0)
+
+    def _orderedEntries(self, directoryRecords):
+        """List file referencing records according to the order of records
+        """
+        entries = []
+        parents = (None, None, None)
+
+        for directoryRecord in directoryRecords:
+            entityParents = self._parents(directoryRecord, parents)
+            if entityParents is None:
+                entries.append(parents + (directoryRecord,))
+            else:
+                parents = entityParents
+
+        return entries
+
+    def _parents(self, directoryRecord, parents):
+        """Parents (patient, study, series) of lower level records of patient, study or series record
+
+        return: None for records which do not describe patient, study or series
+        """
+        recordType = str(directoryRecord.get("DirectoryRecordType", "")).strip().upper()
+
+        if recordType == PATIENT_RECORD:
+            return (directoryRecord, None, None)
+        elif recordType == STUDY_RECORD:
+            return (parents[0], directoryRecord, None)
+        elif recordType == SERIES_RECORD:
+            return (parents[0], parents[1], directoryRecord)
+        else:
+            return None
+
+    def _record(self, f, patient, study, series, instance, defaults):
+        """Build scan record of file from its DICOMDIR records
+
+        return: None when DICOMDIR does not identify the file (the file has to be scanned)
+        """
+        if patient is None or study is None or series is None:
+            return None
+
+        descriptor = {
+            "Filename": f
+        }
+
+        # Identifying values have to be provided by DICOMDIR
+        for key, directoryRecord, keyword in [
+            ("PatientID", patient, "PatientID"),
+            ("StudyInstanceUID", study, "StudyInstanceUID"),
+            ("SeriesInstanceUID", series, "SeriesInstanceUID"),
+            ("SOPInstanceUID", instance, "ReferencedSOPInstanceUIDInFile"),
+            ("Modality", series, "Modality")
+        ]:
+            value = directoryRecord.get(keyword, "")
+            if value == "":
+                return None
+            descriptor[key] = self._text(value)
+
+        descriptor["PatientName"] = self._text(patient.get("PatientName", defaults["PatientName"]))
+        descriptor["PatientBirthDate"] = self._text(patient.get("PatientBirthDate", defaults["PatientBirthDate"]))
+        descriptor["PatientSex"] = self._text(patient.get("PatientSex", "O"))
+        descriptor["PatientsAge"] = "OOOY"
+
+        studyDate = None
+        if "StudyDescription" in study:
+            descriptor["StudyDescription"] = self._text(study.StudyDescription)
+            if "StudyDate" in study:
+                studyDate = self._text(study.StudyDate)
+
+        if "InstanceNumber" in instance and instance.InstanceNumber != "":
+            descriptor["InstanceNumber"] = int(instance.InstanceNumber)
+        else:
+            descriptor["InstanceNumber"] = 0
+
+        # Series header from values carried by DICOMDIR (e.g. description, dates, RT labels)
+        header = {
+            "values": {},
+            "rois": [],
+            "observations": []
+        }
+        for keyword in HEADER_KEYWORDS:
+            for directoryRecord in [instance, series]:
+                if directoryRecord.get(keyword, "") != "":
+                    header["values"][keyword] = self._text(directoryRecord.data_element(keyword).value)
+                    break
+        header["values"]["StudyInstanceUID"] = descriptor["StudyInstanceUID"]
+        header["values"]["SOPInstanceUID"] = descriptor["SOPInstanceUID"]
+
+        return {
+            "descriptor": descriptor,
+            "studyDate": studyDate,
+            "rois": [],
+            "header": header,
+            "log": [(logging.DEBUG, "Reading DICOMDIR record: " + f)],
+            "errors": [],
+            "skipped": False
+        }
+
+    def _text(self, value):
+        """Convert DICOMDIR value to builtin string
+        """
+        if isinstance(value, unicode):
+            return unicode(value)
+        else:
+            return str(value)
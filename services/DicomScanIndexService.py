@@ -0,0 +1,261 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import os
+import time
+import sqlite3
+
+# Integrity
+import hashlib
+import hmac
+
+# Pickle
+import cPickle as pickle
+
+# Logging
+import logging
+import logging.config
+
+# Context
+from contexts.ConfigDetails import ConfigDetails
+
+# Services
+from services.CryptoService import CryptoService
+
+# Columns of the index table (tables of older versions are dropped)
+INDEX_COLUMNS = ["path", "size", "mtime", "signature", "stored", "record"]
+
+ ######  ######## ########  ##     ## ####  ######  ########
+##    ## ##       ##     ## ##     ##  ##  ##    ## ##
+##       ##       ##     ## ##     ##  ##  ##       ##
+ ######  ######   ########  ##     ##  ##  ##       ######
+      ## ##       ##   ##    ##   ##   ##  ##       ##
+##    ## ##       ##    ##    ## ##    ##  ##    ## ##
+ ######  ######## ##     ##    ###    ####  ######  ########
+
+
+class DicomScanIndexService:
+    """Persistent DICOM scan index
+    Stores scan records of DICOM files in SQLite database keyed by absolute
+    file path together with file size and modification time. Records of
+    files which were not changed since the last scan can be reused and only
+    new or changed files have to be parsed again.
+
+    Records contain patient identity, so they are encrypted with the client
+    key and protected with HMAC (tampered records are not unpickled). Records
+    older than the configured maximal age are purged.
+
+    fileName: SQLite database file
+    signature: scan options the records were created with (records with other signature are not reused)
+    """
+
+    def __init__(self, fileName, signature):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+        self._fileName = fileName
+        self._signature = signature
+        self._maxAge = ConfigDetails().dicomScanIndexMaxAge
+
+        self._connection = None
+        self._crypto = None
+
+        # File stats (size, mtime) collected during lookup
+        self._stats = {}
+        # Records waiting to be written into the index
+        self._pending = []
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def lookup(self, directory, files, prune=True):
+        """Find up to date scan records for files
+
+        Index entries of files which do not exist in the directory anymore are removed
+
+        directory: scanned source directory
+        files: list of file paths in the directory
+        prune: remove entries of other files in the directory (files have to list all directory files)
+        return: dictionary (key = file path, value = scan record)
+        """
+        result = {}
+
+        # Directory stat pass
+        self._stats = {}
+        for f in files:
+            try:
+                st = os.stat(f)
+                self._stats[f] = (os.path.abspath(f), st.st_size, st.st_mtime)
+            except OSError:
+                continue
+
+        try:
+            self._open()
+
+            prefix = os.path.join(os.path.abspath(directory), "")
+            rows = self._connection.execute(
+                "SELECT path, size, mtime, signature, record FROM scanindex WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix)
+            )
+
+            indexed = {}
+            for path, size, mtime, signature, record in rows:
+                indexed[path] = (size, mtime, signature, record)
+
+            for f in files:
+                if f not in self._stats:
+                    continue
+                path, size, mtime = self._stats[f]
+                if path in indexed:
+                    entry = indexed.pop(path)
+                    if entry[0] == size and entry[1] == mtime and entry[2] == self._signature:
+                        record = self._decodeRecord(entry[3])
+                        if record is None:
+                            continue
+                        if record["descriptor"] is not None:
+                            record["descriptor"]["Filename"] = f
+                        result[f] = record
+
+            # Remaining entries belong to files which were deleted
+            if prune and len(indexed) > 0:
+                self._connection.executemany(
+                    "DELETE FROM scanindex WHERE path = ?",
+                    [(path,) for path in indexed]
+                )
+                self._connection.commit()
+                self._logger.info("Removed " + str(len(indexed)) + " deleted files from DICOM scan index.")
+
+        except Exception:
+            self._logger.exception("DICOM scan index cannot be read, all files will be scanned.")
+            self._close()
+            result = {}
+
+        self._logger.info("DICOM scan index provides " + str(len(result)) + " of " + str(len(files)) + " files.")
+
+        return result
+
+    def store(self, f, record):
+        """Put scan record of file into the index
+
+        Records with parsing errors are not stored, so that such files are scanned again
+        (records of files skipped as not DICOM are stored)
+        """
+        if self._connection is None or f not in self._stats:
+            return
+        if not record["skipped"] and (record["descriptor"] is None or len(record["errors"]) > 0):
+            return
+
+        path, size, mtime = self._stats[f]
+        self._pending.append(
+            (path, size, mtime, self._signature, time.time(), self._encodeRecord(record))
+        )
+
+    def close(self):
+        """Write pending records into the index and close it
+        """
+        if self._connection is not None and len(self._pending) > 0:
+            try:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO scanindex (path, size, mtime, signature, stored, record) VALUES (?, ?, ?, ?, ?, ?)",
+                    self._pending
+                )
+                self._connection.commit()
+            except Exception:
+                self._logger.exception("DICOM scan index cannot be updated.")
+
+        self._pending = []
+        self._close()
+
+    def purge(self):
+        """Remove the index with all its records
+        """
+        self._pending = []
+        self._close()
+
+        if os.path.isfile(self._fileName):
+            try:
+                os.remove(self._fileName)
+                self._logger.info("DICOM scan index was purged: " + self._fileName)
+            except OSError:
+                self._logger.exception("DICOM scan index cannot be purged: " + self._fileName)
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _open(self):
+        """Open index database, make sure the index table exists and remove expired records
+        """
+        self._crypto = CryptoService()
+        if not self._crypto.keyExists():
+            raise ValueError("Encryption key of DICOM scan index is not available.")
+
+        self._connection = sqlite3.connect(self._fileName)
+
+        # Table of older version can contain plain records
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(scanindex)")]
+        if len(columns) > 0 and columns != INDEX_COLUMNS:
+            self._connection.execute("DROP TABLE scanindex")
+            self._connection.commit()
+            self._connection.execute("VACUUM")
+            self._logger.info("DICOM scan index of older version was purged.")
+
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS scanindex (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, signature TEXT, stored REAL, record TEXT)"
+        )
+        if self._maxAge > 0:
+            expired = self._connection.execute(
+                "DELETE FROM scanindex WHERE stored < ?",
+                (time.time() - self._maxAge * 24 * 3600,)
+            ).rowcount
+            if expired > 0:
+                self._logger.info("Removed " + str(expired) + " expired files from DICOM scan index.")
+        self._connection.commit()
+
+    def _close(self):
+        """Close index database
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _encodeRecord(self, record):
+        """Encrypt scan record and prepend its HMAC
+        """
+        encrypted = self._crypto.encrypt(pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+        return self._digest(encrypted) + ":" + encrypted
+
+    def _decodeRecord(self, value):
+        """Verify and decrypt scan record
+
+        return: scan record or None when record was modified outside of the client
+        """
+        digest, _, encrypted = str(value).partition(":")
+        if not hmac.compare_digest(digest, self._digest(encrypted)):
+            self._logger.warning("DICOM scan index record with invalid HMAC is ignored.")
+            return None
+
+        return pickle.loads(self._crypto.decrypt(encrypted))
+
+    def _digest(self, encrypted):
+        """HMAC of encrypted record keyed with the client key
+        """
+        return hmac.new(self._crypto.key, encrypted, hashlib.sha256).hexdigest()
@@ -0,0 +1,347 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import traceback
+
+from decimal import Decimal
+
+# Logging
+import logging
+import logging.config
+
+# DICOM
+import dicom
+
+# DICOM domain
+from dcm.DicomTagExtractor import DicomTagExtractor
+from dcm.DicomFileSniffer import DicomFileSniffer
+from dcm.DicomSeriesHeader import seriesHeaderRecord
+
+# Context
+from contexts.ConfigDetails import ConfigDetails
+
+# Worker processes
+from utils.WorkerPool import imapTasks, processCount
+
+# Below this number of files it is cheaper to scan serially than to start worker processes
+PARALLEL_SCAN_MIN_FILES = 50
+
+# Has to be increased whenever the content of scan records changes (invalidates persisted records)
+SCAN_RECORD_VERSION = 6
+
+# Tags collected in one traversal of scanned DICOM file (key, tag, parentSequenceTag, collectAll)
+SCAN_TAG_TARGETS = [
+    ("FrameOfReferenceUID", 0x00200052, None, False),
+    ("ReferencedSOPInstanceUID_RTSTRUCT", 0x00081155, 0x300C0060, False),  # in Referenced Structure Set Sequence
+    ("ReferencedSOPInstanceUID_RTPLAN", 0x00081155, 0x300C0002, False),  # in Referenced RT Plan Sequence
+    ("ContourImageSequence", 0x00081155, 0x30060016, True),  # in Contour Image Sequence
+    ("RadiationType", 0x300A00C6, None, False),
+    ("FrameOfReferenceTransformationType", 0x300600C4, 0x300600C0, False)  # in Frame of Reference Relationship Sequence
+]
+SCAN_TAG_EXTRACTOR = DicomTagExtractor(SCAN_TAG_TARGETS)
+
+# Image geometry collected in descriptors (used to validate slices of series without reading files again)
+SCAN_GEOMETRY_KEYS = ["Rows", "Columns", "PixelSpacing", "ImagePositionPatient", "ImageOrientationPatient"]
+
+# Attributes collected in descriptors to detect burned in annotations without reading files again
+SCAN_ANNOTATION_KEYS = ["BurnedInAnnotation", "SOPClassUID", "ImageType"]
+DICOM_FILE_SNIFFER = DicomFileSniffer()
+
+######## ##     ## ##    ##  ######  ######## ####  #######  ##    ##  ######
+##       ##     ## ###   ## ##    ##    ##     ##  ##     ## ###   ## ##    ##
+##       ##     ## ####  ## ##          ##     ##  ##     ## ####  ## ##
+######   ##     ## ## ## ## ##          ##     ##  ##     ## ## ## ##  ######
+##       ##     ## ##  #### ##          ##     ##  ##     ## ##  ####       ##
+##       ##     ## ##   ### ##    ##    ##     ##  ##     ## ##   ### ##    ##
+##        #######  ##    ##  ######     ##    ####  #######  ##    ##  ######
+
+
+def scanDicomFile(task):
+    """Read one DICOM file and build its compact descriptor record
+
+    task: tuple (path, headerOnly, deferSize, defaults, contentCheck) where defaults holds
+    the replacement values for missing PatientName and PatientBirthDate
+
+    return: dictionary with descriptor (plain values only), study date,
+    RTSTRUCT ROIs as (number, name) pairs, series header record (used when the
+    file is the first file of series), log messages as (level, text) pairs,
+    parsing errors and flag whether the file was skipped as not DICOM
+    """
+    path, headerOnly, deferSize, defaults, contentCheck = task
+
+    record = {
+        "descriptor": None,
+        "studyDate": None,
+        "rois": [],
+        "header": None,
+        "log": [],
+        "errors": [],
+        "skipped": False
+    }
+
+    # Reject files which do not look like DICOM before parsing
+    if contentCheck and not DICOM_FILE_SNIFFER.isDicom(path):
+        record["log"].append((logging.DEBUG, "Skipping non DICOM file: " + path))
+        record["skipped"] = True
+        return record
+
+    try:
+        if headerOnly:
+            dcmFile = dicom.read_file(path, defer_size=deferSize, stop_before_pixels=True, force=True)
+        else:
+            dcmFile = dicom.read_file(path, force=True)
+        record["log"].append((logging.DEBUG, "Reading DICOM file: " + path))
+
+        # Construct DICOM file descriptor
+        descriptor = {
+            "Filename": path
+        }
+        record["descriptor"] = descriptor
+
+        # PatientID
+        if "PatientID" in dcmFile:
+            descriptor["PatientID"] = _plainValue(dcmFile.PatientID)
+        else:
+            _reportError(record, "PatientID tag is missing in " + path + "!")
+
+        # StudyInstanceUID
+        if "StudyInstanceUID" in dcmFile:
+            descriptor["StudyInstanceUID"] = _plainValue(dcmFile.StudyInstanceUID)
+        else:
+            _reportError(record, "StudyInstanceUID tag is missing in " + path + "!")
+
+        # SeriesInstanceUID
+        if "SeriesInstanceUID" in dcmFile:
+            descriptor["SeriesInstanceUID"] = _plainValue(dcmFile.SeriesInstanceUID)
+        else:
+            _reportError(record, "SeriesInstanceUID tag is missing in " + path + "!")
+
+        # SOPInstanceUID
+        if "SOPInstanceUID" in dcmFile:
+            descriptor["SOPInstanceUID"] = _plainValue(dcmFile.SOPInstanceUID)
+        else:
+            _reportError(record, "SOPInstanceUID tag is missing in " + path + "!")
+
+        # PatientName in descriptor
+        if "PatientName" in dcmFile:
+            descriptor["PatientName"] = _plainValue(dcmFile.PatientName)
+        else:
+            record["log"].append((logging.INFO, "PatientName tag is missing in " + path + ". Replacing with default: " + defaults["PatientName"] + "."))
+            descriptor["PatientName"] = defaults["PatientName"]
+
+        # PatientBirthDate in descriptor
+        if "PatientBirthDate" in dcmFile:
+            descriptor["PatientBirthDate"] = _plainValue(dcmFile.PatientBirthDate)
+        else:
+            record["log"].append((logging.INFO, "PatientBirthDate tag is missing in " + path + ". Replacing with default: " + defaults["PatientBirthDate"] + "."))
+            descriptor["PatientBirthDate"] = defaults["PatientBirthDate"]
+
+        # PatientSex in descriptor
+        if "PatientSex" in dcmFile:
+            descriptor["PatientSex"] = _plainValue(dcmFile.PatientSex)
+        else:
+            record["log"].append((logging.INFO, "PatientSex tag is missing in " + path + ". Replacing with default: O."))
+            descriptor["PatientSex"] = "O"  # Other, if not present
+
+        # Save StudyDescription in descriptor
+        if "StudyDescription" in dcmFile:
+            descriptor["StudyDescription"] = _plainValue(dcmFile.StudyDescription)
+            if "StudyDate" in dcmFile:
+                record["studyDate"] = _plainValue(dcmFile.StudyDate)
+
+        # Save IntanceNumber in descriptor
+        if "InstanceNumber" in dcmFile:
+            descriptor["InstanceNumber"] = _plainValue(dcmFile.InstanceNumber)
+        else:
+            descriptor["InstanceNumber"] = 0
+
+        # Save PatientsAge in descriptor
+        if "PatientsAge" in dcmFile:
+            descriptor["PatientsAge"] = _plainValue(dcmFile.PatientsAge)
+        else:
+            descriptor["PatientsAge"] = "OOOY"
+
+        # Image geometry
+        for key in SCAN_GEOMETRY_KEYS:
+            if key in dcmFile:
+                descriptor[key] = _plainValue(dcmFile.data_element(key).value)
+
+        # Burned in annotation hints
+        for key in SCAN_ANNOTATION_KEYS:
+            if key in dcmFile:
+                descriptor[key] = _plainValue(dcmFile.data_element(key).value)
+
+        # Frame of reference and referenced objects (single pass over the dataset)
+        extractDescriptorTags(dcmFile, descriptor)
+
+        # Series header (description, dates, ROIs) so that series do not read their first file again
+        record["header"] = seriesHeaderRecord(dcmFile)
+
+        # According to modality save
+        if "Modality" in dcmFile:
+            descriptor["Modality"] = _plainValue(dcmFile.Modality)
+
+            # For RTPLAN
+            if dcmFile.Modality == "RTPLAN":
+
+                # Save RTPlanLabel in descriptor
+                if "RTPlanLabel" in dcmFile:
+                    descriptor["RTPlanLabel"] = _plainValue(dcmFile.RTPlanLabel)
+
+                # Save BeamNumbers
+                if "Beams" in dcmFile:
+                    descriptor["BeamNumbers"] = len(dcmFile.Beams)
+
+            # Save DoseSummationType for RTDOSE
+            elif dcmFile.Modality == "RTDOSE" and \
+                "DoseSummationType" in dcmFile:
+                descriptor["DoseSummationType"] = _plainValue(dcmFile.DoseSummationType)
+
+            # For RTSTRUCT prepare ROIs
+            elif dcmFile.Modality == "RTSTRUCT":
+                if "StructureSetROISequence" in dcmFile:
+                    for subElem in dcmFile.StructureSetROISequence:
+                        record["rois"].append((_plainValue(subElem.ROINumber), _plainValue(subElem.ROIName)))
+
+    except Exception:
+        msg = "Unexpected error during DICOM data parsing:" + path + "!"
+        record["log"].append((logging.ERROR, msg + "\n" + traceback.format_exc()))
+        record["errors"].append(msg)
+
+    return record
+
+
+def extractDescriptorTags(dcmFile, descriptor):
+    """Put frame of reference and referenced objects of DICOM file into descriptor
+    """
+    values = SCAN_TAG_EXTRACTOR.extract(dcmFile)
+
+    # Save FrameOfReferenceUID in descriptor
+    if values.get("FrameOfReferenceUID", "") != "":
+        descriptor["FrameOfReferenceUID"] = _plainValue(values["FrameOfReferenceUID"])
+
+    # Save ReferencedSOPInstanceUID_RTSTRUCT in descriptor
+    if values.get("ReferencedSOPInstanceUID_RTSTRUCT", "") != "":
+        descriptor["ReferencedSOPInstanceUID_RTSTRUCT"] = _plainValue(values["ReferencedSOPInstanceUID_RTSTRUCT"])
+
+    # Save ReferencedSOPInstanceUID_RTPLAN in descriptor
+    if values.get("ReferencedSOPInstanceUID_RTPLAN", "") != "":
+        descriptor["ReferencedSOPInstanceUID_RTPLAN"] = _plainValue(values["ReferencedSOPInstanceUID_RTPLAN"])
+
+    # Save Countour Image Sequence
+    if values["ContourImageSequence"] != []:
+        descriptor["ContourImageSequence"] = list(set(_plainValue(values["ContourImageSequence"])))
+
+    if "Modality" in dcmFile:
+        # Save RadiationType for RTPLAN
+        if dcmFile.Modality == "RTPLAN":
+            if values.get("RadiationType", "") != "":
+                descriptor["RadiationType"] = _plainValue(values["RadiationType"])
+
+        # Oncentra MasterPlan case exports RTSTRUCT with this point we should store this info
+        elif dcmFile.Modality == "RTSTRUCT":
+            if "FrameOfReferenceTransformationType" in values:
+                descriptor["TreatmentPlanningReferencePoint"] = "Yes"
+
+
+def _reportError(record, msg):
+    """Register parsing error in scan record
+    """
+    record["log"].append((logging.ERROR, msg))
+    record["errors"].append(msg)
+
+
+def _plainValue(value):
+    """Convert pydicom value to builtin type so that the record stays small when it is pickled
+    """
+    if isinstance(value, unicode):
+        return unicode(value)
+    elif isinstance(value, str):
+        # str() of pydicom UID gives the UID name for well known UIDs (SOP classes)
+        return str.__str__(value)
+    elif isinstance(value, (int, long)):
+        return int(value)
+    elif isinstance(value, (float, Decimal)):
+        return float(value)
+    elif hasattr(value, "__iter__"):
+        return [_plainValue(v) for v in value]
+    else:
+        return value
+
+
+ ######  ######## ########  ##     ## ####  ######  ########
+##    ## ##       ##     ## ##     ##  ##  ##    ## ##
+##       ##       ##     ## ##     ##  ##  ##       ##
+ ######  ######   ########  ##     ##  ##  ##       ######
+      ## ##       ##   ##    ##   ##   ##  ##       ##
+##    ## ##       ##    ##    ## ##    ##  ##    ## ##
+ ######  ######## ##     ##    ###    ####  ######  ########
+
+
+class DicomScanService:
+    """DICOM scan engine
+    Builds descriptor records for DICOM files. When there are enough files
+    to scan the work is split across a pool of worker processes, otherwise
+    (or when the pool cannot be used) the files are scanned serially.
+    Records are always provided in the same order as the input files.
+    """
+
+    def __init__(self):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+        # Metadata only scanning (stop before pixel data and defer reading of large elements)
+        self._headerOnly = ConfigDetails().dicomHeaderOnlyScan
+        self._deferSize = ConfigDetails().dicomScanDeferSize
+
+        # Check file content before parsing
+        self._contentCheck = ConfigDetails().dicomScanContentCheck
+
+        # Number of worker processes (0 = number of CPU cores, 1 = serial scanning)
+        self._workers = ConfigDetails().dicomScanWorkers
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def workerCount(self):
+        """Number of worker processes used for scanning
+        """
+        return processCount(self._workers)
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def signature(self, defaults):
+        """Identify the options which influence the content of scan records
+        """
+        return str(SCAN_RECORD_VERSION) + ":" + str(self._contentCheck) + ":" + repr(sorted(defaults.items()))
+
+    def scan(self, files, defaults):
+        """Generator of scan records for provided files (in the same order)
+
+        files: list of DICOM file paths
+        defaults: replacement values for missing PatientName and PatientBirthDate
+        """
+        tasks = [(f, self._headerOnly, self._deferSize, defaults, self._contentCheck) for f in files]
+
+        return imapTasks(scanDicomFile, tasks, self._workers, PARALLEL_SCAN_MIN_FILES, self._logger, "DICOM scanning")
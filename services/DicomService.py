@@ -23,6 +23,10 @@ from PyQt4 import QtCore
 from services.AnonymisationService import AnonymisationService
 # from services.DeanonymisationService import DeanonymisationService
 from services.DicomDirectoryService import DicomDirectoryService
+from services.DicomDoseService import DicomDoseService
+
+# DICOM domain
+from dcm.DicomReferenceGraph import CONTOUR_IMAGE, STRUCTURE_SET, RT_PLAN
 
 # GUI Messages
 import gui.messages
@@ -85,6 +89,13 @@ class DicomService(object):
         """
         return self.dicomData.dataRoot
 
+    @property
+    def referenceGraph(self):
+        """References between SOP instances of selected DICOM data Getter
+        (e.g. to report which referenced objects are missing)
+        """
+        return self.dicomData.referenceGraph
+
     @property
     def hasOnePatient(self):
         """Patient number validation Getter
@@ -217,6 +228,8 @@ class DicomService(object):
         result = self.dicomData.setup(thread)
 
         # Finished
+        if self.dicomData.isCancelled:
+            thread.emit(QtCore.SIGNAL("log(QString)"), gui.messages.LOG_DICOM_SCAN_CANCELLED)
         thread.emit(QtCore.SIGNAL("log(QString)"), gui.messages.LOG_DICOM_DATA)
 
         if result:
@@ -226,6 +239,12 @@ class DicomService(object):
             thread.emit(QtCore.SIGNAL("finished(QString)"), "False")
         return None
 
+    def cancelDicomDataPreparation(self):
+        """Stop scanning of DICOM data folder, already scanned data are kept
+        """
+        if self.dicomData is not None:
+            self.dicomData.cancel()
+
     def analyseDicomStudyType(self, data, thread):
         """Basic analysis about conformity of provided DICOM data
 
@@ -258,6 +277,10 @@ class DicomService(object):
                 thread.emit(QtCore.SIGNAL("message(QString)"), errorMessage)
                 return False
 
+            # Dose statistics are informative only, they do not block the upload
+            if ConfigDetails().dicomDoseStatistics:
+                self.checkDoseStatistics(thread)
+
         # Inform about the DICOM study type
         thread.emit(QtCore.SIGNAL("finished(QString)"), self._dicomStudyType)
         return None
@@ -318,18 +341,24 @@ class DicomService(object):
            "RTPLAN" in modalities and \
            "RTDOSE" in modalities:
 
-            ct_dicomData = self.dicomData.belongingTo("Modality", "CT")
-            li_SOPInstanceUID_CT = []
-            for elem in ct_dicomData:
-                li_SOPInstanceUID_CT.append(elem["SOPInstanceUID"])
+            graph = self.dicomData.referenceGraph
+
+            # Report objects which are referenced but not provided
+            for sopInstanceUid, modality, referenceType, missingUid in graph.missingReferences():
+                thread.emit(
+                    QtCore.SIGNAL("log(QString)"),
+                    modality + " " + sopInstanceUid + " is referencing missing object (" + referenceType + "): " + missingUid
+                )
 
             # Check how many RTSTRUCT is in the folder
-            rtstruct_dicomData = self.dicomData.belongingTo("Modality", "RTSTRUCT")
-            if len(rtstruct_dicomData) > 1:
+            rtstructUids = graph.instances("RTSTRUCT")
+            if len(rtstructUids) > 1:
                 thread.emit(QtCore.SIGNAL("message(QString)"), gui.messages.ERR_MULTIPLE_RTSTRUCT)
                 return False
 
-            rtstruct_dicomData = rtstruct_dicomData[0]
+            # SOP instance UID of RTSTRUCT
+            rtstruct_SOPInstanceUID = rtstructUids.pop()
+            rtstruct_dicomData = self.dicomData.belongingTo("SOPInstanceUID", rtstruct_SOPInstanceUID)[0]
 
             if "FrameOfReferenceUID" not in rtstruct_dicomData:
                 msg = "Structure set is not defined on top of CT data. "
@@ -338,70 +367,35 @@ class DicomService(object):
                 return False
 
             # Check whether all CT images to where RTSTRUCT refers are provided
-            missingCT = False
-            missingCT_UID = []
-            for elem in rtstruct_dicomData["ContourImageSequence"]:
-                if elem not in li_SOPInstanceUID_CT:
-                    missingCT = True
-                    missingCT_UID.append(elem)
-            if missingCT:
+            missingCT_UID = graph.references(rtstruct_SOPInstanceUID, CONTOUR_IMAGE) - graph.instances("CT")
+            if missingCT_UID:
                 msg = "Structure set (RTSTRUCT) is referencing CT images which are not within the provided data set: "
-                msg += str(missingCT_UID)
+                msg += str(sorted(missingCT_UID))
                 thread.emit(QtCore.SIGNAL("message(QString)"), msg)
                 return False
 
-            rtplan_dicomData = self.dicomData.belongingTo("Modality", "RTPLAN")
-
-            # SOP instance UID of RTSTRUCT
-            rtstruct_SOPInstanceUID = rtstruct_dicomData["SOPInstanceUID"]
-            
             # Collect SOP instance UID from RTPLAN (one or more)
-            rtplan_SOPInstanceUID = []
-            # Each plan sould refer max 1 RTSTRUCT
-            planRefStructUID = []
-
-            for elem in rtplan_dicomData:
-                rtplan_SOPInstanceUID.append(elem["SOPInstanceUID"])
-                planRefStructUID.append(elem["ReferencedSOPInstanceUID_RTSTRUCT"])
-            
-            # Collect SOP instance UID from RTDOSE referencing to RTPLAN
-            # Collect SOP instance UID from RTDOSE referencing to RTSTRUCT
-            rtdose_dicomData = self.dicomData.belongingTo("Modality", "RTDOSE")
-            self._doseCount = len(rtdose_dicomData)
-
-            doseRefPlanUID = []
-            doseRefStructUID = []
-            for elem in rtdose_dicomData:
-                doseRefPlanUID.append(elem["ReferencedSOPInstanceUID_RTPLAN"])
-                # Is not mandatory so it does not have to be there
-                if "ReferencedSOPInstanceUID_RTSTRUCT" in elem:
-                    doseRefStructUID.append(elem["ReferencedSOPInstanceUID_RTSTRUCT"])
-            
-            # Remove duplicate values
-            doseRefStructUID = list(set(doseRefStructUID))
-            doseRefPlanUID = list(set(doseRefPlanUID))
+            rtplan_SOPInstanceUID = graph.instances("RTPLAN")
 
             # Check whether the all RTPLANs referenced from RTDOSEs exists
-            for refRtPlanUID in doseRefPlanUID:
-                if refRtPlanUID not in rtplan_SOPInstanceUID:
-                    msg = "One of RTDOSE is referencing to unknown RTPLAN. "
-                    msg += "Upload of inconsistent treatment plan is not possible!"
-                    thread.emit(QtCore.SIGNAL("message(QString)"), msg)
-                    return False            
+            missingPlanUID = graph.referencesOf("RTDOSE", RT_PLAN) - rtplan_SOPInstanceUID
+            if missingPlanUID:
+                msg = "One of RTDOSE is referencing to unknown RTPLAN: " + str(sorted(missingPlanUID)) + ". "
+                msg += "Upload of inconsistent treatment plan is not possible!"
+                thread.emit(QtCore.SIGNAL("message(QString)"), msg)
+                return False
 
             # Check whether the RTSTRUCT referenced from RTDOSEs exists
-            for refRtStructUID in doseRefStructUID:
-                if refRtStructUID != rtstruct_SOPInstanceUID:
-                    msg = "One of RTDOSE is referencing to unknown RTSTRUCT. "
-                    msg += "Upload of inconsistent treatment plan is not possible!"
-                    thread.emit(QtCore.SIGNAL("message(QString)"), msg)
-                    return False
+            unknownStructUID = graph.referencesOf("RTDOSE", STRUCTURE_SET) - set([rtstruct_SOPInstanceUID])
+            if unknownStructUID:
+                msg = "One of RTDOSE is referencing to unknown RTSTRUCT: " + str(sorted(unknownStructUID)) + ". "
+                msg += "Upload of inconsistent treatment plan is not possible!"
+                thread.emit(QtCore.SIGNAL("message(QString)"), msg)
+                return False
 
             # How many RTPLAN and RTDOSE SOP instances have been detected
-            if rtplan_dicomData is not None:
-                self._planCount = len(rtplan_dicomData)
-            if rtdose_dicomData is not None:
-                self._doseCount = len(rtdose_dicomData)
+            self._planCount = len(rtplan_SOPInstanceUID)
+            self._doseCount = len(graph.instances("RTDOSE"))
 
             # RTDOSE DoseSummationType should be uniform accross treatment planning data
             self._summNumberOfBeams = 0
@@ -409,16 +403,17 @@ class DicomService(object):
                 self._doseSumType = self.dicomData.unique("DoseSummationType")[0]
 
                 if self._doseSumType == "BEAM":
-                    for i in xrange(self._planCount):
+                    for planUid in rtplan_SOPInstanceUID:
                         # Summ number of beams from each plan
-                        if "BeamNumbers" in rtplan_dicomData[i]:
-                            self._summNumberOfBeams += rtplan_dicomData[i]["BeamNumbers"]
+                        planDescriptor = self.dicomData.belongingTo("SOPInstanceUID", planUid)[0]
+                        if "BeamNumbers" in planDescriptor:
+                            self._summNumberOfBeams += planDescriptor["BeamNumbers"]
 
             # Check whether the RTSTRUCT is referenced from all RTPLANs
             if not ConfigDetails().autoRTStructRef:
-                for refRtStructUID in planRefStructUID:
-                    if refRtStructUID != rtstruct_SOPInstanceUID:
-                        msg = "One of RTPLAN is referencing to unknown RTSTRUCT. "
+                for planUid in sorted(rtplan_SOPInstanceUID):
+                    if graph.references(planUid, STRUCTURE_SET) != set([rtstruct_SOPInstanceUID]):
+                        msg = "RTPLAN " + planUid + " is referencing to unknown RTSTRUCT. "
                         msg += "Upload of inconsistent treatment plan is not possible!"
                         thread.emit(QtCore.SIGNAL("message(QString)"), msg)
                         return False
@@ -440,6 +435,48 @@ class DicomService(object):
             
             return False
 
+    def checkDoseStatistics(self, thread=None):
+        """Log dose statistics (volume, mean, max, D95) of ROIs for each checked RTDOSE
+
+        Only applicable if study is treatment plan with one RTSTRUCT
+        """
+        structureSeries = []
+        doseSeries = []
+        for study in self.dicomData.dataRoot.children:
+            for serie in study.children:
+                if serie.isChecked and serie.modality == "RTSTRUCT":
+                    structureSeries.append(serie)
+                elif serie.isChecked and serie.modality == "RTDOSE":
+                    doseSeries.append(serie)
+
+        if len(structureSeries) != 1 or not doseSeries:
+            return
+
+        if thread:
+            thread.emit(QtCore.SIGNAL("log(QString)"), "Computing dose statistics of ROIs...")
+
+        service = DicomDoseService()
+        for serie in doseSeries:
+            try:
+                statistics = service.seriesStatistics(serie, structureSeries[0])
+            except Exception:
+                self._logger.exception("Cannot compute dose statistics of RTDOSE series " + str(serie.suid))
+                continue
+
+            for doseFile, results in statistics:
+                self._logDoseStatistics("RTDOSE " + os.path.basename(doseFile) + ":", thread)
+                for result in results:
+                    if result["meanDose"] is None:
+                        continue
+                    msg = "%s: volume %.2f cc, mean %.2f Gy, max %.2f Gy, D95 %.2f Gy" % (
+                        result["roiName"],
+                        result["volume"],
+                        result["meanDose"],
+                        result["maxDose"],
+                        result["d95"]
+                    )
+                    self._logDoseStatistics(msg, thread)
+
     def anonymiseDicomData(self, data, thread=None):
         """Anonymise DICOM data, use new Patient ID and DICOM ROI mapping
 
@@ -464,12 +501,19 @@ class DicomService(object):
         thread.emit(QtCore.SIGNAL("taskUpdated"), 0)
 
         self.StudyUID = svcAnonymise.StudyInstanceUID
-        if not self.StudyUID:
+        if not self.StudyUID or svcAnonymise.errors:
             shutil.rmtree(self.directory_tmp)
             thread.emit(QtCore.SIGNAL('message(QString)'), svcAnonymise.errorMessage)
             thread.emit(QtCore.SIGNAL('finished(QString)'), 'False')
             return None
 
+        # UID map of upload is kept for audit
+        if ConfigDetails().anonymisationUidMapDir:
+            try:
+                svcAnonymise.saveUidMap(os.path.join(ConfigDetails().anonymisationUidMapDir, self.StudyUID + ".uidmap"))
+            except (IOError, OSError):
+                self._logger.exception("Cannot save UID map of anonymised study: " + self.StudyUID)
+
         thread.emit(QtCore.SIGNAL('finished(QString)'), 'True')
 
     def uploadDicomData(self, data, thread):
@@ -637,3 +681,18 @@ class DicomService(object):
         thread.emit(QtCore.SIGNAL('message(QString)'), "Download job was successful.")
 
         return True
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _logDoseStatistics(self, msg, thread=None):
+        """Log dose statistics message (also shown in GUI when running in working thread)
+        """
+        self._logger.info(msg)
+        if thread:
+            thread.emit(QtCore.SIGNAL("log(QString)"), msg)
@@ -0,0 +1,396 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import hashlib
+import os
+import threading
+
+from collections import OrderedDict
+
+# Logging
+import logging
+import logging.config
+
+# Numpy
+import numpy as np
+
+# Singleton
+from utils.SingletonType import SingletonType
+
+# DICOM domain
+from dcm.DicomVolume import DicomVolume
+
+# Services
+from services.DicomVolumeService import DicomVolumeService
+
+# Context
+from contexts.ConfigDetails import ConfigDetails
+
+ ######  ######## ########  ##     ## ####  ######  ########
+##    ## ##       ##     ## ##     ##  ##  ##    ## ##
+##       ##       ##     ## ##     ##  ##  ##       ##
+ ######  ######   ########  ##     ##  ##  ##       ######
+      ## ##       ##   ##    ##   ##   ##  ##       ##
+##    ## ##       ##    ##    ## ##    ##  ##    ## ##
+ ######  ######## ##     ##    ###    ####  ######  ########
+
+
+class DicomVolumeCacheService(object):
+    """Process wide cache of decoded DICOM volumes
+    Volumes are keyed by SeriesInstanceUID and hash of the series file list.
+    Decoded volumes are memory mapped files, the budget limits the bytes of
+    volumes kept mapped (resident pages are managed by the operating system).
+    When the budget is exceeded the least recently used volumes are unmapped,
+    optionally their files are kept (spill tier with its own budget) and
+    mapped again on the next request.
+
+    Volumes provided by the cache are pinned: they are not evicted or closed
+    until the caller returns them with unpin(). They must not be closed by the caller.
+    """
+
+    __metaclass__ = SingletonType
+
+    def __init__(self):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+        # Cache can be used from several worker threads
+        self._lock = threading.RLock()
+
+        # Least recently used first (key = (SeriesInstanceUID, files hash))
+        self._volumes = OrderedDict()
+        self._spilled = OrderedDict()
+
+        # Number of pins of volumes in use (key = id of volume)
+        self._pins = {}
+        # Volumes released from cache while pinned, closed when unpinned (key = id of volume)
+        self._retired = {}
+        # Volume files which could not be removed yet (still mapped by a caller on Windows)
+        self._orphans = []
+        # Volumes pinned for series by seriesArray until releaseSeries (key = SeriesInstanceUID)
+        self._seriesVolumes = {}
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._spills = 0
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def size(self):
+        """Bytes of volumes kept mapped
+        """
+        with self._lock:
+            return sum(v.nbytes for v in self._volumes.itervalues())
+
+    @property
+    def spillSize(self):
+        """Bytes of unmapped volume files kept on disk
+        """
+        with self._lock:
+            return sum(e["nbytes"] for e in self._spilled.itervalues())
+
+    @property
+    def statistics(self):
+        """Cache counters (hits, misses, evictions, spills)
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "spills": self._spills
+            }
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def volume(self, suid, files):
+        """Decoded volume of series (loaded when it is not cached)
+        The volume is pinned, the caller has to unpin it when it is not used anymore
+
+        suid: SeriesInstanceUID
+        files: DICOM files of the series
+        """
+        key = (suid, self._filesHash(files))
+
+        with self._lock:
+            if key in self._volumes:
+                volume = self._volumes.pop(key)
+                self._volumes[key] = volume
+                self._hits += 1
+                self._logger.debug("DICOM volume cache hit: " + suid)
+                return self._pin(volume)
+
+            if key in self._spilled:
+                volume = self._restore(self._spilled.pop(key))
+                if volume is not None:
+                    self._hits += 1
+                    self._logger.debug("DICOM volume cache hit (spilled): " + suid)
+                    self._pin(volume)
+                    self._store(key, volume)
+                    return volume
+
+            self._misses += 1
+
+        # Decoding is not blocking other cache users
+        volume = DicomVolumeService().load(files)
+
+        with self._lock:
+            if key in self._volumes:
+                # Loaded by another thread in the meantime
+                self._removeFile(volume.unmap())
+                return self._pin(self._volumes[key])
+
+            self._pin(volume)
+            self._store(key, volume)
+            self._logStatistics()
+
+        return volume
+
+    def seriesArray(self, serie):
+        """Pixel data of DicomSeries as numpy array (memory mapped)
+
+        Slices are sorted along the slice normal and the array is 3D (nz, ny, nx),
+        RescaleSlope and RescaleIntercept are applied. Shape and sampling of the
+        series are set. The series keeps one pin of its volume, so the array
+        stays valid until releaseSeries is called.
+        """
+        if len(serie.files) == 0:
+            raise ValueError("Serie does not contain any files.")
+
+        volume = self.volume(serie.suid, serie.files)
+
+        with self._lock:
+            previous = self._seriesVolumes.get(serie.suid)
+            self._seriesVolumes[serie.suid] = volume
+        if previous is not None:
+            self.unpin(previous)
+
+        serie.shape = volume.shape
+        serie.sampling = volume.sampling
+
+        return volume.array
+
+    def releaseSeries(self, serie):
+        """Unpin volume of DicomSeries and remove it from the cache
+        """
+        with self._lock:
+            volume = self._seriesVolumes.pop(serie.suid, None)
+        if volume is not None:
+            self.unpin(volume)
+
+        self.release(serie.suid, serie.files)
+
+    def unpin(self, volume):
+        """Volume provided by the cache is not used by the caller anymore
+        """
+        with self._lock:
+            pins = self._pins.get(id(volume), 0) - 1
+            if pins > 0:
+                self._pins[id(volume)] = pins
+                return
+
+            self._pins.pop(id(volume), None)
+
+            if id(volume) in self._retired:
+                del self._retired[id(volume)]
+                self._removeFile(volume.unmap())
+            else:
+                # Volumes kept over budget because they were in use
+                self._evictOverBudget()
+
+    def contains(self, suid, files):
+        """Volume of series is cached (mapped or spilled)
+        """
+        key = (suid, self._filesHash(files))
+        with self._lock:
+            return key in self._volumes or key in self._spilled
+
+    def release(self, suid, files):
+        """Remove volume of series from the cache (pinned volume is closed when it is unpinned)
+        """
+        key = (suid, self._filesHash(files))
+        with self._lock:
+            if key in self._volumes:
+                self._discard(self._volumes.pop(key))
+            if key in self._spilled:
+                self._removeFile(self._spilled.pop(key)["path"])
+
+    def clear(self):
+        """Remove all volumes from the cache (pinned volumes are closed when they are unpinned)
+        """
+        with self._lock:
+            while self._volumes:
+                self._discard(self._volumes.popitem(last=False)[1])
+            while self._spilled:
+                self._removeFile(self._spilled.popitem(last=False)[1]["path"])
+            self._removeOrphans()
+
+    def logStatistics(self):
+        """Log cache counters and sizes
+        """
+        with self._lock:
+            self._logStatistics()
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _pin(self, volume):
+        """Mark volume as used by a caller
+        """
+        self._pins[id(volume)] = self._pins.get(id(volume), 0) + 1
+        return volume
+
+    def _isPinned(self, volume):
+        """Volume is used by a caller
+        """
+        return id(volume) in self._pins
+
+    def _store(self, key, volume):
+        """Put volume to mapped tier and evict least recently used volumes over budget
+        """
+        self._volumes[key] = volume
+        self._removeOrphans()
+        self._evictOverBudget()
+
+    def _evictOverBudget(self):
+        """Unmap least recently used volumes which are not in use until the budget is met
+        The most recent volume stays even when it alone exceeds the budget
+        """
+        budget = ConfigDetails().dicomVolumeCacheSize * 1024 * 1024
+        size = sum(v.nbytes for v in self._volumes.itervalues())
+
+        for key in self._volumes.keys()[:-1]:
+            if size <= budget:
+                break
+
+            volume = self._volumes[key]
+            if self._isPinned(volume):
+                continue
+
+            del self._volumes[key]
+            size -= volume.nbytes
+            self._evictions += 1
+
+            if ConfigDetails().dicomVolumeCacheSpill:
+                self._spill(key, volume)
+            else:
+                self._removeFile(volume.unmap())
+
+            self._logger.info("DICOM volume evicted from cache: " + key[0])
+            self._logStatistics()
+
+    def _spill(self, key, volume):
+        """Keep file of evicted volume in spill tier (it is mapped again when requested)
+        """
+        entry = {
+            "path": volume.path,
+            "dtype": volume.array.dtype.str,
+            "shape": volume.shape,
+            "sampling": volume.sampling,
+            "files": volume.files,
+            "nbytes": volume.nbytes
+        }
+        volume.unmap()
+
+        # Volume held in memory has no file to keep
+        if entry["path"] is None:
+            return
+
+        self._spilled[key] = entry
+        self._spills += 1
+
+        # Spill tier has its own budget
+        budget = ConfigDetails().dicomVolumeCacheSpillSize * 1024 * 1024
+        size = sum(e["nbytes"] for e in self._spilled.itervalues())
+        while size > budget and self._spilled:
+            entry = self._spilled.popitem(last=False)[1]
+            size -= entry["nbytes"]
+            self._removeFile(entry["path"])
+
+    def _restore(self, entry):
+        """Map file of spilled volume again (it stays the backing file of volume)
+        """
+        try:
+            array = np.memmap(entry["path"], dtype=np.dtype(entry["dtype"]), mode="r", shape=entry["shape"])
+        except Exception:
+            self._logger.exception("Spilled DICOM volume cannot be restored: " + entry["path"])
+            self._removeFile(entry["path"])
+            return None
+
+        return DicomVolume(array, entry["sampling"], entry["files"], entry["path"])
+
+    def _discard(self, volume):
+        """Close volume removed from the cache (pinned volume is closed when it is unpinned)
+        """
+        if self._isPinned(volume):
+            self._retired[id(volume)] = volume
+        else:
+            self._removeFile(volume.unmap())
+
+    def _removeFile(self, path):
+        """Remove volume file, a file still mapped by a caller is removed later
+        """
+        if path is None:
+            return
+
+        try:
+            os.remove(path)
+        except OSError:
+            if os.path.exists(path):
+                self._logger.debug("Volume file is still in use, it will be removed later: " + path)
+                self._orphans.append(path)
+
+    def _removeOrphans(self):
+        """Retry removing of volume files which were in use
+        """
+        orphans = self._orphans
+        self._orphans = []
+        for path in orphans:
+            self._removeFile(path)
+
+    def _filesHash(self, files):
+        """Hash of series file list (independent of file order)
+        """
+        names = [f.encode("utf-8") if isinstance(f, unicode) else f for f in sorted(files)]
+        return hashlib.sha1("\n".join(names)).hexdigest()
+
+    def _logStatistics(self):
+        """Log cache counters and sizes
+        """
+        self._logger.info(
+            "DICOM volume cache: " +
+            str(self._hits) + " hits, " +
+            str(self._misses) + " misses, " +
+            str(self._evictions) + " evictions, " +
+            str(self._spills) + " spills, " +
+            str(len(self._volumes)) + " volumes mapped (" + str(sum(v.nbytes for v in self._volumes.itervalues())) + " bytes), " +
+            str(len(self._spilled)) + " spilled (" + str(sum(e["nbytes"] for e in self._spilled.itervalues())) + " bytes)."
+        )
@@ -0,0 +1,292 @@
+#### ##     ## ########   #######  ########  ########  ######
+ ##  ###   ### ##     ## ##     ## ##     ##    ##    ##    ##
+ ##  #### #### ##     ## ##     ## ##     ##    ##    ##
+ ##  ## ### ## ########  ##     ## ########     ##     ######
+ ##  ##     ## ##        ##     ## ##   ##      ##          ##
+ ##  ##     ## ##        ##     ## ##    ##     ##    ##    ##
+#### ##     ## ##         #######  ##     ##    ##     ######
+
+# Standard
+import os
+import tempfile
+import traceback
+
+# Logging
+import logging
+import logging.config
+
+# Numpy
+import numpy as np
+
+# DICOM
+import dicom
+
+# DICOM domain
+from dcm.DicomVolume import DicomVolume
+
+# Context
+from contexts.ConfigDetails import ConfigDetails
+
+# Worker processes
+from utils.WorkerPool import imapTasks, processCount
+
+# Below this number of slices it is cheaper to decode serially than to start worker processes
+PARALLEL_LOAD_MIN_SLICES = 16
+
+# Relative tolerance of slice distances before the spacing is reported as uneven
+SLICE_DISTANCE_TOLERANCE = 0.01
+
+######## ##     ## ##    ##  ######  ######## ####  #######  ##    ##  ######
+##       ##     ## ###   ## ##    ##    ##     ##  ##     ## ###   ## ##    ##
+##       ##     ## ####  ## ##          ##     ##  ##     ## ####  ## ##
+######   ##     ## ## ## ## ##          ##     ##  ##     ## ## ## ##  ######
+##       ##     ## ##  #### ##          ##     ##  ##     ## ##  ####       ##
+##       ##     ## ##   ### ##    ##    ##     ##  ##     ## ##   ### ##    ##
+##        #######  ##    ##  ######     ##    ####  #######  ##    ##  ######
+
+
+def readSliceHeader(path):
+    """Read geometry and pixel format of one DICOM file (pixel data is not read)
+
+    return: dictionary with plain values, error message in "error" key when the file cannot be read
+    """
+    header = {
+        "path": path,
+        "error": None
+    }
+
+    try:
+        ds = dicom.read_file(path, stop_before_pixels=True, force=True)
+
+        header["rows"] = int(ds.Rows)
+        header["columns"] = int(ds.Columns)
+        header["frames"] = int(ds.get("NumberOfFrames", 1) or 1)
+        header["bitsAllocated"] = int(ds.get("BitsAllocated", 16))
+        header["pixelRepresentation"] = int(ds.get("PixelRepresentation", 0))
+        header["slope"] = float(ds.get("RescaleSlope", 1.0))
+        header["intercept"] = float(ds.get("RescaleIntercept", 0.0))
+        header["instanceNumber"] = int(ds.get("InstanceNumber", 0) or 0)
+        header["pixelSpacing"] = _floats(ds.get("PixelSpacing"), 2)
+        header["position"] = _floats(ds.get("ImagePositionPatient"), 3)
+        header["orientation"] = _floats(ds.get("ImageOrientationPatient"), 6)
+        header["sliceThickness"] = _floats([ds.get("SliceThickness")], 1)
+        header["frameOffsets"] = _floats(ds.get("GridFrameOffsetVector"), header["frames"])
+    except Exception:
+        header["error"] = "Cannot read DICOM slice header: " + path + "\n" + traceback.format_exc()
+
+    return header
+
+
+def decodeSlice(task):
+    """Decode pixel data of one DICOM file into the memory mapped volume file
+
+    task: tuple (path, volumePath, dtype, rows, columns, index, frames, slope, intercept)
+
+    return: None or error message
+    """
+    path, volumePath, dtype, rows, columns, index, frames, slope, intercept = task
+
+    try:
+        ds = dicom.read_file(path, force=True)
+        pixels = ds.pixel_array.reshape((frames, rows, columns))
+
+        dtype = np.dtype(dtype)
+        if dtype.kind == "f":
+            pixels = pixels.astype(dtype) * dtype.type(slope) + dtype.type(intercept)
+
+        # Map only the part of the volume which belongs to this file
+        offset = index * rows * columns * dtype.itemsize
+        target = np.memmap(volumePath, dtype=dtype, mode="r+", offset=offset, shape=(frames, rows, columns))
+        target[:] = pixels
+        target.flush()
+        del target
+    except Exception:
+        return "Cannot decode DICOM pixel data: " + path + "\n" + traceback.format_exc()
+
+
+def _floats(value, count):
+    """Convert DICOM multi value to list of floats (None when it is missing or incomplete)
+    """
+    try:
+        result = [float(v) for v in value]
+    except (TypeError, ValueError):
+        return None
+
+    if len(result) != count:
+        return None
+
+    return result
+
+ ######  ######## ########  ##     ## ####  ######  ########
+##    ## ##       ##     ## ##     ##  ##  ##    ## ##
+##       ##       ##     ## ##     ##  ##  ##       ##
+ ######  ######   ########  ##     ##  ##  ##       ######
+      ## ##       ##   ##    ##   ##   ##  ##       ##
+##    ## ##       ##    ##    ## ##    ##  ##    ## ##
+ ######  ######## ##     ##    ###    ####  ######  ########
+
+
+class DicomVolumeService:
+    """DICOM volume loader
+    Assembles pixel data of DICOM series into a volume. Slices are sorted by
+    ImagePositionPatient along the slice normal, the volume is preallocated
+    as memory mapped file and slices are decoded into it by a pool of worker
+    processes (serially for small series or when the pool cannot be used).
+    """
+
+    def __init__(self):
+        """Default constructor
+        """
+        # Setup logger - use logging config file
+        self._logger = logging.getLogger(__name__)
+        logging.config.fileConfig("logging.ini", disable_existing_loggers=False)
+
+        # Number of worker processes (0 = number of CPU cores, 1 = serial decoding)
+        self._workers = ConfigDetails().dicomVolumeWorkers
+
+        # Folder for memory mapped volume files (None = system temp folder)
+        self._directory = ConfigDetails().dicomVolumeDir
+
+########  ########   #######  ########  ######## ########  ######## #### ########  ######
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##    ##
+##     ## ##     ## ##     ## ##     ## ##       ##     ##    ##     ##  ##       ##
+########  ########  ##     ## ########  ######   ########     ##     ##  ######    ######
+##        ##   ##   ##     ## ##        ##       ##   ##      ##     ##  ##             ##
+##        ##    ##  ##     ## ##        ##       ##    ##     ##     ##  ##       ##    ##
+##        ##     ##  #######  ##        ######## ##     ##    ##    #### ########  ######
+
+    @property
+    def workerCount(self):
+        """Number of worker processes used for decoding
+        """
+        return processCount(self._workers)
+
+##     ## ######## ######## ##     ##  #######  ########   ######
+###   ### ##          ##    ##     ## ##     ## ##     ## ##    ##
+#### #### ##          ##    ##     ## ##     ## ##     ## ##
+## ### ## ######      ##    ######### ##     ## ##     ##  ######
+##     ## ##          ##    ##     ## ##     ## ##     ##       ##
+##     ## ##          ##    ##     ## ##     ## ##     ## ##    ##
+##     ## ########    ##    ##     ##  #######  ########   ######
+
+    def load(self, files):
+        """Load pixel data of DICOM files as one volume
+
+        files: DICOM file paths of one series (any order) or one multi-frame file
+        return: DicomVolume with memory mapped pixel data
+        """
+        if len(files) == 0:
+            raise ValueError("Serie does not contain any files.")
+
+        headers = self._map(readSliceHeader, files)
+        for header in headers:
+            if header["error"] is not None:
+                self._logger.error(header["error"])
+                raise ValueError("Cannot read DICOM file: " + header["path"])
+
+        headers = self._sortHeaders(headers)
+        rows, columns = headers[0]["rows"], headers[0]["columns"]
+        frames = sum(h["frames"] for h in headers)
+        dtype = self._volumeType(headers)
+        sampling = self._sampling(headers)
+
+        # Preallocate the volume file
+        handle, path = tempfile.mkstemp(suffix=".vol", prefix="rpb", dir=self._directory)
+        os.close(handle)
+        try:
+            volume = np.memmap(path, dtype=dtype, mode="w+", shape=(frames, rows, columns))
+            volume.flush()
+            del volume
+
+            tasks = []
+            index = 0
+            for h in headers:
+                tasks.append((h["path"], path, dtype.str, rows, columns, index, h["frames"], h["slope"], h["intercept"]))
+                index += h["frames"]
+
+            for error in self._map(decodeSlice, tasks):
+                if error is not None:
+                    self._logger.error(error)
+                    raise ValueError("Cannot decode DICOM pixel data of the serie.")
+
+            array = np.memmap(path, dtype=dtype, mode="r", shape=(frames, rows, columns))
+        except:
+            os.remove(path)
+            raise
+
+        self._logger.info("DICOM volume " + str(array.shape) + " loaded from " + str(len(files)) + " files.")
+
+        return DicomVolume(array, sampling, [h["path"] for h in headers], path)
+
+########  ########  #### ##     ##    ###    ######## ########
+##     ## ##     ##  ##  ##     ##   ## ##      ##    ##
+##     ## ##     ##  ##  ##     ##  ##   ##     ##    ##
+########  ########   ##  ##     ## ##     ##    ##    ######
+##        ##   ##    ##   ##   ##  #########    ##    ##
+##        ##    ##   ##    ## ##   ##     ##    ##    ##
+##        ##     ## ####    ###    ##     ##    ##    ########
+
+    def _map(self, function, tasks):
+        """Apply function to all tasks (in worker processes when there are enough tasks)
+        """
+        return list(imapTasks(function, tasks, self._workers, PARALLEL_LOAD_MIN_SLICES, self._logger, "DICOM volume loading"))
+
+    def _sortHeaders(self, headers):
+        """Check slice dimensions and sort slices along the slice normal
+        """
+        dimensions = set((h["rows"], h["columns"]) for h in headers)
+        if len(dimensions) > 1:
+            # We cannot produce a volume if the dimensions do not match
+            raise ValueError("Dimensions of slices does not match.")
+
+        if len(headers) == 1:
+            return headers
+
+        if any(h["frames"] != 1 for h in headers):
+            raise ValueError("Volume cannot be assembled from multiple multi-frame files.")
+
+        positions = [h["position"] for h in headers]
+        orientation = headers[0]["orientation"]
+        if orientation is None or any(p is None for p in positions):
+            self._logger.warning("Slice position is missing, DICOM volume is sorted by instance number.")
+            return sorted(headers, key=lambda h: h["instanceNumber"])
+
+        orientation = np.array(orientation)
+        normal = np.cross(orientation[:3], orientation[3:])
+        distances = np.dot(np.array(positions), normal)
+
+        return [headers[i] for i in np.argsort(distances, kind="mergesort")]
+
+    def _volumeType(self, headers):
+        """Numpy type which can hold (rescaled) pixel values of all slices
+        """
+        if any(h["slope"] != 1.0 or h["intercept"] != 0.0 for h in headers):
+            return np.dtype(np.float32)
+
+        bits = max(h["bitsAllocated"] for h in headers)
+        signed = any(h["pixelRepresentation"] == 1 for h in headers)
+
+        return np.dtype(("int" if signed else "uint") + str(max(bits, 8)))
+
+    def _sampling(self, headers):
+        """Voxel distances (dz, dy, dx) of sorted slices
+        """
+        first = headers[0]
+        dy, dx = first["pixelSpacing"] or [1.0, 1.0]
+
+        if len(headers) > 1 and first["orientation"] is not None and all(h["position"] is not None for h in headers):
+            orientation = np.array(first["orientation"])
+            normal = np.cross(orientation[:3], orientation[3:])
+            distances = np.diff(np.dot(np.array([h["position"] for h in headers]), normal))
+            dz = float(np.mean(distances))
+            if dz > 0 and np.ptp(distances) > SLICE_DISTANCE_TOLERANCE * dz:
+                # We can still produce a volume, but we should notify the user
+                self._logger.warning("Slice distances of DICOM volume are not even.")
+        elif first["frameOffsets"] is not None and len(first["frameOffsets"]) > 1:
+            dz = float(np.mean(np.diff(first["frameOffsets"])))
+        elif first["sliceThickness"] is not None:
+            dz = first["sliceThickness"][0]
+        else:
+            dz = 1.0
+
+        return (abs(dz), dy, dx)
@@ -2,6 +2,28 @@ import unittest
 
 import testCsvFileDataService
 import testDateConverter
+import testDeidentRules
+import testDSRDocumentService
+import testDicomAnnotationDetector
+import testDicomDescriptor
+import testDicomDoseService
+import testDicomDescriptorStore
+import testDicomDuplicateService
+import testDicomFileSniffer
+import testDicomGeometryValidator
+import testDicomMediaDirectoryService
+import testDicomReferenceGraph
+import testDicomRtStructureSet
+import testDicomScanIndexService
+import testDicomSeriesHeader
+import testDicomSeriesPreview
+import testAnonymisationWorkers
+import testAnonymisationPixelData
+import testWorkerPool
+import testDicomScanService
+import testDicomTagExtractor
+import testDicomVolumeCacheService
+import testDicomVolumeService
 import testFloatConverter
 import testOdmFileDataService
 #import testTransformationService
@@ -10,6 +32,28 @@ suite1 = testCsvFileDataService.suite()
 suite2 = testOdmFileDataService.suite()
 suite3 = testDateConverter.suite()
 suite4 = testFloatConverter.suite()
+suite6 = testDicomScanService.suite()
+suite7 = testDicomScanIndexService.suite()
+suite8 = testDicomTagExtractor.suite()
+suite9 = testDicomDescriptorStore.suite()
+suite10 = testDicomDescriptor.suite()
+suite11 = testDicomFileSniffer.suite()
+suite12 = testDicomMediaDirectoryService.suite()
+suite13 = testDicomReferenceGraph.suite()
+suite14 = testDicomSeriesHeader.suite()
+suite15 = testDicomVolumeService.suite()
+suite16 = testDicomGeometryValidator.suite()
+suite17 = testDicomVolumeCacheService.suite()
+suite18 = testDSRDocumentService.suite()
+suite19 = testDicomRtStructureSet.suite()
+suite20 = testDicomDoseService.suite()
+suite21 = testDicomAnnotationDetector.suite()
+suite22 = testDicomDuplicateService.suite()
+suite23 = testDeidentRules.suite()
+suite24 = testDicomSeriesPreview.suite()
+suite25 = testAnonymisationWorkers.suite()
+suite26 = testAnonymisationPixelData.suite()
+suite27 = testWorkerPool.suite()
 #suite5 = testTransformationService.suit()
 
 suite = unittest.TestSuite()
@@ -17,6 +61,28 @@ suite.addTest(suite1)
 suite.addTest(suite2)
 suite.addTest(suite3)
 suite.addTest(suite4)
+suite.addTest(suite6)
+suite.addTest(suite7)
+suite.addTest(suite8)
+suite.addTest(suite9)
+suite.addTest(suite10)
+suite.addTest(suite11)
+suite.addTest(suite12)
+suite.addTest(suite13)
+suite.addTest(suite14)
+suite.addTest(suite15)
+suite.addTest(suite16)
+suite.addTest(suite17)
+suite.addTest(suite18)
+suite.addTest(suite19)
+suite.addTest(suite20)
+suite.addTest(suite21)
+suite.addTest(suite22)
+suite.addTest(suite23)
+suite.addTest(suite24)
+suite.addTest(suite25)
+suite.addTest(suite26)
+suite.addTest(suite27)
 #suite.addTest(suite5)
 
 unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,169 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+import dicom
+from dicom.filereader import read_dataset
+from dicom.filebase import DicomBytesIO
+
+from contexts.ConfigDetails import ConfigDetails
+from services.AnonymisationService import AnonymisationService
+
+class Node(object):
+    """Minimal DICOM data tree node used for selection of anonymised files
+    """
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+class TestAnonymisationPixelData(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.testFiles = os.path.join(os.path.dirname(dicom.__file__), "testfiles")
+        self.folder = tempfile.mkdtemp()
+        self.destination = tempfile.mkdtemp()
+
+        ConfigDetails().singlePassAnonymisation = True
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        ConfigDetails().singlePassAnonymisation = False
+
+        shutil.rmtree(self.folder)
+        shutil.rmtree(self.destination)
+
+    def test_pixel_data_is_located_in_explicit_little_endian_file(self):
+        """
+        """
+        self._assertPixelDataLocated("CT_small.dcm")
+
+    def test_pixel_data_is_located_in_implicit_little_endian_file(self):
+        """
+        """
+        self._assertPixelDataLocated("rtdose.dcm")
+
+    def test_pixel_data_is_located_in_explicit_big_endian_file(self):
+        """
+        """
+        self._assertPixelDataLocated("ExplVR_BigEnd.dcm")
+
+    def test_encapsulated_pixel_data_is_located(self):
+        """
+        """
+        for name in ["JPEG2000.dcm", "JPEG-LL.dcm", "JPEG-lossy.dcm"]:
+            self._assertPixelDataLocated(name)
+
+    def test_missing_delimitation_item_of_encapsulated_pixel_data_is_reported(self):
+        """
+        """
+        with open(os.path.join(self.testFiles, "JPEG2000.dcm"), "rb") as f:
+            data = f.read()
+
+        # Remove sequence delimitation item
+        self.assertEqual(data[-8:], "\xfe\xff\xdd\xe0\x00\x00\x00\x00")
+        filename = os.path.join(self.folder, "truncated.dcm")
+        with open(filename, "wb") as f:
+            f.write(data[:-8])
+
+        self.assertRaises(EOFError, self._service()._readDicomHeader, filename)
+
+    def test_deflated_file_is_read_with_pixel_data(self):
+        """
+        """
+        filename = os.path.join(self.testFiles, "image_dfl.dcm")
+
+        dataset, pixelRange = self._service()._readDicomHeader(filename)
+
+        self.assertTrue(pixelRange is None)
+        self.assertEqual(dataset.PixelData, dicom.read_file(filename).PixelData)
+
+    def test_file_without_pixel_data_has_no_pixel_range(self):
+        """
+        """
+        dataset, pixelRange = self._service()._readDicomHeader(os.path.join(self.testFiles, "rtplan.dcm"))
+
+        self.assertTrue(pixelRange is None)
+        self.assertEqual(dataset.Modality, "RTPLAN")
+
+    def test_elements_following_pixel_data_are_anonymised(self):
+        """
+        """
+        # Private elements of Oncentra dose are kept, trailing padding is removed by de-identification profile
+        source = dicom.read_file(os.path.join(self.testFiles, "rtdose.dcm"))
+        source.Manufacturer = "Nucletron"
+        source.ManufacturerModelName = "Oncentra"
+        source.add_new(0x7FE10010, "LO", "ONCENTRA")
+        source.add_new(0x7FE11001, "LO", "KEPT")
+        source.add_new(0xFFFCFFFC, "OB", "\0" * 16)
+        filename = os.path.join(self.folder, "dose.dcm")
+        source.save_as(filename)
+
+        dataset, pixelRange = self._service()._readDicomHeader(filename)
+        self.assertTrue(pixelRange is not None)
+        self.assertTrue(0x7FE11001 in dataset)
+        self.assertTrue(0xFFFCFFFC in dataset)
+
+        service = self._service([filename], "RTDOSE")
+        service.makeAnonymous()
+        self.assertEqual(service.errors, [])
+
+        anonymised = dicom.read_file(os.path.join(self.destination, os.listdir(self.destination)[0]))
+        self.assertEqual(anonymised.PixelData, source.PixelData)
+        self.assertEqual(anonymised[0x7FE11001].value, "KEPT")
+        self.assertFalse(0xFFFCFFFC in anonymised)
+        self.assertEqual(anonymised.PatientID, "ID")
+
+    def _service(self, files=[], modality="CT"):
+        """Anonymisation service of series with files
+        """
+        serie = Node(isChecked=True, files=files, modality=modality, suid="1.2.3", newDescription="Series")
+        study = Node(isChecked=True, children=[serie], newDescription="")
+        root = Node(children=[study])
+        patient = Node(newName="Anonymous")
+
+        service = AnonymisationService(self.destination, patient, root, {})
+        service.PatientID = "ID"
+
+        return service
+
+    def _assertPixelDataLocated(self, name):
+        """Located pixel data element of test file is the same as pixel data of full read
+        """
+        filename = os.path.join(self.testFiles, name)
+        full = dicom.read_file(filename)
+
+        dataset, pixelRange = self._service()._readDicomHeader(filename)
+
+        self.assertFalse("PixelData" in dataset)
+        self.assertEqual(sorted(dataset.keys()), sorted(tag for tag in full.keys() if tag != 0x7FE00010))
+
+        offset, length = pixelRange
+        with open(filename, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        self.assertEqual(len(data), length)
+
+        # Encapsulated pixel data element: header, items and sequence delimitation item
+        if data[8:12] == "\xff\xff\xff\xff":
+            self.assertEqual(data, data[:12] + full.PixelData + "\xfe\xff\xdd\xe0\x00\x00\x00\x00")
+        else:
+            located = read_dataset(DicomBytesIO(data), full.is_implicit_VR, full.is_little_endian, length)
+            self.assertEqual(located.keys(), [0x7FE00010])
+            self.assertEqual(located.PixelData, full.PixelData)
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestAnonymisationPixelData))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import sys, os, shutil, tempfile, pickle, multiprocessing
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+import dicom
+from dicom.dataset import Dataset
+from dicom.sequence import Sequence
+
+from contexts.ConfigDetails import ConfigDetails
+import services.AnonymisationService as anonymisationModule
+from services.AnonymisationService import AnonymisationService
+
+class Node(object):
+    """Minimal DICOM data tree node used for selection of anonymised files
+    """
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+class TestAnonymisationWorkers(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.destinations = []
+        self.pools = []
+
+        # Small series where each instance references the previous one
+        source = dicom.read_file(os.path.join(os.path.dirname(dicom.__file__), "testfiles", "CT_small.dcm"))
+        self.files = []
+        for i in xrange(6):
+            source.SOPInstanceUID = "1.2.3.4." + str(i)
+            source.file_meta.MediaStorageSOPInstanceUID = source.SOPInstanceUID
+            if i > 0:
+                reference = Dataset()
+                reference.ReferencedSOPClassUID = source.SOPClassUID
+                reference.ReferencedSOPInstanceUID = "1.2.3.4." + str(i - 1)
+                source.ReferencedImageSequence = Sequence([reference])
+            filename = os.path.join(self.folder, "ct" + str(i) + ".dcm")
+            source.save_as(filename)
+            self.files.append(filename)
+
+        self.broken = os.path.join(self.folder, "broken.dcm")
+        with open(self.broken, "wb") as f:
+            f.write("not a DICOM file")
+
+        self.seriesUid = source.SeriesInstanceUID
+
+        # Parallel anonymisation is used also for small selections
+        self.minFiles = anonymisationModule.PARALLEL_ANONYMISE_MIN_FILES
+        anonymisationModule.PARALLEL_ANONYMISE_MIN_FILES = 2
+
+        # Record started worker pools
+        self.originalPool = multiprocessing.Pool
+        def pool(*args, **kwargs):
+            self.pools.append(args[0])
+            return self.originalPool(*args, **kwargs)
+        multiprocessing.Pool = pool
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        multiprocessing.Pool = self.originalPool
+        anonymisationModule.PARALLEL_ANONYMISE_MIN_FILES = self.minFiles
+        ConfigDetails().anonymisationWorkers = 0
+        ConfigDetails().singlePassAnonymisation = False
+
+        shutil.rmtree(self.folder)
+        for destination in self.destinations:
+            shutil.rmtree(destination)
+
+    def test_workers_translate_uids_as_serial_anonymisation(self):
+        """
+        """
+        key = os.urandom(32)
+
+        serial = self._anonymise(self.files, 1, True, key)
+        self.assertEqual(self.pools, [])
+
+        parallel = self._anonymise(self.files, 2, True, key)
+        self.assertEqual(self.pools, [2])
+
+        self.assertEqual(serial.uidMap, parallel.uidMap)
+        self.assertEqual(self._anonymisedUids(serial), self._anonymisedUids(parallel))
+
+    def test_workers_keep_references_of_prepared_uids(self):
+        """
+        """
+        service = self._anonymise(self.files, 2, False)
+        self.assertEqual(self.pools, [2])
+
+        datasets = self._anonymisedDatasets(service)
+        self.assertEqual(len(datasets), len(self.files))
+
+        sopInstanceUids = set()
+        for dataset in datasets:
+            sopInstanceUids.add(dataset.SOPInstanceUID)
+            self.assertEqual(dataset.file_meta.MediaStorageSOPInstanceUID, dataset.SOPInstanceUID)
+            self.assertEqual(dataset.SeriesInstanceUID, service.uidMap[self.seriesUid])
+
+        self.assertEqual(sopInstanceUids, set(service.uidMap["1.2.3.4." + str(i)] for i in xrange(len(self.files))))
+
+        for dataset in datasets:
+            if "ReferencedImageSequence" in dataset:
+                self.assertTrue(dataset.ReferencedImageSequence[0].ReferencedSOPInstanceUID in sopInstanceUids)
+                self.assertNotEqual(dataset.ReferencedImageSequence[0].ReferencedSOPInstanceUID, dataset.SOPInstanceUID)
+
+    def test_worker_errors_are_collected(self):
+        """
+        """
+        files = self.files[:3] + [self.broken] + self.files[3:]
+
+        for workers in [1, 2]:
+            service = self._anonymise(files, workers, True)
+
+            self.assertEqual(len(service.errors), 1)
+            self.assertEqual(service.errors[0][0], self.broken)
+            self.assertTrue(service.errorMessage.startswith("1 of 7 DICOM files could not be anonymised: broken.dcm"))
+            self.assertEqual(len(self._anonymisedDatasets(service)), len(self.files))
+
+    def test_service_can_be_sent_to_worker_processes(self):
+        """
+        """
+        service = self._service(self.files, 2, True)
+        service._anonymisedUid("1.2.3.4.0")
+
+        restored = pickle.loads(pickle.dumps(service))
+
+        self.assertEqual(restored.uidMap, service.uidMap)
+        self.assertEqual(restored._anonymisedUid("1.2.3.4.1"), service._anonymisedUid("1.2.3.4.1"))
+        self.assertFalse(hasattr(restored, "_dicomDataRoot"))
+        self.assertTrue(restored._logger is not None)
+
+    def _service(self, files, workers, singlePass, key=None):
+        """Anonymisation service of fixture series
+        """
+        ConfigDetails().anonymisationWorkers = workers
+        ConfigDetails().singlePassAnonymisation = singlePass
+
+        destination = tempfile.mkdtemp()
+        self.destinations.append(destination)
+
+        serie = Node(isChecked=True, files=files, modality="CT", suid=self.seriesUid, newDescription="Series")
+        study = Node(isChecked=True, children=[serie], newDescription="")
+        root = Node(children=[study])
+        patient = Node(newName="Anonymous")
+
+        service = AnonymisationService(destination, patient, root, {})
+        service.PatientID = "ID"
+        if key is not None:
+            service._uidKey = key
+
+        return service
+
+    def _anonymise(self, files, workers, singlePass, key=None):
+        """Anonymise files with given number of workers
+        """
+        service = self._service(files, workers, singlePass, key)
+        service.makeAnonymous()
+
+        return service
+
+    def _anonymisedDatasets(self, service):
+        """Read anonymised files of service
+        """
+        return [dicom.read_file(os.path.join(service._destination, f)) for f in os.listdir(service._destination)]
+
+    def _anonymisedUids(self, service):
+        """SOP instance UIDs, references and series UIDs of anonymised files
+        """
+        uids = set()
+        for dataset in self._anonymisedDatasets(service):
+            reference = None
+            if "ReferencedImageSequence" in dataset:
+                reference = dataset.ReferencedImageSequence[0].ReferencedSOPInstanceUID
+            uids.add((dataset.SOPInstanceUID, dataset.file_meta.MediaStorageSOPInstanceUID, dataset.SeriesInstanceUID, reference))
+
+        return uids
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestAnonymisationWorkers))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import sys, os, shutil, tempfile, time, multiprocessing
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dicom.dataset import Dataset, FileDataset
+from dicom.sequence import Sequence
+
+import dicom
+import services.DSRDocumentService
+from contexts.ConfigDetails import ConfigDetails
+from services.DSRDocumentService import DSRDocumentService, readDocumentFile, RENDER_POOL
+from utils.WorkerPool import closeSharedPool
+
+class TestDSRDocumentService(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.files = []
+
+        for i in range(3):
+            path = os.path.join(self.folder, "SR%d.dcm" % i)
+            self._writeReport(path, "Finding %d" % i)
+            self.files.append(path)
+
+        self.service = DSRDocumentService()
+        self.service.clear()
+
+        self.workers = ConfigDetails().dicomScanWorkers
+        self.minFiles = services.DSRDocumentService.PARALLEL_RENDER_MIN_FILES
+        self.originalPool = multiprocessing.Pool
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        multiprocessing.Pool = self.originalPool
+        closeSharedPool(RENDER_POOL)
+        ConfigDetails().dicomScanWorkers = self.workers
+        services.DSRDocumentService.PARALLEL_RENDER_MIN_FILES = self.minFiles
+
+        self.service.clear()
+        shutil.rmtree(self.folder)
+
+    def test_report_text_is_rendered_in_document_order(self):
+        """
+        """
+        text = self.service.texts(self.files[:1])[0]
+
+        self.assertEqual(text, "\n[Report]\n\nObservation Context: Observer = Doe^John\n\n[Finding]\nFinding 0\n\n[Conclusion]\n\n[Impression]\nNone\n")
+
+    def test_document_is_parsed_once_per_file(self):
+        """
+        """
+        first = self.service.document(self.files[0])
+
+        self.assertTrue(self.service.document(self.files[0]) is first)
+        self.assertEqual(first.completionFlag, "COMPLETE")
+        self.assertEqual(first.verificationFlag, "VERIFIED")
+
+        # Modified file is parsed again
+        self._writeReport(self.files[0], "Changed")
+        os.utime(self.files[0], (time.time() + 10, time.time() + 10))
+
+        self.assertFalse(self.service.document(self.files[0]) is first)
+        self.assertTrue("Changed" in self.service.texts(self.files[:1])[0])
+
+    def test_texts_of_several_files_are_rendered(self):
+        """
+        """
+        texts = self.service.texts(self.files)
+
+        self.assertEqual(len(texts), 3)
+        for i, text in enumerate(texts):
+            self.assertTrue("Finding %d" % i in text)
+
+    def test_worker_pool_is_reused_for_many_files(self):
+        """
+        """
+        ConfigDetails().dicomScanWorkers = 2
+        services.DSRDocumentService.PARALLEL_RENDER_MIN_FILES = 2
+
+        # Record started worker pools
+        pools = []
+        def pool(*args, **kwargs):
+            pools.append(args[0])
+            return self.originalPool(*args, **kwargs)
+        multiprocessing.Pool = pool
+
+        serial = [DSRDocumentService().document(f).renderText() for f in self.files]
+        for i in range(2):
+            self.service.clear()
+            self.assertEqual(self.service.texts(self.files), serial)
+
+        self.assertEqual(pools, [2])
+
+    def test_elements_following_content_sequence_are_not_read(self):
+        """
+        """
+        dataset = dicom.read_file(self.files[0])
+        dataset.add_new(0x00410010, "LO", "PRIVATE")
+        dataset.add_new(0x00411001, "LO", "Value")
+        dataset.save_as(self.files[0])
+
+        dataset = readDocumentFile(self.files[0])
+
+        self.assertTrue("ContentSequence" in dataset)
+        self.assertFalse(0x00411001 in dataset)
+
+    def test_unreadable_file_has_empty_text(self):
+        """
+        """
+        path = os.path.join(self.folder, "missing.dcm")
+
+        self.assertEqual(self.service.texts([path, self.files[1]])[0], "")
+
+    def _writeReport(self, path, finding):
+        """Write basic text SR document
+        """
+        meta = Dataset()
+        meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.88.11"
+        meta.MediaStorageSOPInstanceUID = "1.2.3.9"
+        meta.TransferSyntaxUID = "1.2.840.10008.1.2"
+        meta.ImplementationClassUID = "1.2.3.4.5"
+
+        ds = FileDataset(path, {}, file_meta=meta, preamble="\0" * 128)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = True
+        ds.Modality = "SR"
+        ds.CompletionFlag = "COMPLETE"
+        ds.VerificationFlag = "VERIFIED"
+
+        observer = self._item("HAS OBS CONTEXT", "PNAME", "Observer")
+        observer.PersonName = "Doe^John"
+        text = self._item("CONTAINS", "TEXT", "Finding")
+        text.TextValue = finding
+        conclusion = self._item("CONTAINS", "CONTAINER", "Conclusion")
+        conclusion.ContentSequence = Sequence([self._item("CONTAINS", "TEXT", "Impression")])
+        conclusion.ContentSequence[0].TextValue = "None"
+
+        ds.ValueType = "CONTAINER"
+        ds.ContentSequence = Sequence([self._item("CONTAINS", "CONTAINER", "Report")])
+        ds.ContentSequence[0].ContentSequence = Sequence([observer, text, conclusion])
+        ds.save_as(path)
+
+    def _item(self, relationship, valueType, meaning):
+        """Content item with concept name
+        """
+        code = Dataset()
+        code.CodeValue = "0"
+        code.CodingSchemeDesignator = "99TEST"
+        code.CodeMeaning = meaning
+
+        item = Dataset()
+        item.RelationshipType = relationship
+        item.ValueType = valueType
+        item.ConceptNameCodeSequence = Sequence([code])
+        return item
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDSRDocumentService))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import sys, os
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dicomdeident.DeidentConfig import DeidentConfig
+from dicomdeident.DeidentModelLoader import DeidentModelLoader
+from dicomdeident.DeidentRules import DeidentRules, RULE_OPTION, RULE_REMOVE, RULE_REPLACE
+
+class TestDeidentRules(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        options = DeidentModelLoader(DeidentConfig()).GetOptions()
+
+        self.rules = DeidentRules(
+            ["Patient's Address", "Patient's Age", "Pregnancy Status", "Overlay Data", "Institution Name", "Not An Attribute"],
+            ["Institution Name", "Study Date"],
+            options
+        )
+
+    def test_profile_names_are_compiled_to_tags(self):
+        """
+        """
+        self.assertEqual(self.rules.Get(0x00101040), (RULE_REMOVE, None))
+        self.assertEqual(self.rules.Get(0x00080020), (RULE_REPLACE, None))
+        self.assertIsNone(self.rules.Get(0x00100010))
+
+    def test_remove_overrides_replace(self):
+        """
+        """
+        self.assertEqual(self.rules.Get(0x00080080)[0], RULE_REMOVE)
+
+    def test_option_overrides_profile(self):
+        """
+        """
+        action, attribute = self.rules.Get(0x00101010)
+
+        self.assertEqual(action, RULE_OPTION)
+        self.assertEqual(attribute.Name, "Patient's Age")
+
+        # Element with upper case hex digits in option definition (21C0)
+        self.assertEqual(self.rules.Get(0x001021C0)[0], RULE_OPTION)
+
+    def test_repeating_groups_are_matched(self):
+        """
+        """
+        self.assertEqual(self.rules.Get(0x60003000), (RULE_REMOVE, None))
+        self.assertEqual(self.rules.Get(0x601E3000), (RULE_REMOVE, None))
+        self.assertIsNone(self.rules.Get(0x60004000))
+
+    def test_unknown_names_are_ignored(self):
+        """
+        """
+        # 5 profile tags, 8 option tags (2 shared with profile) and 1 repeating group
+        self.assertEqual(len(self.rules), 5 + 8 - 2 + 1)
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDeidentRules))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys, os
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dcm.DicomAnnotationDetector import DicomAnnotationDetector
+from dcm.DicomDescriptor import DicomDescriptor
+
+class TestDicomAnnotationDetector(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.detector = DicomAnnotationDetector()
+
+        self.ct = [self._file(i, Modality="CT", SOPClassUID="1.2.840.10008.5.1.4.1.1.2", ImageType=["ORIGINAL", "PRIMARY", "AXIAL"]) for i in xrange(3)]
+
+    def test_series_without_annotations(self):
+        """
+        """
+        self.assertIsNone(self.detector.detect(self.ct))
+
+    def test_burned_in_annotation_attribute(self):
+        """
+        """
+        self.ct[1]["BurnedInAnnotation"] = "YES"
+
+        reason = self.detector.detect(self.ct)
+
+        self.assertTrue(reason.startswith("BurnedInAnnotation is YES"))
+        self.assertTrue("ct1.dcm" in reason)
+
+    def test_burned_in_annotation_attribute_value_true(self):
+        """
+        """
+        self.ct[0]["BurnedInAnnotation"] = "true"
+
+        self.assertIsNotNone(self.detector.detect(self.ct))
+
+    def test_attribute_overrides_heuristics(self):
+        """
+        """
+        us = self._file(0, Modality="US", BurnedInAnnotation="NO")
+
+        self.assertIsNone(self.detector.detect([us]))
+
+    def test_ultrasound_without_attribute_is_suspected(self):
+        """
+        """
+        reason = self.detector.detect([self._file(0, Modality="US")])
+
+        self.assertTrue(reason.startswith("Suspected US image"))
+
+    def test_secondary_capture_is_suspected(self):
+        """
+        """
+        sc = self._file(0, Modality="OT", SOPClassUID="1.2.840.10008.5.1.4.1.1.7")
+
+        self.assertTrue(self.detector.detect([sc]).startswith("Suspected secondary capture"))
+
+    def test_screen_save_image_type_is_suspected(self):
+        """
+        """
+        screen = self._file(0, Modality="CT", ImageType=["DERIVED", "SECONDARY", "SCREEN SAVE"])
+        reformat = self._file(1, Modality="CT", ImageType=["DERIVED", "SECONDARY", "MPR"])
+
+        self.assertIsNotNone(self.detector.detect([screen]))
+        self.assertIsNone(self.detector.detect([reformat]))
+
+    def test_detection_stops_at_first_affected_file(self):
+        """
+        """
+        descriptors = self.ct + [self._file(5, Modality="CT", BurnedInAnnotation="YES"), None]
+
+        # Descriptors after the first affected one are never evaluated
+        self.assertTrue("ct5.dcm" in self.detector.detect(descriptors))
+
+    def _file(self, number, **values):
+        """Descriptor of one DICOM file
+        """
+        values["Filename"] = "ct" + str(number) + ".dcm"
+        return DicomDescriptor(values)
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomAnnotationDetector))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
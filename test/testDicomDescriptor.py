@@ -0,0 +1,79 @@
+import sys, os
+import unittest
+import cPickle as pickle
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dcm.DicomDescriptor import DicomDescriptor
+
+class TestDicomDescriptor(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.values = {
+            "Filename": "/data/CT1.dcm",
+            "StudyInstanceUID": "".join(["1.2.3", ".4"]),
+            "Modality": "CT",
+            "InstanceNumber": 1,
+            "ContourImageSequence": ["1.2.3.5", "1.2.3.6"]
+        }
+
+    def test_descriptor_behaves_like_dictionary(self):
+        """
+        """
+        descriptor = DicomDescriptor(self.values)
+
+        self.assertTrue("Modality" in descriptor)
+        self.assertFalse("PatientID" in descriptor)
+        self.assertFalse("keys" in descriptor)
+        self.assertEqual(descriptor["InstanceNumber"], 1)
+        self.assertEqual(descriptor.get("PatientID", "X"), "X")
+        self.assertEqual(sorted(descriptor.keys()), sorted(self.values.keys()))
+        self.assertRaises(KeyError, descriptor.__getitem__, "PatientID")
+        self.assertRaises(KeyError, descriptor.__setitem__, "Unknown", "value")
+
+    def test_image_type_is_kept_as_tuple(self):
+        """
+        """
+        self.assertEqual(DicomDescriptor({ "ImageType": ["ORIGINAL", "PRIMARY"] })["ImageType"], ("ORIGINAL", "PRIMARY"))
+        self.assertEqual(DicomDescriptor({ "ImageType": "ORIGINAL" })["ImageType"], ("ORIGINAL",))
+
+    def test_repeated_uids_are_shared(self):
+        """
+        """
+        first = DicomDescriptor(self.values)
+        second = DicomDescriptor({ "StudyInstanceUID": "".join(["1.2.3", ".4"]) })
+
+        self.assertTrue(first["StudyInstanceUID"] is second["StudyInstanceUID"])
+
+    def test_copy_is_independent(self):
+        """
+        """
+        descriptor = DicomDescriptor(self.values)
+        copy = descriptor.copy()
+        copy["StudyInstanceUID"] = "9.9"
+
+        self.assertEqual(descriptor["StudyInstanceUID"], "1.2.3.4")
+        self.assertEqual(copy["Modality"], "CT")
+
+    def test_descriptor_can_be_pickled(self):
+        """
+        """
+        descriptor = DicomDescriptor(self.values)
+
+        self.assertEqual(pickle.loads(pickle.dumps(descriptor, pickle.HIGHEST_PROTOCOL)), descriptor)
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomDescriptor))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
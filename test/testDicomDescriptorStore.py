@@ -0,0 +1,95 @@
+import sys, os
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dcm.DicomDescriptorStore import DicomDescriptorStore
+
+class TestDicomDescriptorStore(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.store = DicomDescriptorStore()
+
+        self.ct1 = { "PatientID": "P1", "Modality": "CT", "SOPInstanceUID": "1.1", "PatientName": "A^B" }
+        self.ct2 = { "PatientID": "P1", "Modality": "CT", "SOPInstanceUID": "1.2", "PatientName": "A^B" }
+        self.plan = { "PatientID": "P1", "Modality": "RTPLAN", "SOPInstanceUID": "2.1", "PatientName": "A^C" }
+
+        self.store.append(self.ct1)
+        self.store.append(self.ct2)
+        self.store.append(self.plan)
+
+    def test_unique_values_of_indexed_key(self):
+        """
+        """
+        self.assertEqual(sorted(self.store.unique("Modality")), ["CT", "RTPLAN"])
+        self.assertEqual(self.store.unique("StudyInstanceUID"), [])
+
+    def test_unique_values_of_not_indexed_key(self):
+        """
+        """
+        self.assertEqual(sorted(self.store.unique("PatientName")), ["A^B", "A^C"])
+
+    def test_belonging_to_keeps_insertion_order(self):
+        """
+        """
+        self.assertEqual(self.store.belongingTo("Modality", "CT"), [self.ct1, self.ct2])
+        self.assertEqual(self.store.belongingTo("PatientName", "A^C"), [self.plan])
+        self.assertEqual(self.store.belongingTo("Modality", "MR"), [])
+
+    def test_removed_descriptor_is_not_indexed(self):
+        """
+        """
+        self.store.remove(self.plan)
+
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.unique("Modality"), ["CT"])
+        self.assertEqual(self.store.belongingTo("SOPInstanceUID", "2.1"), [])
+
+    def test_equal_descriptor_object_is_not_removed(self):
+        """
+        """
+        self.assertRaises(ValueError, self.store.remove, dict(self.plan))
+        self.assertEqual(len(self.store), 3)
+
+    def test_whole_series_is_removed_at_once(self):
+        """
+        """
+        series = []
+        for i in range(2000):
+            descriptor = { "PatientID": "P2", "Modality": "CT", "SeriesInstanceUID": "3", "SOPInstanceUID": "3.%d" % i }
+            self.store.append(descriptor)
+            series.append(descriptor)
+        other = { "PatientID": "P2", "Modality": "RTSTRUCT", "SeriesInstanceUID": "4", "SOPInstanceUID": "4.1" }
+        self.store.append(other)
+
+        removed = self.store.removeWhere("SeriesInstanceUID", "3")
+
+        self.assertEqual(removed, series)
+        self.assertEqual(list(self.store), [self.ct1, self.ct2, self.plan, other])
+        self.assertEqual(self.store.belongingTo("SeriesInstanceUID", "3"), [])
+        self.assertEqual(self.store.belongingTo("PatientID", "P2"), [other])
+        self.assertEqual(self.store.belongingTo("Modality", "CT"), [self.ct1, self.ct2])
+        self.assertEqual(self.store.removeWhere("SeriesInstanceUID", "3"), [])
+
+    def test_descriptors_are_removed_by_not_indexed_key(self):
+        """
+        """
+        self.assertEqual(self.store.removeWhere("PatientName", "A^B"), [self.ct1, self.ct2])
+        self.assertEqual(list(self.store), [self.plan])
+        self.assertEqual(self.store.unique("Modality"), ["RTPLAN"])
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomDescriptorStore))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+import numpy as np
+
+import dicom
+
+from services.DicomDoseService import DicomDoseService, computeRoiStatistics, readDoseGrid
+
+class TestDicomDoseService(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        # 1 mm grid, dose grows with x (1 Gy/mm) and z (1 Gy/mm)
+        x = np.arange(21, dtype=float)
+        y = np.arange(21, dtype=float)
+        z = np.arange(11, dtype=float)
+        dose = (z[:, None, None] + x[None, None, :] + 0.0 * y[None, :, None]).astype(np.float32)
+
+        self.grid = {"dose": dose, "x": x, "y": y, "z": z}
+
+    def test_square_contours_cover_expected_voxels(self):
+        """
+        """
+        contours = [self._square(4.5, 9.5, z) for z in [2.0, 3.0, 4.0, 5.0, 6.0]]
+        result = computeRoiStatistics((1, "GTV", contours), self.grid)
+
+        # 5 x 5 voxels on 5 slices of 1 mm
+        self.assertAlmostEqual(result["volume"], 0.125)
+        self.assertAlmostEqual(result["minDose"], 7.0)
+        self.assertAlmostEqual(result["maxDose"], 15.0)
+        self.assertAlmostEqual(result["meanDose"], 11.0, places=5)
+        self.assertIsNone(result["error"])
+
+    def test_dose_is_interpolated_between_frames(self):
+        """
+        """
+        result = computeRoiStatistics((1, "GTV", [self._square(4.5, 9.5, 2.5)]), self.grid)
+
+        self.assertAlmostEqual(result["minDose"], 7.5, places=5)
+        self.assertAlmostEqual(result["meanDose"], 9.5, places=5)
+
+    def test_inner_contour_is_a_hole(self):
+        """
+        """
+        contours = [self._square(4.5, 9.5, 3.0), self._square(6.5, 7.5, 3.0)]
+        result = computeRoiStatistics((1, "GTV", contours), self.grid)
+
+        self.assertAlmostEqual(result["volume"], 0.024)
+
+    def test_dvh_and_d95(self):
+        """
+        """
+        result = computeRoiStatistics((1, "GTV", [self._square(4.5, 9.5, 0.0)]), self.grid)
+        doses, volumes = result["dvh"]
+
+        # Whole volume receives at least minimum dose, nothing receives more than maximum
+        self.assertAlmostEqual(volumes[0], result["volume"])
+        self.assertAlmostEqual(volumes[np.searchsorted(doses, 5.0 - 1e-6)], result["volume"])
+        self.assertEqual(volumes[-1], 5 * 0.001)
+        self.assertTrue(np.all(np.diff(volumes) <= 0))
+        self.assertAlmostEqual(result["d95"], 5.0)
+
+    def test_contours_outside_grid_are_ignored(self):
+        """
+        """
+        result = computeRoiStatistics((1, "GTV", [self._square(4.5, 9.5, 50.0)]), self.grid)
+
+        self.assertEqual(result["volume"], 0.0)
+        self.assertIsNone(result["meanDose"])
+
+    def test_parallel_and_serial_results_match(self):
+        """
+        """
+        tasks = [(n, "ROI" + str(n), [self._square(4.5, 4.5 + n, 3.0)]) for n in xrange(1, 7)]
+
+        service = DicomDoseService()
+        parallel = service._compute(tasks, self.grid)
+        serial = [computeRoiStatistics(task, self.grid) for task in tasks]
+
+        self.assertEqual([r["volume"] for r in parallel], [r["volume"] for r in serial])
+        self.assertEqual([r["meanDose"] for r in parallel], [r["meanDose"] for r in serial])
+
+    def test_relative_grid_frame_offsets(self):
+        """
+        """
+        grid = self._doseGrid([0.0, 5.0, 10.0])
+
+        self.assertTrue(np.allclose(grid["z"], [-761.87, -756.87, -751.87]))
+
+    def test_absolute_grid_frame_offsets(self):
+        """
+        """
+        grid = self._doseGrid([-761.87, -756.87, -751.87])
+
+        self.assertTrue(np.allclose(grid["z"], [-761.87, -756.87, -751.87]))
+
+    def test_decreasing_grid_frame_offsets_are_ordered(self):
+        """
+        """
+        grid = self._doseGrid([0.0, -5.0, -10.0])
+
+        self.assertTrue(np.allclose(grid["z"], [-771.87, -766.87, -761.87]))
+        self.assertTrue(np.allclose(grid["dose"][:, 0, 0], [3.0, 2.0, 1.0]))
+
+    def _doseGrid(self, offsets):
+        """Read dose grid of RTDOSE test file with three frames (frame dose 1, 2, 3 Gy) and given offsets
+        """
+        ds = dicom.read_file(os.path.join(os.path.dirname(dicom.__file__), "testfiles", "rtdose.dcm"))
+        ds.NumberOfFrames = 3
+        ds.GridFrameOffsetVector = offsets
+        ds.DoseGridScaling = 1.0
+        ds.PixelData = np.repeat(np.arange(1, 4, dtype=np.uint32), 100).tostring()
+
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, "dose.dcm")
+            ds.save_as(path)
+            return readDoseGrid(path)
+        finally:
+            shutil.rmtree(folder)
+
+    def _square(self, low, high, z):
+        """Closed square contour
+        """
+        return np.array([[low, low, z], [high, low, z], [high, high, z], [low, high, z]])
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomDoseService))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
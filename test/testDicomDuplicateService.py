@@ -0,0 +1,184 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dicom.dataset import Dataset, FileDataset
+
+from contexts.ConfigDetails import ConfigDetails
+from dcm.DicomDescriptor import DicomDescriptor
+from services.DicomDuplicateService import DicomDuplicateService, DUPLICATE_ACCEPT, DUPLICATE_SKIP, DUPLICATE_REPLACE
+
+class TestDicomDuplicateService(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+
+        self.first = self._file("first.dcm", "content", 1000)
+        self.copy = self._file("copy.dcm", "content", 2000)
+        self.changed = self._file("changed.dcm", "changed", 3000)
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        ConfigDetails().dicomDuplicatePolicy = "first"
+        ConfigDetails().dicomDuplicateContentCheck = False
+        shutil.rmtree(self.folder)
+
+    def test_first_copy_is_kept(self):
+        """
+        """
+        service = self._service("first")
+
+        self.assertEqual(service.register(self._descriptor(self.first))[0], DUPLICATE_ACCEPT)
+        self.assertEqual(service.register(self._descriptor(self.copy))[0], DUPLICATE_SKIP)
+        self.assertEqual(service.duplicates, [(self.copy, self.first)])
+        self.assertEqual(service.skippedBytes, len("content"))
+
+    def test_newest_copy_replaces_older_one(self):
+        """
+        """
+        service = self._service("newest")
+        first = self._descriptor(self.first)
+        service.register(first)
+
+        decision, previous = service.register(self._descriptor(self.copy))
+
+        self.assertEqual(decision, DUPLICATE_REPLACE)
+        self.assertTrue(previous is first)
+        self.assertEqual(service.duplicates, [(self.first, self.copy)])
+
+        # Older copy found later is skipped
+        older = self._file("older.dcm", "content", 500)
+        self.assertEqual(service.register(self._descriptor(older))[0], DUPLICATE_SKIP)
+
+    def test_same_file_listed_twice_is_not_reported(self):
+        """
+        """
+        service = self._service("first")
+        service.register(self._descriptor(self.first))
+
+        self.assertEqual(service.register(self._descriptor(self.first))[0], DUPLICATE_SKIP)
+        self.assertEqual(service.duplicates, [])
+
+    def test_report_policy_skips_and_reports_copies(self):
+        """
+        """
+        service = self._service("report")
+        service.register(self._descriptor(self.first))
+
+        self.assertEqual(service.register(self._descriptor(self.copy))[0], DUPLICATE_SKIP)
+        self.assertEqual(service.reportedDuplicates, [(self.copy, self.first)])
+        self.assertEqual(service.skippedBytes, len("content"))
+
+    def test_duplicates_are_reported_only_in_report_policy(self):
+        """
+        """
+        service = self._service("first")
+        service.register(self._descriptor(self.first))
+        service.register(self._descriptor(self.copy))
+
+        self.assertEqual(service.reportedDuplicates, [])
+
+    def test_content_check_confirms_duplicates(self):
+        """
+        """
+        first = self._dicomFile("first_export.dcm", "DOE^JOHN")
+        # Another export of the same instance (different preamble, file meta and trailing padding)
+        copy = self._dicomFile("second_export.dcm", "DOE^JOHN", preamble="\1" * 128, version="OTHER_EXPORT", padding=True)
+        changed = self._dicomFile("changed.dcm", "DOE^JANE")
+
+        service = self._service("first", True)
+        service.register(self._descriptor(first))
+
+        self.assertEqual(service.register(self._descriptor(copy))[0], DUPLICATE_SKIP)
+        self.assertEqual(service.duplicates, [(copy, first)])
+        self.assertEqual(service.conflicts, [])
+
+        self.assertEqual(service.register(self._descriptor(changed))[0], DUPLICATE_SKIP)
+        self.assertEqual(service.conflicts, [(changed, first)])
+
+    def test_conflicts_are_skipped_also_in_report_policy(self):
+        """
+        """
+        service = self._service("report", True)
+        service.register(self._descriptor(self._dicomFile("first_export.dcm", "DOE^JOHN")))
+
+        self.assertEqual(service.register(self._descriptor(self._dicomFile("changed.dcm", "DOE^JANE")))[0], DUPLICATE_SKIP)
+        self.assertEqual(len(service.conflicts), 1)
+
+    def test_instances_of_other_series_are_conflicts(self):
+        """
+        """
+        service = self._service("first")
+        service.register(self._descriptor(self.first))
+
+        self.assertEqual(service.register(self._descriptor(self.copy, series="1.2.4"))[0], DUPLICATE_SKIP)
+        self.assertEqual(service.conflicts, [(self.copy, self.first)])
+
+    def test_unknown_policy_falls_back_to_first(self):
+        """
+        """
+        self.assertEqual(self._service("last").policy, "first")
+
+    def _service(self, policy, contentCheck=False):
+        """Duplicate service with policy
+        """
+        ConfigDetails().dicomDuplicatePolicy = policy
+        ConfigDetails().dicomDuplicateContentCheck = contentCheck
+        return DicomDuplicateService()
+
+    def _file(self, name, content, modified):
+        """File with content and modification time
+        """
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        os.utime(path, (modified, modified))
+        return path
+
+    def _dicomFile(self, name, patientName, preamble="\0" * 128, version="EXPORT", padding=False):
+        """DICOM file of SOP instance 1.2.3.1
+        """
+        path = os.path.join(self.folder, name)
+
+        meta = Dataset()
+        meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+        meta.MediaStorageSOPInstanceUID = "1.2.3.1"
+        meta.TransferSyntaxUID = "1.2.840.10008.1.2.1"
+        meta.ImplementationClassUID = "1.2.3.4.5"
+        meta.ImplementationVersionName = version
+
+        ds = FileDataset(path, {}, file_meta=meta, preamble=preamble)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        ds.SOPInstanceUID = "1.2.3.1"
+        ds.SeriesInstanceUID = "1.2.3"
+        ds.PatientName = patientName
+        ds.add_new(0x7FE00010, "OW", "\0\1" * 64)
+        if padding:
+            ds.add_new(0xFFFCFFFC, "OB", "\0" * 16)
+        ds.save_as(path)
+
+        return path
+
+    def _descriptor(self, path, series="1.2.3"):
+        """Descriptor of SOP instance 1.2.3.1
+        """
+        return DicomDescriptor({ "Filename": path, "SeriesInstanceUID": series, "SOPInstanceUID": "1.2.3.1" })
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomDuplicateService))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
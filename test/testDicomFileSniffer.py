@@ -0,0 +1,98 @@
+import sys, os, shutil, tempfile, struct
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dicom.dataset import Dataset, FileDataset
+
+from dcm.DicomFileSniffer import DicomFileSniffer
+
+class TestDicomFileSniffer(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.sniffer = DicomFileSniffer()
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        shutil.rmtree(self.folder)
+
+    def _writeFile(self, name, content):
+        """Write raw content into temporary file
+        """
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_sniffer_accepts_file_with_preamble(self):
+        """
+        """
+        path = os.path.join(self.folder, "ct.dcm")
+
+        meta = Dataset()
+        meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+        meta.MediaStorageSOPInstanceUID = "1.2.3.4.1"
+        meta.TransferSyntaxUID = "1.2.840.10008.1.2"
+        meta.ImplementationClassUID = "1.2.3.4.5"
+
+        ds = FileDataset(path, {}, file_meta=meta, preamble="\0" * 128)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = True
+        ds.Modality = "CT"
+        ds.save_as(path)
+
+        self.assertTrue(self.sniffer.isDicom(path))
+
+    def test_sniffer_accepts_implicit_file_without_preamble(self):
+        """
+        """
+        # (0008,0060) Modality with implicit VR and length 2
+        element = struct.pack("<HHL", 0x0008, 0x0060, 2) + "CT"
+        path = self._writeFile("ct", element)
+
+        self.assertTrue(self.sniffer.isDicom(path))
+
+    def test_sniffer_accepts_explicit_file_without_preamble(self):
+        """
+        """
+        # (0008,0060) Modality with explicit VR CS and length 2
+        element = struct.pack("<HH", 0x0008, 0x0060) + "CS" + struct.pack("<H", 2) + "CT"
+        path = self._writeFile("ct", element)
+
+        self.assertTrue(self.sniffer.isDicom(path))
+
+    def test_sniffer_rejects_text_file(self):
+        """
+        """
+        path = self._writeFile("notes", "Patient was positioned supine.\n" * 10)
+
+        self.assertFalse(self.sniffer.isDicom(path))
+
+    def test_sniffer_rejects_short_file(self):
+        """
+        """
+        path = self._writeFile("empty", "")
+
+        self.assertFalse(self.sniffer.isDicom(path))
+
+    def test_sniffer_rejects_missing_file(self):
+        """
+        """
+        self.assertFalse(self.sniffer.isDicom(os.path.join(self.folder, "missing")))
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomFileSniffer))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys, os
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dcm.DicomGeometryValidator import DicomGeometryValidator
+
+class TestDicomGeometryValidator(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.validator = DicomGeometryValidator()
+
+        # Axial slices 2.5 mm apart (unordered)
+        self.slices = [self._slice(z * 2.5) for z in [3, 0, 2, 1, 4, 5]]
+
+    def test_consistent_series_has_no_issues(self):
+        """
+        """
+        self.assertEqual(self.validator.validate(self.slices), [])
+
+    def test_series_without_geometry_is_not_validated(self):
+        """
+        """
+        self.assertEqual(self.validator.validate([{ "Modality": "RTSTRUCT" }]), [])
+
+    def test_missing_slices_are_detected(self):
+        """
+        """
+        slices = [s for s in self.slices if s["ImagePositionPatient"][2] not in (5.0, 7.5)]
+
+        issues = self.validator.validate(slices)
+
+        self.assertEqual(len(issues), 1)
+        self.assertTrue(issues[0].startswith("2 slices are missing"))
+
+    def test_uneven_spacing_is_detected(self):
+        """
+        """
+        self.slices.append(self._slice(13.5))
+
+        issues = self.validator.validate(self.slices)
+
+        self.assertEqual(len(issues), 1)
+        self.assertTrue(issues[0].startswith("Slice distances are not even"))
+
+    def test_mixed_geometry_is_detected(self):
+        """
+        """
+        self.slices[0]["Rows"] = 256
+        self.slices[1]["PixelSpacing"] = (0.9, 0.9)
+        self.slices.append(self._slice(5.0))
+        del self.slices[5]["ImagePositionPatient"]
+
+        issues = self.validator.validate(self.slices)
+
+        self.assertEqual(len(issues), 4)
+        self.assertTrue(issues[0].startswith("Geometry attributes are missing in 1 of 7"))
+        self.assertTrue(issues[1].startswith("Dimensions of slices do not match: 256x512, 512x512"))
+        self.assertTrue(issues[2].startswith("Pixel spacing of slices does not match"))
+        self.assertTrue(issues[3].startswith("1 slices have the same position"))
+
+    def test_slices_along_oblique_normal(self):
+        """
+        """
+        orientation = (1.0, 0.0, 0.0, 0.0, 0.6, 0.8)
+        slices = [self._slice(0.0, position=(0.0, -0.8 * d, 0.6 * d), orientation=orientation) for d in [0.0, 3.0, 6.0]]
+
+        self.assertEqual(self.validator.validate(slices), [])
+
+    def _slice(self, z, position=None, orientation=(1.0, 0.0, 0.0, 0.0, 1.0, 0.0)):
+        """Descriptor with slice geometry
+        """
+        return {
+            "Modality": "CT",
+            "Rows": 512,
+            "Columns": 512,
+            "PixelSpacing": (0.97, 0.97),
+            "ImagePositionPatient": position or (-250.0, -250.0, z),
+            "ImageOrientationPatient": orientation
+        }
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomGeometryValidator))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
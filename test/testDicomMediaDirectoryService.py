@@ -0,0 +1,165 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dicom.dataset import Dataset, FileDataset
+from dicom.sequence import Sequence
+from dicom.filereader import read_preamble, read_dataset
+
+from services.DicomMediaDirectoryService import DicomMediaDirectoryService
+
+class TestDicomMediaDirectoryService(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.dicomDir = os.path.join(self.folder, "DICOMDIR")
+        self.defaults = {"PatientName": "Anonymous", "PatientBirthDate": "19000101"}
+
+        # Referenced files (file names on media are upper case, on disk they can be lower case)
+        os.mkdir(os.path.join(self.folder, "dicom"))
+        self.files = []
+        for name in ["im1", "im2", "rs1"]:
+            path = os.path.join(self.folder, "dicom", name)
+            with open(path, "wb") as f:
+                f.write("\0")
+            self.files.append(path)
+
+        self.records = [
+            self._directoryRecord("PATIENT", PatientID="P1", PatientName="Doe^John"),
+            self._directoryRecord("STUDY", StudyInstanceUID="1.2.3.1", StudyDescription="Head", StudyDate="20150101"),
+            self._directoryRecord("SERIES", SeriesInstanceUID="1.2.3.2", Modality="CT", SeriesDescription="Axial"),
+            self._directoryRecord("IMAGE", ReferencedFileID=["DICOM", "IM1"], ReferencedSOPInstanceUIDInFile="1.2.3.3.1", InstanceNumber="1"),
+            self._directoryRecord("IMAGE", ReferencedFileID=["DICOM", "IM2"], ReferencedSOPInstanceUIDInFile="1.2.3.3.2", InstanceNumber="2"),
+            self._directoryRecord("SERIES", SeriesInstanceUID="1.2.3.4", Modality="RTSTRUCT"),
+            self._directoryRecord("RT STRUCTURE SET", ReferencedFileID=["DICOM", "RS1"], ReferencedSOPInstanceUIDInFile="1.2.3.5.1", StructureSetLabel="Plan"),
+            self._directoryRecord("IMAGE", ReferencedFileID=["DICOM", "MISSING"], ReferencedSOPInstanceUIDInFile="1.2.3.5.2")
+        ]
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        shutil.rmtree(self.folder)
+
+    def test_records_are_built_from_linked_directory_records(self):
+        """
+        """
+        self._writeDicomDir(linked=True)
+
+        records = DicomMediaDirectoryService(self.dicomDir).records(self.files, self.defaults)
+
+        self._assertRecords(records)
+
+    def test_records_are_built_from_order_of_directory_records(self):
+        """
+        """
+        self._writeDicomDir(linked=False)
+
+        records = DicomMediaDirectoryService(self.dicomDir).records(self.files, self.defaults)
+
+        self._assertRecords(records)
+
+    def test_unreadable_dicomdir_provides_no_records(self):
+        """
+        """
+        with open(self.dicomDir, "wb") as f:
+            f.write("not a DICOMDIR")
+
+        records = DicomMediaDirectoryService(self.dicomDir).records(self.files, self.defaults)
+
+        self.assertEqual(records, {})
+
+    def _assertRecords(self, records):
+        """Check records built from test DICOMDIR
+        """
+        self.assertEqual(sorted(records.keys()), sorted(self.files))
+
+        descriptor = records[self.files[1]]["descriptor"]
+        self.assertEqual(descriptor["Filename"], self.files[1])
+        self.assertEqual(descriptor["PatientID"], "P1")
+        self.assertEqual(descriptor["PatientName"], "Doe^John")
+        self.assertEqual(descriptor["PatientBirthDate"], "19000101")
+        self.assertEqual(descriptor["StudyInstanceUID"], "1.2.3.1")
+        self.assertEqual(descriptor["StudyDescription"], "Head")
+        self.assertEqual(descriptor["SeriesInstanceUID"], "1.2.3.2")
+        self.assertEqual(descriptor["SOPInstanceUID"], "1.2.3.3.2")
+        self.assertEqual(descriptor["InstanceNumber"], 2)
+        self.assertEqual(descriptor["Modality"], "CT")
+        self.assertEqual(records[self.files[1]]["studyDate"], "20150101")
+
+        header = records[self.files[1]]["header"]["values"]
+        self.assertEqual(header["Modality"], "CT")
+        self.assertEqual(header["SeriesDescription"], "Axial")
+        self.assertEqual(header["SOPInstanceUID"], "1.2.3.3.2")
+        self.assertEqual(header["StudyInstanceUID"], "1.2.3.1")
+
+        descriptor = records[self.files[2]]["descriptor"]
+        self.assertEqual(descriptor["SeriesInstanceUID"], "1.2.3.4")
+        self.assertEqual(descriptor["Modality"], "RTSTRUCT")
+        self.assertEqual(descriptor["InstanceNumber"], 0)
+        self.assertEqual(records[self.files[2]]["header"]["values"]["StructureSetLabel"], "Plan")
+
+    def _directoryRecord(self, recordType, **values):
+        """Prepare DICOMDIR directory record
+        """
+        directoryRecord = Dataset()
+        directoryRecord.OffsetOfTheNextDirectoryRecord = 0
+        directoryRecord.RecordInUseFlag = 0xFFFF
+        directoryRecord.OffsetOfReferencedLowerLevelDirectoryEntity = 0
+        directoryRecord.DirectoryRecordType = recordType
+        for keyword, value in values.items():
+            setattr(directoryRecord, keyword, value)
+
+        return directoryRecord
+
+    def _writeDicomDir(self, linked):
+        """Write DICOMDIR with records linked by offsets or only ordered
+        """
+        meta = Dataset()
+        meta.MediaStorageSOPClassUID = "1.2.840.10008.1.3.10"
+        meta.MediaStorageSOPInstanceUID = "1.2.3.9"
+        meta.TransferSyntaxUID = "1.2.840.10008.1.2.1"
+        meta.ImplementationClassUID = "1.2.3.4.5"
+
+        ds = FileDataset(self.dicomDir, {}, file_meta=meta, preamble="\0" * 128)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        ds.FileSetID = "TEST"
+        ds.OffsetOfTheFirstDirectoryRecordOfTheRootDirectoryEntity = 0
+        ds.OffsetOfTheLastDirectoryRecordOfTheRootDirectoryEntity = 0
+        ds.FileSetConsistencyFlag = 0
+        ds.DirectoryRecordSequence = Sequence(self.records)
+        ds.save_as(self.dicomDir)
+
+        if linked:
+            # Offsets of records are known after the first write (values have fixed length)
+            with open(self.dicomDir, "rb") as fp:
+                read_preamble(fp, False)
+                read_dataset(fp, False, True, stop_when=lambda tag, VR, length: tag.group != 2)
+                offsets = [r.seq_item_tell for r in read_dataset(fp, False, True).DirectoryRecordSequence]
+
+            patient, study, series1, image1, image2, series2, structureSet, missing = self.records
+            ds.OffsetOfTheFirstDirectoryRecordOfTheRootDirectoryEntity = offsets[0]
+            patient.OffsetOfReferencedLowerLevelDirectoryEntity = offsets[1]
+            study.OffsetOfReferencedLowerLevelDirectoryEntity = offsets[2]
+            series1.OffsetOfTheNextDirectoryRecord = offsets[5]
+            series1.OffsetOfReferencedLowerLevelDirectoryEntity = offsets[3]
+            image1.OffsetOfTheNextDirectoryRecord = offsets[4]
+            series2.OffsetOfReferencedLowerLevelDirectoryEntity = offsets[6]
+            structureSet.OffsetOfTheNextDirectoryRecord = offsets[7]
+            ds.save_as(self.dicomDir)
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomMediaDirectoryService))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
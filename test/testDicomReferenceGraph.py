@@ -0,0 +1,78 @@
+import sys, os
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dcm.DicomReferenceGraph import DicomReferenceGraph, CONTOUR_IMAGE, STRUCTURE_SET, RT_PLAN
+
+class TestDicomReferenceGraph(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.graph = DicomReferenceGraph()
+
+        self.graph.addDescriptor({ "Modality": "CT", "SOPInstanceUID": "1.1" })
+        self.graph.addDescriptor({ "Modality": "CT", "SOPInstanceUID": "1.2" })
+        # The same CT instance in another file
+        self.graph.addDescriptor({ "Modality": "CT", "SOPInstanceUID": "1.2" })
+        self.graph.addDescriptor({
+            "Modality": "RTSTRUCT",
+            "SOPInstanceUID": "2.1",
+            "ContourImageSequence": ("1.1", "1.2", "1.3")
+        })
+        self.graph.addDescriptor({
+            "Modality": "RTPLAN",
+            "SOPInstanceUID": "3.1",
+            "ReferencedSOPInstanceUID_RTSTRUCT": "2.1"
+        })
+        self.graph.addDescriptor({
+            "Modality": "RTDOSE",
+            "SOPInstanceUID": "4.1",
+            "ReferencedSOPInstanceUID_RTPLAN": "3.1"
+        })
+        self.graph.addDescriptor({
+            "Modality": "RTDOSE",
+            "SOPInstanceUID": "4.2",
+            "ReferencedSOPInstanceUID_RTPLAN": "3.2"
+        })
+
+    def test_instances_are_unique_nodes(self):
+        """
+        """
+        self.assertEqual(len(self.graph), 6)
+        self.assertEqual(self.graph.instances("CT"), set(["1.1", "1.2"]))
+        self.assertEqual(self.graph.instances("MR"), set())
+        self.assertEqual(self.graph.modality("3.1"), "RTPLAN")
+        self.assertTrue("4.2" in self.graph)
+
+    def test_references_and_reversed_references(self):
+        """
+        """
+        self.assertEqual(self.graph.references("2.1", CONTOUR_IMAGE), set(["1.1", "1.2", "1.3"]))
+        self.assertEqual(self.graph.references("3.1", STRUCTURE_SET), set(["2.1"]))
+        self.assertEqual(self.graph.referencing("3.1", RT_PLAN), set(["4.1"]))
+        self.assertEqual(self.graph.referencesOf("RTDOSE", RT_PLAN), set(["3.1", "3.2"]))
+
+    def test_missing_references(self):
+        """
+        """
+        self.assertEqual(
+            self.graph.missingReferences(),
+            [("2.1", "RTSTRUCT", CONTOUR_IMAGE, "1.3"), ("4.2", "RTDOSE", RT_PLAN, "3.2")]
+        )
+        self.assertEqual(self.graph.missingReferences(modality="RTDOSE"), [("4.2", "RTDOSE", RT_PLAN, "3.2")])
+        self.assertEqual(self.graph.missingReferences(referenceType=STRUCTURE_SET), [])
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomReferenceGraph))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
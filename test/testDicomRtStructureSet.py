@@ -0,0 +1,165 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+import numpy as np
+
+import dicom
+from dicom.dataset import Dataset, FileDataset
+from dicom.sequence import Sequence
+from dicom.dataelem import RawDataElement
+from dicom.tag import Tag
+
+from dcm.DicomRtStructureSet import DicomRtStructureSet
+from dcm.DicomRtStructure import DicomRtStructure
+
+class TestDicomRtStructureSet(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        ds = Dataset()
+        ds.StructureSetROISequence = Sequence([
+            self._item(ROINumber=1, ROIName="GTV"),
+            self._item(ROINumber=2, ROIName="Body"),
+            self._item(ROINumber=3, ROIName="Empty")
+        ])
+
+        # Square contours of GTV on three slices, one contour of Body
+        gtv = [self._contour([0, 0, z, 10, 0, z, 10, 10, z, 0, 10, z]) for z in [-2.5, 0.0, 2.5]]
+        body = [self._contour([-50, -50, 0, 50, -50, 0, 0, 50, 0])]
+        ds.ROIContourSequence = Sequence([
+            self._item(ReferencedROINumber=1, ContourSequence=Sequence(gtv)),
+            self._item(ReferencedROINumber=2, ContourSequence=Sequence(body))
+        ])
+
+        self.dataset = ds
+        self.model = DicomRtStructureSet(ds)
+
+    def test_contours_are_decoded_into_one_array_per_roi(self):
+        """
+        """
+        self.assertEqual(self.model.roiNumbers, [1, 2, 3])
+        self.assertEqual(self.model.roiName(1), "GTV")
+        self.assertEqual(self.model.points(1).shape, (12, 3))
+        self.assertEqual(self.model.contourCount(1), 3)
+        self.assertEqual(self.model.pointCount(2), 3)
+        self.assertEqual(self.model.totalPointCount, 15)
+        self.assertTrue(np.array_equal(self.model.contours(1)[2][:, 2], [2.5] * 4))
+
+    def test_bounding_box_and_slice_coverage(self):
+        """
+        """
+        minimum, maximum = self.model.boundingBox(1)
+
+        self.assertEqual(list(minimum), [0.0, 0.0, -2.5])
+        self.assertEqual(list(maximum), [10.0, 10.0, 2.5])
+        self.assertEqual(self.model.sliceCoverage(1), (-2.5, 2.5, 3))
+
+    def test_roi_without_contours(self):
+        """
+        """
+        self.assertTrue(3 in self.model)
+        self.assertEqual(self.model.pointCount(3), 0)
+        self.assertEqual(self.model.contours(3), [])
+        self.assertEqual(self.model.boundingBox(3), None)
+        self.assertEqual(self.model.sliceCoverage(3), None)
+
+    def test_malformed_contours_are_skipped(self):
+        """
+        """
+        contours = [
+            self._contour([0, 0, 0, 10, 0, 0, 10, 10, 0]),
+            # Truncated contour (last point has only x, y)
+            self._item(ContourGeometricType="CLOSED_PLANAR", NumberOfContourPoints=3, ContourData=["0", "0", "2.5", "10", "0", "2.5", "10", "10"]),
+            # Point count does not match ContourData
+            self._item(ContourGeometricType="CLOSED_PLANAR", NumberOfContourPoints=4, ContourData=["0", "0", "5", "10", "0", "5", "10", "10", "5"]),
+            self._contour([0, 0, 7.5, 10, 0, 7.5, 10, 10, 7.5, 0, 10, 7.5])
+        ]
+        self.dataset.ROIContourSequence[0].ContourSequence = Sequence(contours)
+
+        model = DicomRtStructureSet(self.dataset)
+
+        self.assertEqual(model.contourCount(1), 2)
+        self.assertEqual(model.pointCount(1), 7)
+        self.assertEqual([len(c) for c in model.contours(1)], [3, 4])
+        self.assertEqual(list(model.slicePositions(1)), [0.0, 7.5])
+        self.assertEqual(model.pointCount(2), 3)
+
+    def test_contour_with_invalid_values_is_skipped(self):
+        """
+        """
+        # Raw value as read from file
+        invalid = self._item(ContourGeometricType="CLOSED_PLANAR")
+        value = "0\\0\\x\\10\\0\\5\\10\\10\\5"
+        dict.__setitem__(invalid, Tag(0x30060050), RawDataElement(Tag(0x30060050), "DS", len(value), value, 0, True, True))
+        contours = [self._contour([0, 0, 0, 10, 0, 0, 10, 10, 0]), invalid]
+        self.dataset.ROIContourSequence[0].ContourSequence = Sequence(contours)
+
+        model = DicomRtStructureSet(self.dataset)
+
+        self.assertEqual(model.contourCount(1), 1)
+        self.assertEqual(model.pointCount(1), 3)
+
+    def test_raw_contour_data_of_read_file(self):
+        """
+        """
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, "rs.dcm")
+            meta = Dataset()
+            meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.481.3"
+            meta.MediaStorageSOPInstanceUID = "1.2.3.5.1"
+            meta.TransferSyntaxUID = "1.2.840.10008.1.2"
+            meta.ImplementationClassUID = "1.2.3.4.5"
+            ds = FileDataset(path, self.dataset, file_meta=meta, preamble="\0" * 128)
+            ds.is_little_endian = True
+            ds.is_implicit_VR = True
+            ds.save_as(path)
+
+            model = DicomRtStructureSet(dicom.read_file(path))
+
+            for roiNumber in self.model.roiNumbers:
+                self.assertTrue(np.array_equal(model.points(roiNumber), self.model.points(roiNumber)))
+        finally:
+            shutil.rmtree(folder)
+
+    def test_roi_node_uses_contour_model(self):
+        """
+        """
+        roi = DicomRtStructure(1, "GTV")
+        self.assertEqual(roi.pointCount, None)
+
+        roi.structureSet = self.model
+
+        self.assertEqual(roi.pointCount, 12)
+        self.assertEqual(len(roi.contours), 3)
+        self.assertEqual(roi.sliceCoverage, (-2.5, 2.5, 3))
+
+    def _contour(self, values):
+        """Contour item with ContourData
+        """
+        return self._item(ContourGeometricType="CLOSED_PLANAR", NumberOfContourPoints=len(values) / 3, ContourData=[str(v) for v in values])
+
+    def _item(self, **values):
+        """Sequence item
+        """
+        item = Dataset()
+        for keyword, value in values.items():
+            setattr(item, keyword, value)
+        return item
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomRtStructureSet))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import sys, os, shutil, tempfile, sqlite3, time
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from contexts.ConfigDetails import ConfigDetails
+from services.DicomScanIndexService import DicomScanIndexService
+
+class TestDicomScanIndexService(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.indexFileName = os.path.join(self.folder, "index.db")
+
+        self.dataFolder = os.path.join(self.folder, "data")
+        os.mkdir(self.dataFolder)
+
+        self.files = []
+        for i in range(3):
+            path = os.path.join(self.dataFolder, "file%d.dcm" % i)
+            with open(path, "w") as f:
+                f.write("x" * i)
+            self.files.append(path)
+
+        # Initial scan
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        svc.lookup(self.dataFolder, self.files)
+        for f in self.files:
+            svc.store(f, self._record(f))
+        svc.close()
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        ConfigDetails().dicomScanIndexMaxAge = 30
+        shutil.rmtree(self.folder)
+
+    def test_unchanged_files_are_provided_from_index(self):
+        """
+        """
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        records = svc.lookup(self.dataFolder, self.files)
+        svc.close()
+
+        self.assertEqual(sorted(records.keys()), sorted(self.files))
+        self.assertEqual(records[self.files[1]], self._record(self.files[1]))
+
+    def test_changed_files_are_not_provided_from_index(self):
+        """
+        """
+        with open(self.files[0], "w") as f:
+            f.write("changed")
+
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        records = svc.lookup(self.dataFolder, self.files)
+        svc.close()
+
+        self.assertTrue(self.files[0] not in records)
+        self.assertEqual(len(records), 2)
+
+    def test_records_with_different_signature_are_not_provided(self):
+        """
+        """
+        svc = DicomScanIndexService(self.indexFileName, "2")
+        records = svc.lookup(self.dataFolder, self.files)
+        svc.close()
+
+        self.assertEqual(records, {})
+
+    def test_deleted_files_are_removed_from_index(self):
+        """
+        """
+        os.remove(self.files[2])
+
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        svc.lookup(self.dataFolder, self.files[:2])
+        svc.close()
+
+        # File with the same name appears again, it cannot be taken from index
+        with open(self.files[2], "w") as f:
+            f.write("xx")
+
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        records = svc.lookup(self.dataFolder, self.files)
+        svc.close()
+
+        self.assertTrue(self.files[2] not in records)
+
+    def test_partial_lookup_keeps_other_entries(self):
+        """
+        """
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        svc.lookup(self.dataFolder, self.files[:1], False)
+        svc.close()
+
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        records = svc.lookup(self.dataFolder, self.files)
+        svc.close()
+
+        self.assertEqual(sorted(records.keys()), sorted(self.files))
+
+    def test_records_are_not_stored_in_plain_text(self):
+        """
+        """
+        connection = sqlite3.connect(self.indexFileName)
+        values = [str(row[0]) for row in connection.execute("SELECT record FROM scanindex")]
+        connection.close()
+
+        self.assertEqual(len(values), 3)
+        for value in values:
+            self.assertTrue("file" not in value and "Modality" not in value)
+
+    def test_modified_records_are_not_provided(self):
+        """
+        """
+        connection = sqlite3.connect(self.indexFileName)
+        connection.execute("UPDATE scanindex SET record = 'x' || record WHERE path = ?", (os.path.abspath(self.files[0]),))
+        connection.commit()
+        connection.close()
+
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        records = svc.lookup(self.dataFolder, self.files)
+        svc.close()
+
+        self.assertEqual(sorted(records.keys()), sorted(self.files[1:]))
+
+    def test_expired_records_are_purged(self):
+        """
+        """
+        connection = sqlite3.connect(self.indexFileName)
+        connection.execute("UPDATE scanindex SET stored = ? WHERE path = ?", (time.time() - 31 * 24 * 3600, os.path.abspath(self.files[0])))
+        connection.commit()
+        connection.close()
+
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        records = svc.lookup(self.dataFolder, self.files)
+        svc.close()
+
+        self.assertEqual(sorted(records.keys()), sorted(self.files[1:]))
+
+        connection = sqlite3.connect(self.indexFileName)
+        self.assertEqual(connection.execute("SELECT COUNT(*) FROM scanindex").fetchone()[0], 2)
+        connection.close()
+
+    def test_plain_records_of_older_index_are_purged(self):
+        """
+        """
+        os.remove(self.indexFileName)
+        connection = sqlite3.connect(self.indexFileName)
+        connection.execute("CREATE TABLE scanindex (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, signature TEXT, record BLOB)")
+        connection.execute("INSERT INTO scanindex VALUES (?, 0, 0, '1', 'DOE^JOHN')", (os.path.abspath(self.files[0]),))
+        connection.commit()
+        connection.close()
+
+        svc = DicomScanIndexService(self.indexFileName, "1")
+        records = svc.lookup(self.dataFolder, self.files)
+        svc.close()
+
+        self.assertEqual(records, {})
+        with open(self.indexFileName, "rb") as f:
+            self.assertTrue("DOE^JOHN" not in f.read())
+
+    def test_purge_removes_index(self):
+        """
+        """
+        DicomScanIndexService(self.indexFileName, "1").purge()
+
+        self.assertFalse(os.path.exists(self.indexFileName))
+
+    def _record(self, path):
+        """Prepare scan record
+        """
+        return {
+            "descriptor": { "Filename": path, "Modality": "CT" },
+            "studyDate": None,
+            "rois": [],
+            "log": [],
+            "errors": [],
+            "skipped": False
+        }
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomScanIndexService))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
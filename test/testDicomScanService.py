@@ -0,0 +1,112 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from dicom.dataset import Dataset, FileDataset
+
+import services.DicomScanService
+from services.DicomScanService import DicomScanService
+from contexts.ConfigDetails import ConfigDetails
+
+class TestDicomScanService(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.defaults = { "PatientName": "XXX", "PatientBirthDate": "19000101" }
+        self.files = []
+
+        for i in range(6):
+            path = os.path.join(self.folder, "CT%d.dcm" % i)
+            self._writeDicomFile(path, i)
+            self.files.append(path)
+
+        # File without patient ID
+        path = os.path.join(self.folder, "broken.dcm")
+        self._writeDicomFile(path, 99, patientId=None)
+        self.files.append(path)
+
+        self.workers = ConfigDetails().dicomScanWorkers
+        self.minFiles = services.DicomScanService.PARALLEL_SCAN_MIN_FILES
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        ConfigDetails().dicomScanWorkers = self.workers
+        services.DicomScanService.PARALLEL_SCAN_MIN_FILES = self.minFiles
+        shutil.rmtree(self.folder)
+
+    def test_scan_provides_descriptor_for_each_file(self):
+        """
+        """
+        ConfigDetails().dicomScanWorkers = 1
+        records = list(DicomScanService().scan(self.files, self.defaults))
+
+        self.assertEqual(len(records), len(self.files))
+        self.assertEqual(records[0]["descriptor"]["Filename"], self.files[0])
+        self.assertEqual(records[0]["descriptor"]["Modality"], "CT")
+        self.assertEqual(records[0]["descriptor"]["InstanceNumber"], 1)
+        self.assertEqual(records[0]["descriptor"]["PatientName"], "XXX")
+        self.assertEqual(records[0]["studyDate"], "20150101")
+        self.assertEqual(records[0]["header"]["values"]["Modality"], "CT")
+
+    def test_scan_reports_missing_tags(self):
+        """
+        """
+        ConfigDetails().dicomScanWorkers = 1
+        records = list(DicomScanService().scan(self.files, self.defaults))
+
+        self.assertEqual(records[0]["errors"], [])
+        self.assertEqual(len(records[-1]["errors"]), 1)
+        self.assertTrue("PatientID" not in records[-1]["descriptor"])
+
+    def test_parallel_scan_equals_serial_scan(self):
+        """
+        """
+        ConfigDetails().dicomScanWorkers = 1
+        serial = list(DicomScanService().scan(self.files, self.defaults))
+
+        ConfigDetails().dicomScanWorkers = 2
+        services.DicomScanService.PARALLEL_SCAN_MIN_FILES = 1
+        parallel = list(DicomScanService().scan(self.files, self.defaults))
+
+        self.assertEqual(serial, parallel)
+
+    def _writeDicomFile(self, path, number, patientId="PID"):
+        """Write minimal CT header
+        """
+        meta = Dataset()
+        meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+        meta.MediaStorageSOPInstanceUID = "1.2.3.4.%d" % number
+        meta.TransferSyntaxUID = "1.2.840.10008.1.2"
+        meta.ImplementationClassUID = "1.2.3.4.5"
+
+        ds = FileDataset(path, {}, file_meta=meta, preamble="\0" * 128)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = True
+        if patientId is not None:
+            ds.PatientID = patientId
+        ds.StudyInstanceUID = "1.2.3"
+        ds.StudyDescription = "Study"
+        ds.StudyDate = "20150101"
+        ds.SeriesInstanceUID = "1.2.3.4"
+        ds.SOPInstanceUID = "1.2.3.4.%d" % number
+        ds.Modality = "CT"
+        ds.InstanceNumber = number + 1
+        ds.save_as(path)
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomScanService))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+import dicom
+from dicom.dataset import Dataset, FileDataset
+from dicom.sequence import Sequence
+
+from dcm.DicomSeries import DicomSeries
+from dcm.DicomSeriesHeader import DicomSeriesHeader, seriesHeaderRecord
+
+class TestDicomSeriesHeader(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.ctFile = os.path.join(self.folder, "ct")
+        self.rsFile = os.path.join(self.folder, "rs")
+
+        ct = self._dataset(self.ctFile, "CT", "1.2.3.4.1")
+        ct.SeriesDescription = "Head"
+        ct.SeriesDate = "20150101"
+        ct.Rows = 2
+        ct.Columns = 2
+        ct.BitsAllocated = 16
+        ct.PixelData = "\0" * 8
+        ct.save_as(self.ctFile)
+
+        rs = self._dataset(self.rsFile, "RTSTRUCT", "1.2.3.5.1")
+        rs.StructureSetLabel = "Label"
+        rs.StructureSetName = "Name"
+        rs.StructureSetDate = "20150102"
+        rs.StructureSetROISequence = Sequence([self._item(ROINumber=1, ROIName="GTV"), self._item(ROINumber=2, ROIName="Body")])
+        rs.RTROIObservationsSequence = Sequence([self._item(ReferencedROINumber=2, ROIObservationLabel="Body", RTROIInterpretedType="EXTERNAL")])
+        rs.save_as(self.rsFile)
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        shutil.rmtree(self.folder)
+
+    def test_header_keeps_only_described_attributes(self):
+        """
+        """
+        ct = self._dataset(self.ctFile, "CT", "1.2.3.4.1")
+        ct.SeriesDescription = "Head"
+        ct.PixelData = "\0" * 8
+
+        header = DicomSeriesHeader(seriesHeaderRecord(ct))
+
+        self.assertEqual(header.Modality, "CT")
+        self.assertEqual(header.SeriesDescription, "Head")
+        self.assertTrue("PixelData" not in header)
+        self.assertEqual(header.get("RTPlanLabel", ""), "")
+        self.assertRaises(AttributeError, getattr, header, "PixelData")
+
+    def test_series_is_described_by_header(self):
+        """
+        """
+        series = self._series(self.ctFile)
+
+        self.assertEqual(series.modality, "CT")
+        self.assertEqual(series.description, "Head")
+        self.assertEqual(series.date, "20150101")
+        self.assertEqual(series.studyInstanceUid, "1.2.3")
+        self.assertEqual(series.sopInstanceUid, "1.2.3.4.1")
+
+    def test_structure_set_rois_are_prepared_from_header(self):
+        """
+        """
+        series = self._series(self.rsFile)
+
+        self.assertEqual(series.description, "Label Name")
+        self.assertEqual(series.date, "20150102")
+        self.assertEqual(series.objects, 2)
+        self.assertEqual([roi.roiNumber for roi in series.children], [1, 2])
+        self.assertEqual(series.children[1].roiObservationLabel, "Body")
+        self.assertEqual(series.children[1].rtRoiInterpretedType, "EXTERNAL")
+
+    def test_series_header_is_not_read_from_file(self):
+        """
+        """
+        record = seriesHeaderRecord(dicom.read_file(self.rsFile))
+        os.remove(self.rsFile)
+
+        series = DicomSeries("1.2.3.4")
+        series.appendFile(self.rsFile)
+        series._finish(record)
+
+        self.assertEqual(series.description, "Label Name")
+        self.assertEqual(series.objects, 2)
+
+    def test_header_record_holds_plain_values(self):
+        """
+        """
+        record = seriesHeaderRecord(dicom.read_file(self.rsFile))
+
+        self.assertEqual(record["values"]["StructureSetLabel"], "Label")
+        self.assertEqual(type(record["values"]["SOPInstanceUID"]), str)
+        self.assertEqual(record["rois"], [(1, "GTV"), (2, "Body")])
+        self.assertEqual(record["observations"], [(2, "Body", "EXTERNAL")])
+
+    def _series(self, path):
+        """Finished series of one file
+        """
+        series = DicomSeries("1.2.3.4")
+        series.appendFile(path)
+        series._finish(seriesHeaderRecord(dicom.read_file(path)))
+        return series
+
+    def _dataset(self, path, modality, sopInstanceUid):
+        """Minimal DICOM dataset
+        """
+        meta = Dataset()
+        meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+        meta.MediaStorageSOPInstanceUID = sopInstanceUid
+        meta.TransferSyntaxUID = "1.2.840.10008.1.2"
+        meta.ImplementationClassUID = "1.2.3.4.5"
+
+        ds = FileDataset(path, {}, file_meta=meta, preamble="\0" * 128)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = True
+        ds.StudyInstanceUID = "1.2.3"
+        ds.SeriesInstanceUID = "1.2.3.4"
+        ds.SOPInstanceUID = sopInstanceUid
+        ds.Modality = modality
+        return ds
+
+    def _item(self, **values):
+        """Sequence item
+        """
+        item = Dataset()
+        for keyword, value in values.items():
+            setattr(item, keyword, value)
+        return item
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomSeriesHeader))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
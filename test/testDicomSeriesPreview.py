@@ -0,0 +1,73 @@
+import sys, os
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+from domain.Node import Node
+from dcm.DicomStudy import DicomStudy
+from dcm.DicomSeriesPreview import DicomSeriesPreview
+
+class TestDicomSeriesPreview(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.root = Node("DICOM data root node")
+        self.study = DicomStudy("1.2.3")
+        self.root.addChild(self.study)
+
+    def test_name_shows_modality_description_and_size(self):
+        """
+        """
+        serie = DicomSeriesPreview("1.2.3.1", "CT", "Thorax", "20040119", 0, 1)
+        serie.size = 120
+
+        self.assertEqual("[CT] Thorax (120)", serie.name)
+        self.assertEqual("SERIE", serie.typeInfo())
+        self.assertEqual("20040119", serie.typeDate())
+
+    def test_name_of_structure_set_shows_rois(self):
+        """
+        """
+        serie = DicomSeriesPreview("1.2.3.2", "RTSTRUCT", "Contours", "", 12, 1)
+
+        self.assertEqual("[RTSTRUCT] Contours <ROI=12> (1)", serie.name)
+
+    def test_inserted_child_keeps_row_and_parent(self):
+        """
+        """
+        first = DicomSeriesPreview("1.2.3.1", "CT", "", "", 0, 1)
+        last = DicomSeriesPreview("1.2.3.3", "CT", "", "", 0, 1)
+        middle = DicomSeriesPreview("1.2.3.2", "CT", "", "", 0, 1)
+        self.study.addChild(first)
+        self.study.addChild(last)
+
+        self.study.insertChild(1, middle)
+
+        self.assertEqual(1, middle.row())
+        self.assertIs(self.study, middle.parent)
+        self.assertEqual(["1.2.3.1", "1.2.3.2", "1.2.3.3"], [s.suid for s in self.study.children])
+
+    def test_checked_study_checks_previewed_series(self):
+        """
+        """
+        serie = DicomSeriesPreview("1.2.3.1", "CT", "", "", 0, 1)
+        self.study.addChild(serie)
+
+        self.study.isChecked = True
+
+        self.assertTrue(serie.isChecked)
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomSeriesPreview))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
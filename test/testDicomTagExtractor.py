@@ -0,0 +1,109 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+import dicom
+from dicom.dataset import Dataset, FileDataset
+from dicom.dataelem import RawDataElement
+from dicom.sequence import Sequence
+
+from dcm.DicomTagExtractor import DicomTagExtractor
+
+class TestDicomTagExtractor(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.fileName = os.path.join(self.folder, "rtstruct.dcm")
+
+        self.extractor = DicomTagExtractor([
+            ("FrameOfReferenceUID", 0x00200052, None, False),
+            ("ReferencedSOPInstanceUID_RTSTRUCT", 0x00081155, 0x300C0060, False),
+            ("ContourImageSequence", 0x00081155, 0x30060016, True),
+            ("RadiationType", 0x300A00C6, None, False)
+        ])
+
+        meta = Dataset()
+        meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.481.3"
+        meta.MediaStorageSOPInstanceUID = "1.2.3.4.1"
+        meta.TransferSyntaxUID = "1.2.840.10008.1.2"
+        meta.ImplementationClassUID = "1.2.3.4.5"
+
+        ds = FileDataset(self.fileName, {}, file_meta=meta, preamble="\0" * 128)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = True
+        ds.Modality = "RTSTRUCT"
+
+        referencedStructureSet = Dataset()
+        referencedStructureSet.ReferencedSOPInstanceUID = "1.2.3.100"
+        ds.ReferencedStructureSetSequence = Sequence([referencedStructureSet])
+
+        referencedFrameOfReference = Dataset()
+        referencedFrameOfReference.FrameOfReferenceUID = "1.2.3.200"
+        ds.ReferencedFrameOfReferenceSequence = Sequence([referencedFrameOfReference])
+
+        contours = []
+        for i in range(3):
+            contourImage = Dataset()
+            contourImage.ReferencedSOPInstanceUID = "1.2.3.%d" % i
+            contour = Dataset()
+            contour.ContourImageSequence = Sequence([contourImage])
+            contour.ContourData = ["0.0", "1.0", str(i)]
+            contours.append(contour)
+        roiContour = Dataset()
+        roiContour.ContourSequence = Sequence(contours)
+        ds.ROIContourSequence = Sequence([roiContour])
+
+        ds.save_as(self.fileName)
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        shutil.rmtree(self.folder)
+
+    def test_extractor_collects_values_in_nested_sequences(self):
+        """
+        """
+        values = self.extractor.extract(dicom.read_file(self.fileName))
+
+        self.assertEqual(values["FrameOfReferenceUID"], "1.2.3.200")
+        self.assertEqual(values["ContourImageSequence"], ["1.2.3.0", "1.2.3.1", "1.2.3.2"])
+
+    def test_extractor_respects_parent_sequence(self):
+        """
+        """
+        values = self.extractor.extract(dicom.read_file(self.fileName))
+
+        self.assertEqual(values["ReferencedSOPInstanceUID_RTSTRUCT"], "1.2.3.100")
+
+    def test_extractor_skips_missing_targets(self):
+        """
+        """
+        values = self.extractor.extract(dicom.read_file(self.fileName))
+
+        self.assertTrue("RadiationType" not in values)
+
+    def test_extractor_does_not_convert_other_elements(self):
+        """
+        """
+        ds = dicom.read_file(self.fileName)
+        self.extractor.extract(ds)
+
+        contour = ds.ROIContourSequence[0].ContourSequence[0]
+        self.assertTrue(isinstance(dict.__getitem__(contour, 0x30060050), RawDataElement))
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomTagExtractor))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+import numpy as np
+
+from dicom.dataset import Dataset, FileDataset
+
+from dcm.DicomSeries import DicomSeries
+from services.DicomVolumeCacheService import DicomVolumeCacheService
+from contexts.ConfigDetails import ConfigDetails
+
+class TestDicomVolumeCacheService(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+
+        # Three series of two 512x512 slices (1 MB each)
+        self.series = []
+        for s in range(3):
+            files = []
+            for i in range(2):
+                path = os.path.join(self.folder, "CT%d_%d.dcm" % (s, i))
+                self._writeDicomFile(path, s, i)
+                files.append(path)
+            self.series.append(("1.2.3.%d" % s, files))
+
+        self.config = (
+            ConfigDetails().dicomVolumeWorkers,
+            ConfigDetails().dicomVolumeDir,
+            ConfigDetails().dicomVolumeCacheSize,
+            ConfigDetails().dicomVolumeCacheSpill,
+            ConfigDetails().dicomVolumeCacheSpillSize
+        )
+        ConfigDetails().dicomVolumeWorkers = 1
+        ConfigDetails().dicomVolumeDir = self.folder
+        ConfigDetails().dicomVolumeCacheSize = 2
+        ConfigDetails().dicomVolumeCacheSpill = False
+
+        self.cache = DicomVolumeCacheService()
+        self.cache.clear()
+        self.statistics = self.cache.statistics
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        self.cache.clear()
+        ConfigDetails().dicomVolumeWorkers, \
+            ConfigDetails().dicomVolumeDir, \
+            ConfigDetails().dicomVolumeCacheSize, \
+            ConfigDetails().dicomVolumeCacheSpill, \
+            ConfigDetails().dicomVolumeCacheSpillSize = self.config
+        shutil.rmtree(self.folder)
+
+    def test_cached_volume_is_reused(self):
+        """
+        """
+        suid, files = self.series[0]
+
+        first = self._use(suid, files)
+        second = self._use(suid, list(reversed(files)))
+
+        self.assertTrue(first is second)
+        self.assertEqual(self._counter("hits"), 1)
+        self.assertEqual(self._counter("misses"), 1)
+
+    def test_least_recently_used_volume_is_evicted(self):
+        """
+        """
+        self._use(*self.series[0])
+        self._use(*self.series[1])
+        self._use(*self.series[0])
+        self._use(*self.series[2])
+
+        self.assertTrue(self.cache.contains(*self.series[0]))
+        self.assertFalse(self.cache.contains(*self.series[1]))
+        self.assertTrue(self.cache.contains(*self.series[2]))
+        self.assertEqual(self._counter("evictions"), 1)
+        self.assertEqual(self.cache.size, 2 * 1024 * 1024)
+
+    def test_evicted_volume_is_restored_from_spill(self):
+        """
+        """
+        ConfigDetails().dicomVolumeCacheSpill = True
+        ConfigDetails().dicomVolumeCacheSpillSize = 10
+
+        first = self._use(*self.series[0])
+        expected = np.array(first.array)
+        path = first.path
+        self._use(*self.series[1])
+        self._use(*self.series[2])
+
+        self.assertEqual(self._counter("spills"), 1)
+        self.assertTrue(first.isClosed)
+        self.assertEqual(self.cache.spillSize, 1024 * 1024)
+        # Backing file of evicted volume is kept, it is not copied
+        self.assertEqual(len(self._volumeFiles()), 3)
+
+        restored = self._use(*self.series[0])
+
+        self.assertEqual(restored.path, path)
+        self.assertTrue(np.array_equal(restored.array, expected))
+        self.assertEqual(self._counter("hits"), 1)
+        self.assertEqual(self._counter("misses"), 3)
+
+    def test_evicted_volume_file_is_removed_without_spill(self):
+        """
+        """
+        self._use(*self.series[0])
+        self._use(*self.series[1])
+        self._use(*self.series[2])
+
+        self.assertEqual(self._counter("evictions"), 1)
+        self.assertEqual(len(self._volumeFiles()), 2)
+
+    def test_pinned_volume_is_not_evicted(self):
+        """
+        """
+        pinned = self.cache.volume(*self.series[0])
+        self._use(*self.series[1])
+        self._use(*self.series[2])
+
+        self.assertFalse(pinned.isClosed)
+        self.assertTrue(self.cache.contains(*self.series[0]))
+        self.assertFalse(self.cache.contains(*self.series[1]))
+
+    def test_series_keeps_one_pin_until_released(self):
+        """
+        """
+        suid, files = self.series[0]
+        serie = DicomSeries(suid)
+        for f in files:
+            serie.appendFile(f)
+
+        array = self.cache.seriesArray(serie)
+        self.cache.seriesArray(serie)
+        volume = self.cache.volume(suid, files)
+        self.cache.unpin(volume)
+
+        self.assertEqual(serie.shape, array.shape)
+        self.assertEqual(serie.shape[0], 2)
+        self.assertTrue(self.cache._isPinned(volume))
+
+        self.cache.releaseSeries(serie)
+
+        self.assertTrue(volume.isClosed)
+        self.assertFalse(self.cache.contains(suid, files))
+
+    def test_volumes_over_budget_are_evicted_when_unpinned(self):
+        """
+        """
+        first = self.cache.volume(*self.series[0])
+        second = self.cache.volume(*self.series[1])
+        self._use(*self.series[2])
+
+        # Budget is exceeded while the volumes are in use
+        self.assertEqual(self.cache.size, 3 * 1024 * 1024)
+
+        self.cache.unpin(first)
+
+        self.assertTrue(first.isClosed)
+        self.assertFalse(second.isClosed)
+        self.assertEqual(self.cache.size, 2 * 1024 * 1024)
+
+    def test_released_pinned_volume_is_closed_when_unpinned(self):
+        """
+        """
+        volume = self.cache.volume(*self.series[0])
+        self.cache.release(*self.series[0])
+
+        self.assertFalse(volume.isClosed)
+        self.assertFalse(self.cache.contains(*self.series[0]))
+
+        self.cache.unpin(volume)
+
+        self.assertTrue(volume.isClosed)
+        self.assertEqual(len(self._volumeFiles()), 0)
+
+    def test_released_volume_is_removed(self):
+        """
+        """
+        volume = self._use(*self.series[0])
+        self.cache.release(*self.series[0])
+
+        self.assertTrue(volume.isClosed)
+        self.assertFalse(self.cache.contains(*self.series[0]))
+
+    def _use(self, suid, files):
+        """Get volume from cache and unpin it
+        """
+        volume = self.cache.volume(suid, files)
+        self.cache.unpin(volume)
+
+        return volume
+
+    def _volumeFiles(self):
+        """Volume files in volume folder
+        """
+        return [f for f in os.listdir(self.folder) if f.endswith(".vol")]
+
+    def _counter(self, name):
+        """Change of cache counter since setUp
+        """
+        return self.cache.statistics[name] - self.statistics[name]
+
+    def _writeDicomFile(self, path, series, number):
+        """Write CT slice 512x512 with 16 bits
+        """
+        meta = Dataset()
+        meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+        meta.MediaStorageSOPInstanceUID = "1.2.3.%d.%d" % (series, number)
+        meta.TransferSyntaxUID = "1.2.840.10008.1.2"
+        meta.ImplementationClassUID = "1.2.3.4.5"
+
+        ds = FileDataset(path, {}, file_meta=meta, preamble="\0" * 128)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = True
+        ds.SOPInstanceUID = "1.2.3.%d.%d" % (series, number)
+        ds.Modality = "CT"
+        ds.ImagePositionPatient = [0.0, 0.0, float(number)]
+        ds.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        ds.PixelSpacing = [1.0, 1.0]
+        ds.Rows = 512
+        ds.Columns = 512
+        ds.SamplesPerPixel = 1
+        ds.BitsAllocated = 16
+        ds.BitsStored = 16
+        ds.HighBit = 15
+        ds.PixelRepresentation = 0
+        ds.PixelData = (np.ones((512, 512), dtype=np.uint16) * (series * 10 + number)).tostring()
+        ds.save_as(path)
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomVolumeCacheService))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
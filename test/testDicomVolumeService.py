@@ -0,0 +1,148 @@
+import sys, os, shutil, tempfile
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+import numpy as np
+
+from dicom.dataset import Dataset, FileDataset
+
+import services.DicomVolumeService
+from services.DicomVolumeService import DicomVolumeService
+from contexts.ConfigDetails import ConfigDetails
+
+class TestDicomVolumeService(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.files = []
+
+        # Slices are written in reversed position order, each slice is filled with its index
+        for i in range(5):
+            path = os.path.join(self.folder, "CT%d.dcm" % i)
+            self._writeDicomFile(path, i, position=10.0 - 2.5 * i)
+            self.files.append(path)
+
+        self.workers = ConfigDetails().dicomVolumeWorkers
+        self.directory = ConfigDetails().dicomVolumeDir
+        self.minSlices = services.DicomVolumeService.PARALLEL_LOAD_MIN_SLICES
+
+        ConfigDetails().dicomVolumeDir = self.folder
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        ConfigDetails().dicomVolumeWorkers = self.workers
+        ConfigDetails().dicomVolumeDir = self.directory
+        services.DicomVolumeService.PARALLEL_LOAD_MIN_SLICES = self.minSlices
+        shutil.rmtree(self.folder)
+
+    def test_slices_are_sorted_along_slice_normal(self):
+        """
+        """
+        ConfigDetails().dicomVolumeWorkers = 1
+        volume = DicomVolumeService().load(self.files)
+
+        self.assertEqual(volume.shape, (5, 2, 3))
+        self.assertEqual(volume.files, list(reversed(self.files)))
+        self.assertEqual(list(volume.array[:, 0, 0]), [4, 3, 2, 1, 0])
+        self.assertAlmostEqual(volume.sampling[0], 2.5)
+        self.assertEqual(volume.sampling[1:], (0.5, 0.75))
+
+        volume.close()
+
+    def test_rescaled_volume_is_float(self):
+        """
+        """
+        ConfigDetails().dicomVolumeWorkers = 1
+        self._writeDicomFile(self.files[0], 0, position=10.0, slope=2.0, intercept=-1000.0)
+        volume = DicomVolumeService().load(self.files)
+
+        self.assertEqual(volume.array.dtype, np.float32)
+        self.assertEqual(volume.array[-1, 0, 0], -1000.0)
+        self.assertEqual(volume.array[0, 0, 0], 4.0)
+
+        volume.close()
+
+    def test_parallel_load_equals_serial_load(self):
+        """
+        """
+        ConfigDetails().dicomVolumeWorkers = 1
+        serial = DicomVolumeService().load(self.files)
+
+        ConfigDetails().dicomVolumeWorkers = 2
+        services.DicomVolumeService.PARALLEL_LOAD_MIN_SLICES = 1
+        parallel = DicomVolumeService().load(self.files)
+
+        self.assertTrue(np.array_equal(serial.array, parallel.array))
+        self.assertEqual(serial.files, parallel.files)
+
+        serial.close()
+        parallel.close()
+
+    def test_closed_volume_removes_its_file(self):
+        """
+        """
+        ConfigDetails().dicomVolumeWorkers = 1
+        volume = DicomVolumeService().load(self.files)
+        path = volume.path
+
+        self.assertTrue(os.path.exists(path))
+        volume.close()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(volume.isClosed)
+
+    def test_slices_with_different_dimensions_are_rejected(self):
+        """
+        """
+        ConfigDetails().dicomVolumeWorkers = 1
+        self._writeDicomFile(self.files[0], 0, position=10.0, rows=3)
+
+        self.assertRaises(ValueError, DicomVolumeService().load, self.files)
+
+    def _writeDicomFile(self, path, number, position, rows=2, slope=None, intercept=None):
+        """Write minimal CT slice filled with its number
+        """
+        meta = Dataset()
+        meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+        meta.MediaStorageSOPInstanceUID = "1.2.3.4.%d" % number
+        meta.TransferSyntaxUID = "1.2.840.10008.1.2"
+        meta.ImplementationClassUID = "1.2.3.4.5"
+
+        ds = FileDataset(path, {}, file_meta=meta, preamble="\0" * 128)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = True
+        ds.SOPInstanceUID = "1.2.3.4.%d" % number
+        ds.Modality = "CT"
+        ds.InstanceNumber = number + 1
+        ds.ImagePositionPatient = [0.0, 0.0, position]
+        ds.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        ds.PixelSpacing = [0.5, 0.75]
+        ds.Rows = rows
+        ds.Columns = 3
+        ds.SamplesPerPixel = 1
+        ds.BitsAllocated = 16
+        ds.BitsStored = 16
+        ds.HighBit = 15
+        ds.PixelRepresentation = 0
+        if slope is not None:
+            ds.RescaleSlope = slope
+            ds.RescaleIntercept = intercept
+        ds.PixelData = (np.ones((rows, 3), dtype=np.uint16) * number).tostring()
+        ds.save_as(path)
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestDicomVolumeService))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import sys, os, logging, multiprocessing
+import unittest
+
+sys.path.insert(0,os.path.abspath("./../"))
+
+import utils.WorkerPool
+from utils.WorkerPool import imapTasks, sharedPool, closeSharedPool
+
+def square(task):
+    """Task function of worker processes
+    """
+    return task * task
+
+def failingSquare(task):
+    """Task function failing in worker processes
+    """
+    if task == 3:
+        raise ValueError("Task failed")
+    return task * task
+
+class TestWorkerPool(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """Set up data used in the tests.
+        setUp is called before each test function execution.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.pools = []
+
+        # Record started worker pools
+        self.originalPool = multiprocessing.Pool
+        def pool(*args, **kwargs):
+            self.pools.append(args[0])
+            return self.originalPool(*args, **kwargs)
+        multiprocessing.Pool = pool
+
+    def tearDown(self):
+        """Clean up after each test function execution.
+        """
+        multiprocessing.Pool = self.originalPool
+        closeSharedPool("test")
+
+    def test_few_tasks_are_processed_serially(self):
+        """
+        """
+        results = list(imapTasks(square, range(3), 2, 4, self.logger, "test"))
+
+        self.assertEqual(results, [0, 1, 4])
+        self.assertEqual(self.pools, [])
+
+    def test_tasks_are_processed_in_workers_in_order(self):
+        """
+        """
+        results = list(imapTasks(square, range(20), 2, 4, self.logger, "test"))
+
+        self.assertEqual(results, [i * i for i in range(20)])
+        self.assertEqual(self.pools, [2])
+
+    def test_remaining_tasks_are_processed_serially_after_failure(self):
+        """
+        """
+        results = list(imapTasks(failingSquare, range(6), 2, 4, self.logger, "test", 1, serialFunction=square))
+
+        self.assertEqual(results, [i * i for i in range(6)])
+
+    def test_failure_is_raised_without_resume(self):
+        """
+        """
+        tasks = imapTasks(failingSquare, range(6), 2, 4, self.logger, "test", 1, resume=False)
+
+        self.assertRaises(ValueError, list, tasks)
+
+    def test_shared_pool_is_reused(self):
+        """
+        """
+        for i in range(3):
+            self.assertEqual(list(imapTasks(square, range(8), 2, 4, self.logger, "test", shared="test")), [j * j for j in range(8)])
+
+        self.assertEqual(self.pools, [2])
+        self.assertTrue(sharedPool("test", 2) is utils.WorkerPool._SHARED_POOLS["test"])
+
+
+def suite():
+    """
+    """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestWorkerPool))
+
+    return suite
+
+if __name__ == '__main__':
+    unittest.main()
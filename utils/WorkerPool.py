@@ -0,0 +1,107 @@
+import atexit
+import multiprocessing
+
+# Tasks are processed in worker processes only when there are enough of them, smaller
+# workloads (and failures of the pool) are processed serially in the calling process.
+# Functions and pool initializers are pickled and sent to the worker processes, so they
+# have to be defined on module level.
+
+# Pools kept for repeated use (key = name of the pool)
+_SHARED_POOLS = {}
+
+
+def processCount(workers):
+    """Number of worker processes: configured count or number of CPU cores (workers = 0)
+    """
+    if workers > 0:
+        return workers
+
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def sharedPool(name, processes):
+    """Pool of worker processes created on first use and reused by the following calls
+    """
+    if name not in _SHARED_POOLS:
+        _SHARED_POOLS[name] = multiprocessing.Pool(processes)
+
+    return _SHARED_POOLS[name]
+
+
+def closeSharedPool(name):
+    """Stop worker processes of shared pool (next use creates a new pool)
+    """
+    pool = _SHARED_POOLS.pop(name, None)
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+
+def closeSharedPools():
+    """Stop worker processes of all shared pools
+    """
+    for name in _SHARED_POOLS.keys():
+        closeSharedPool(name)
+
+
+atexit.register(closeSharedPools)
+
+
+def imapTasks(function, tasks, workers, minTasks, logger, description, maxChunkSize=32,
+              initializer=None, initargs=(), serialFunction=None, resume=True, shared=None):
+    """Generator of function results for tasks (in the order of tasks)
+
+    function: module level function applied to each task in worker process
+    tasks: list of tasks
+    workers: configured number of worker processes (0 = number of CPU cores)
+    minTasks: smaller number of tasks is processed serially
+    logger: logger of calling service
+    description: name of the work used in log messages
+    maxChunkSize: maximal number of tasks sent to worker process at once
+    initializer, initargs: pool initializer (e.g. to pass shared data to each worker only once)
+    serialFunction: function applied to task in serial mode (default = function)
+    resume: remaining tasks are processed serially when pool fails (otherwise only failure to start the pool is recovered)
+    shared: name of shared pool to use (pool is kept for the next call, initializer is not supported)
+    """
+    if serialFunction is None:
+        serialFunction = function
+
+    processes = min(processCount(workers), len(tasks))
+    if processes > 1 and len(tasks) >= minTasks:
+        pool = None
+        processed = 0
+        try:
+            if shared is not None:
+                pool = sharedPool(shared, processes)
+            else:
+                pool = multiprocessing.Pool(processes, initializer, initargs)
+            # Small chunks keep the progress reporting smooth
+            chunkSize = max(1, min(maxChunkSize, len(tasks) / (processes * 4)))
+            for result in pool.imap(function, tasks, chunkSize):
+                processed += 1
+                yield result
+            tasks = []
+        except Exception:
+            if pool is None:
+                logger.exception("Parallel " + description + " cannot be started, continuing in serial mode.")
+            elif resume:
+                logger.exception("Parallel " + description + " failed, continuing in serial mode.")
+                tasks = tasks[processed:]
+            else:
+                if shared is not None:
+                    closeSharedPool(shared)
+                raise
+            # Failed shared pool is not reused
+            if shared is not None:
+                closeSharedPool(shared)
+        finally:
+            if pool is not None and shared is None:
+                pool.terminate()
+                pool.join()
+
+    # Serial mode
+    for task in tasks:
+        yield serialFunction(task)
@@ -147,6 +147,35 @@ class DicomDataItemModel(QtCore.QAbstractItemModel):
         else:
             return QtCore.QModelIndex()
 
+    def insertNode(self, parentNode, node):
+        """Insert node among children of parent node (ordered by UID), views are notified
+        Must be called from GUI thread (e.g. slot of signal sent while DICOM data are scanned)
+        """
+        row = 0
+        while row < parentNode.childCount() and parentNode.child(row).suid < node.suid:
+            row += 1
+
+        self.beginInsertRows(self.nodeIndex(parentNode), row, row)
+        parentNode.insertChild(row, node)
+        self.endInsertRows()
+
+    def nodeChanged(self, node):
+        """Displayed data of node changed (e.g. number of files of series)
+        """
+        row = node.row()
+        self.dataChanged.emit(
+            self.createIndex(row, 0, node),
+            self.createIndex(row, self.columnCount(QtCore.QModelIndex()) - 1, node)
+        )
+
+    def nodeIndex(self, node):
+        """Index according to node
+        """
+        if node is self._rootNode:
+            return QtCore.QModelIndex()
+
+        return self.createIndex(node.row(), 0, node)
+
     def getNode(self, index):
         """Node according to index
         """
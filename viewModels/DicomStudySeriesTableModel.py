@@ -39,6 +39,8 @@ class DicomStudySeriesTableModel(QtCore.QAbstractTableModel):
                     return QtCore.QString("New description")
                 elif section == 3:
                     return QtCore.QString("UID")   
+                elif section == 4:
+                    return QtCore.QString("Geometry")
             else:
                 return QtCore.QString("%1").arg(section + 1)
 
@@ -53,7 +55,7 @@ class DicomStudySeriesTableModel(QtCore.QAbstractTableModel):
     def columnCount(self, parent):
         """Setup how many columns will be displayed
         """
-        return 4
+        return 5
 
     def setData(self, index, value, role):
         """What to do when changes are made
@@ -87,6 +89,8 @@ class DicomStudySeriesTableModel(QtCore.QAbstractTableModel):
                 return QtGui.QBrush(QtGui.QColor(gui.colours.GREEN))
             elif column == 3:
                 return QtGui.QBrush(QtGui.QColor(gui.colours.RED))
+            elif column == 4 and self.dataItems[row].geometryIssues:
+                return QtGui.QBrush(QtGui.QColor(gui.colours.ORANGE))
 
         if role == QtCore.Qt.DisplayRole or role == QtCore.Qt.EditRole:
             if column == 0:
@@ -97,9 +101,19 @@ class DicomStudySeriesTableModel(QtCore.QAbstractTableModel):
                 value = self.dataItems[row].newDescription
             elif column == 3:
                 value = str(self.dataItems[row].suid)
+            elif column == 4:
+                if self.dataItems[row].geometryIssues:
+                    value = str(len(self.dataItems[row].geometryIssues)) + " issue(s)"
+                else:
+                    value = "OK"
 
             return value
 
+        # Full description of slice geometry issues
+        if role == QtCore.Qt.ToolTipRole:
+            if column == 4 and self.dataItems[row].geometryIssues:
+                return QtCore.QString("\n".join(self.dataItems[row].geometryIssues))
+
     def flags(self, index):
         """Setup flugs which determine what is possible to do with columns
         """